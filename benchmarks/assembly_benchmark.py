@@ -0,0 +1,72 @@
+"""批量装配压测：比较逐个POST /api/catia/assembly添加组件与一次POST /api/catia/assembly/bulk的耗时
+
+用模拟后端新建装配，分别按两种方式添加同一组组件（--files个不同文件循环使用，每个组件一个旋转加平移的变换），
+通过Flask测试客户端请求。--open-ms为模拟读取一个文件的耗时，--latency-ms为其它每次模拟COM调用的耗时。
+
+    python benchmarks/assembly_benchmark.py --components 2000 --files 50 --open-ms 5 --latency-ms 0.2
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('CATIA_BACKEND', 'fake')
+os.environ.setdefault('CATIA_LOG_FILE', os.devnull)
+os.environ.setdefault('CATIA_LOG_LEVEL', 'WARNING')
+
+
+def _transform(index: int):
+    angle = math.radians(index % 360)
+    return [[math.cos(angle), -math.sin(angle), 0.0, index * 10.0],
+            [math.sin(angle), math.cos(angle), 0.0, 0.0],
+            [0.0, 0.0, 1.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--components', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--open-ms', type=float, default=5.0)
+    parser.add_argument('--latency-ms', type=float, default=0.2)
+    options = parser.parse_args()
+
+    import fake_pycatia
+    from flask_jwt_extended import create_access_token
+    from catia_mcp_service import app
+
+    fake_pycatia.configure_latency(options.latency_ms, overrides={'open': options.open_ms})
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+    headers = {'Authorization': f"Bearer {token}"}
+    client = app.test_client()
+    client.post('/api/catia/connect', json={}, headers=headers)
+    components = [(f"/bench/part{i % options.files}.CATPart", _transform(i)) for i in range(options.components)]
+
+    client.post('/api/catia/document', json={'operation': 'create', 'doc_type': 'Product'}, headers=headers)
+    start = time.perf_counter()
+    for file_path, transform in components:
+        # 单个接口只支持平移
+        client.post('/api/catia/assembly', json={'operation': 'add_component', 'file_path': file_path,
+                                                 'position': [row[3] for row in transform[:3]]}, headers=headers)
+    single = time.perf_counter() - start
+
+    client.post('/api/catia/document', json={'operation': 'create', 'doc_type': 'Product'}, headers=headers)
+    start = time.perf_counter()
+    response = client.post('/api/catia/assembly/bulk', json={'components': components}, headers=headers)
+    bulk = time.perf_counter() - start
+    result = response.get_json()['data']
+
+    print(f"{'mode':<12} {'requests':>9} {'total ms':>10} {'components/s':>13}")
+    print(f"{'single':<12} {len(components):>9} {single * 1000:>10.1f} {len(components) / single:>13.1f}")
+    print(f"{'bulk':<12} {1:>9} {bulk * 1000:>10.1f} {len(components) / bulk:>13.1f}")
+    print()
+    print(f"files loaded: {result['files_loaded']}, added: {result['added']}, failed: {result['failed']}")
+    print("bulk timings (ms): " + ", ".join(f"{key}={value}" for key, value in result['timings'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""认证开销压测：比较每个请求完整校验JWT、命中令牌缓存和使用会话密钥三种方式
+
+auth一栏只测认证本身（在同一个请求上下文中反复调用认证函数），request一栏是经过Flask测试客户端的完整请求
+GET /api/catia/system/executor（不调用CATIA），两者都以微秒为单位。
+
+    python benchmarks/auth_benchmark.py --iterations 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('CATIA_BACKEND', 'fake')
+os.environ.setdefault('CATIA_SESSION_KEYS', '1')
+os.environ.setdefault('CATIA_SESSION_KEY_IDENTITIES', 'benchmark')
+os.environ.setdefault('CATIA_LOG_FILE', os.devnull)
+os.environ.setdefault('CATIA_LOG_LEVEL', 'WARNING')
+
+PATH = '/api/catia/system/executor'
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def _time(fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {"avg": sum(samples) / len(samples), "p50": _percentile(samples, 0.5), "p99": _percentile(samples, 0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5000)
+    options = parser.parse_args()
+
+    import catia_auth
+    from flask_jwt_extended import create_access_token, verify_jwt_in_request
+    from catia_mcp_service import app
+
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+    bearer = {'Authorization': f"Bearer {token}"}
+    client = app.test_client()
+    session_key = client.post('/api/catia/auth/session-key', headers=bearer).get_json()["data"]["session_key"]
+    keyed = {catia_auth.SESSION_KEY_HEADER: session_key}
+
+    def auth_only(headers, check, iterations):
+        # 在同一个请求上下文中反复认证，不计入创建请求上下文的时间
+        with app.test_request_context(PATH, headers=headers):
+            return _time(check, iterations)
+
+    def full_request(headers):
+        def call():
+            response = client.get(PATH, headers=headers)
+            assert response.status_code == 200, response.status_code
+        return call
+
+    capacity = catia_auth.token_cache.capacity
+    modes = [
+        ("jwt", bearer, verify_jwt_in_request, lambda: setattr(catia_auth.token_cache, 'capacity', 0)),
+        ("cached", bearer, catia_auth.authenticate, lambda: setattr(catia_auth.token_cache, 'capacity', capacity)),
+        ("session_key", keyed, catia_auth.authenticate, lambda: None),
+    ]
+    print(f"{'mode':<12} {'auth avg':>9} {'auth p99':>9} {'request avg':>12} {'request p99':>12}")
+    for name, headers, check, prepare in modes:
+        prepare()
+        catia_auth.token_cache.clear()
+        auth = auth_only(headers, check, options.iterations)
+        request = _time(full_request(headers), options.iterations)
+        print(f"{name:<12} {auth['avg']:>9.1f} {auth['p99']:>9.1f} {request['avg']:>12.1f} {request['p99']:>12.1f}")
+    print(f"cache: {catia_auth.token_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""响应编码压测：比较各媒体类型和压缩方式的序列化耗时与响应大小
+
+用模拟后端打开一个含大量参数的零件，对GET /api/catia/parameters按不同的Accept和Accept-Encoding
+反复请求（Flask测试客户端），并单独测量标准库json与各编码函数对同一份数据的序列化耗时。
+
+    python benchmarks/encoding_benchmark.py --parameters 5000 --iterations 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('CATIA_BACKEND', 'fake')
+os.environ.setdefault('CATIA_LOG_FILE', os.devnull)
+os.environ.setdefault('CATIA_LOG_LEVEL', 'WARNING')
+
+
+def _average_ms(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parameters', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=50)
+    options = parser.parse_args()
+    os.environ['CATIA_FAKE_PARAMETERS'] = str(options.parameters)
+
+    import catia_encoding
+    from flask_jwt_extended import create_access_token
+    from catia_mcp_service import app
+
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+    headers = {'Authorization': f"Bearer {token}"}
+    client = app.test_client()
+    client.post('/api/catia/connect', json={}, headers=headers)
+    client.post('/api/catia/document', json={'operation': 'open', 'file_path': '/bench/encoding.CATPart'},
+                headers=headers)
+    data = client.get('/api/catia/parameters', headers=headers).get_json()
+
+    with app.app_context():
+        print(f"{'encoder':<40} {'ms':>8} {'bytes':>10}")
+        print(f"{'json (stdlib)':<40} {_average_ms(lambda: json.dumps(data), options.iterations):>8.2f} "
+              f"{len(json.dumps(data)):>10}")
+        for mediatype, encode in catia_encoding.encoders().items():
+            print(f"{mediatype:<40} {_average_ms(lambda: encode(data), options.iterations):>8.2f} "
+                  f"{len(encode(data)):>10}")
+
+    print()
+    print(f"{'Accept':<40} {'Accept-Encoding':<16} {'request ms':>10} {'bytes':>10}")
+    for mediatype in catia_encoding.encoders():
+        for encoding in ('identity', 'gzip', 'zstd'):
+            request_headers = dict(headers, **{'Accept': mediatype, 'Accept-Encoding': encoding})
+            response = client.get('/api/catia/parameters', headers=request_headers)
+            if response.headers.get('Content-Encoding', 'identity') != encoding:
+                continue
+            elapsed = _average_ms(lambda: client.get('/api/catia/parameters', headers=request_headers),
+                                  options.iterations)
+            print(f"{mediatype:<40} {encoding:<16} {elapsed:>10.2f} {len(response.data):>10}")
+
+
+if __name__ == '__main__':
+    main()
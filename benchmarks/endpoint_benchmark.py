@@ -0,0 +1,303 @@
+"""全部HTTP端点的延迟/吞吐基准测试（使用fake_pycatia模拟后端，可在Linux上运行）
+
+对每个/api/catia/*端点（以及/mcp）分别通过Flask测试客户端和真实套接字（本进程内的线程化HTTP服务，
+keep-alive连接）重复发送请求，报告p50/p95/p99延迟和每秒请求数，用于发现调度、认证和序列化上的性能回退。
+
+    python benchmarks/endpoint_benchmark.py --iterations 200 --latency-ms 0
+    python benchmarks/endpoint_benchmark.py --json results.json
+    python benchmarks/endpoint_benchmark.py --baseline results.json --tolerance 0.25
+
+指定--baseline时，p50比基线慢超过tolerance比例的端点视为回退，退出码为1。
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class Endpoint:
+    def __init__(self, name: str, method: str, path: str, body: Any = None, document: Optional[str] = None,
+                 expect: Tuple[int, ...] = (200,), headers: Any = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.document = document
+        self.expect = expect
+        # headers可以是函数，在切换到端点所需文档后根据传输对象生成（如当前ETag）
+        self.headers = headers or {}
+
+    def payload(self) -> Optional[bytes]:
+        body = self.body() if callable(self.body) else self.body
+        return None if body is None else json.dumps(body).encode('utf-8')
+
+
+class TestClientTransport:
+    name = 'test_client'
+
+    def __init__(self, app, headers: Dict[str, str]):
+        self._client = app.test_client()
+        self._headers = headers
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        response = self._client.open(path, method=method, data=body, headers={**self._headers, **(headers or {})})
+        return response.status_code, dict(response.headers), response.get_data()
+
+    def close(self):
+        pass
+
+
+class SocketTransport:
+    name = 'socket'
+
+    def __init__(self, app, headers: Dict[str, str]):
+        from werkzeug.serving import make_server
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='benchmark-http', daemon=True)
+        self._thread.start()
+        self._connection = http.client.HTTPConnection('127.0.0.1', self._server.server_port, timeout=60)
+        self._headers = headers
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        self._connection.request(method, path, body=body, headers={**self._headers, **(headers or {})})
+        response = self._connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+
+    def close(self):
+        self._connection.close()
+        self._server.shutdown()
+
+
+def _json(transport, method: str, path: str, body: Any = None) -> Tuple[int, Dict]:
+    status, _, data = transport.request(method, path, None if body is None else json.dumps(body).encode('utf-8'))
+    try:
+        return status, json.loads(data)
+    except ValueError:
+        return status, {}
+
+
+def _setup(transport) -> Dict[str, str]:
+    """准备基准测试用的文档和几何对象，返回各文档id和对象句柄"""
+    def call(path: str, body: Dict) -> Dict:
+        status, data = _json(transport, 'POST', path, body)
+        if data.get('status') != 'success':
+            raise RuntimeError(f"{path} {body}: {status} {data}")
+        return data.get('data') or {}
+
+    call('/api/catia/connect', {})
+    state = {"product": call('/api/catia/document', {'operation': 'create', 'doc_type': 'Product'})['document_id'],
+             "drawing": call('/api/catia/document', {'operation': 'create', 'doc_type': 'Drawing'})['document_id']}
+    state["view"] = call('/api/catia/drawing', {'operation': 'create_view', 'name': 'Front'})['handle']
+    state["part"] = call('/api/catia/document', {'operation': 'open',
+                                                 'file_path': '/bench/endpoint.CATPart'})['document_id']
+    state["p1"] = call('/api/catia/geometry', {'operation': 'point', 'x': 0, 'y': 0, 'z': 0})['handle']
+    state["p2"] = call('/api/catia/geometry', {'operation': 'point', 'x': 3, 'y': 4, 'z': 0})['handle']
+    state["l1"] = call('/api/catia/geometry', {'operation': 'line', 'start_point': [0, 0, 0],
+                                               'end_point': [1, 0, 0]})['handle']
+    state["l2"] = call('/api/catia/geometry', {'operation': 'line', 'start_point': [0, 0, 0],
+                                               'end_point': [0, 1, 0]})['handle']
+    state["sketch"] = call('/api/catia/sketch', {'operation': 'create', 'plane': 'XYPlane'})['handle']
+    state["pad"] = call('/api/catia/feature', {'operation': 'pad', 'sketch': state["sketch"], 'length': 10})['handle']
+    state["job"] = call('/api/catia/jobs', {'operation': 'mass', 'body': 'PartBody'})['job_id']
+    _, headers, _ = transport.request('POST', '/api/catia/sweep', json.dumps(
+        {'grid': {'Length.1': [1.0, 2.0]}, 'measurements': [{'type': 'volume', 'target': 'PartBody'}]}).encode())
+    state["sweep"] = headers['X-Sweep-Id']
+    return state
+
+
+def _current_etag(transport) -> Dict[str, str]:
+    _, headers, _ = transport.request('GET', '/api/catia/parameters')
+    return {'If-None-Match': headers['ETag']}
+
+
+def endpoints(state: Dict[str, str]) -> List[Endpoint]:
+    points = [[float(i), 0.0, 0.0] for i in range(100)]
+    return [
+        Endpoint('connect', 'POST', '/api/catia/connect', {}),
+        Endpoint('system', 'GET', '/api/catia/system'),
+        Endpoint('system/executor', 'GET', '/api/catia/system/executor'),
+        Endpoint('system/pool', 'GET', '/api/catia/system/pool', expect=(200, 400, 404)),
+        Endpoint('system/metrics', 'GET', '/api/catia/system/metrics'),
+        Endpoint('metrics', 'GET', '/metrics'),
+        Endpoint('tools', 'GET', '/api/catia/tools'),
+        Endpoint('openapi.json', 'GET', '/api/catia/openapi.json'),
+        Endpoint('session', 'GET', '/api/catia/session'),
+        Endpoint('document list', 'POST', '/api/catia/document', {'operation': 'list'}),
+        Endpoint('document switch', 'POST', '/api/catia/document',
+                 {'operation': 'switch', 'document_id': state["part"]}),
+        Endpoint('tree page', 'GET', '/api/catia/tree?format=json&limit=100', document='part'),
+        Endpoint('tree stream', 'GET', '/api/catia/tree?max_depth=1', document='part'),
+        Endpoint('parameters get', 'GET', '/api/catia/parameters', document='part'),
+        Endpoint('parameters get 304', 'GET', '/api/catia/parameters', document='part', expect=(304,),
+                 headers=_current_etag),
+        Endpoint('parameters set', 'POST', '/api/catia/parameters', {'name': 'Length.1', 'value': 5.0},
+                 document='part'),
+        Endpoint('parameters bulk', 'POST', '/api/catia/parameters/bulk',
+                 {'parameters': {'Length.1': 5.0, 'Length.2': 6.0}, 'update': False}, document='part'),
+        Endpoint('geometry point', 'POST', '/api/catia/geometry', {'operation': 'point', 'x': 1, 'y': 2, 'z': 3},
+                 document='part'),
+        Endpoint('geometry line', 'POST', '/api/catia/geometry',
+                 {'operation': 'line', 'start_point': [0, 0, 0], 'end_point': [1, 1, 1]}, document='part'),
+        Endpoint('geometry plane', 'POST', '/api/catia/geometry',
+                 {'operation': 'plane', 'origin': [0, 0, 0], 'normal': [0, 0, 1]}, document='part'),
+        Endpoint('geometry/batch', 'POST', '/api/catia/geometry/batch', {'points': points}, document='part'),
+        Endpoint('sketch create', 'POST', '/api/catia/sketch', {'operation': 'create', 'plane': 'XYPlane'},
+                 document='part'),
+        Endpoint('sketch add_line', 'POST', '/api/catia/sketch',
+                 {'operation': 'add_line', 'sketch': state["sketch"], 'start_point': [0, 0], 'end_point': [1, 1]},
+                 document='part'),
+        Endpoint('sketch add_circle', 'POST', '/api/catia/sketch',
+                 {'operation': 'add_circle', 'sketch': state["sketch"], 'center': [0, 0], 'radius': 5},
+                 document='part'),
+        Endpoint('feature pad', 'POST', '/api/catia/feature',
+                 {'operation': 'pad', 'sketch': state["sketch"], 'length': 10}, document='part'),
+        Endpoint('measure distance', 'POST', '/api/catia/measure',
+                 {'operation': 'distance', 'point1': state["p1"], 'point2': state["p2"]}, document='part'),
+        Endpoint('measure angle', 'POST', '/api/catia/measure',
+                 {'operation': 'angle', 'line1': state["l1"], 'line2': state["l2"]}, document='part'),
+        Endpoint('measure volume', 'POST', '/api/catia/measure',
+                 {'operation': 'volume', 'body': state["pad"]}, document='part'),
+        Endpoint('measure/bulk', 'POST', '/api/catia/measure/bulk',
+                 {'operation': 'distance', 'input1': points, 'input2': points[::-1]}, document='part'),
+        Endpoint('analysis mass', 'POST', '/api/catia/analysis', {'operation': 'mass', 'body': state["pad"]},
+                 document='part'),
+        Endpoint('analysis interference', 'POST', '/api/catia/analysis',
+                 {'operation': 'interference', 'body1': 'PartBody', 'body2': state["pad"]}, document='part'),
+        Endpoint('pipeline', 'POST', '/api/catia/pipeline', {'steps': [
+            {'id': 'p', 'resource': 'geometry', 'operation': 'point', 'args': {'x': 1, 'y': 1, 'z': 1}},
+            {'resource': 'measure', 'operation': 'distance', 'args': {'point1': '$p.handle', 'point2': state["p1"]}},
+            {'resource': 'analysis', 'operation': 'mass', 'args': {'body': state["pad"]}}]}, document='part'),
+        Endpoint('jobs submit', 'POST', '/api/catia/jobs', {'operation': 'mass', 'body': 'PartBody'},
+                 document='part', expect=(202,)),
+        Endpoint('jobs list', 'GET', '/api/catia/jobs'),
+        Endpoint('jobs status', 'GET', f"/api/catia/jobs/{state['job']}"),
+        Endpoint('jobs events', 'GET', f"/api/catia/jobs/{state['job']}/events"),
+        Endpoint('sweep', 'POST', '/api/catia/sweep',
+                 lambda: {'grid': {'Length.1': [1.0, 2.0]}, 'measurements': [{'type': 'volume', 'target': 'PartBody'}]},
+                 document='part'),
+        Endpoint('sweep status', 'GET', f"/api/catia/sweep/{state['sweep']}"),
+        Endpoint('assembly add_component', 'POST', '/api/catia/assembly',
+                 {'operation': 'add_component', 'file_path': '/bench/endpoint.CATPart', 'position': [0, 0, 0]},
+                 document='product'),
+        Endpoint('assembly bulk', 'POST', '/api/catia/assembly/bulk',
+                 {'components': [{'file_path': f"/bench/endpoint{i % 4}.CATPart", 'position': [i * 10.0, 0, 0]}
+                                 for i in range(20)]},
+                 document='product'),
+        Endpoint('drawing create_view', 'POST', '/api/catia/drawing', {'operation': 'create_view', 'name': 'Top'},
+                 document='drawing'),
+        Endpoint('drawing add_dimension', 'POST', '/api/catia/drawing',
+                 {'operation': 'add_dimension', 'view': state["view"], 'reference1': 'a', 'reference2': 'b'},
+                 document='drawing'),
+        Endpoint('mcp tools/call', 'POST', '/mcp',
+                 {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {'name': 'system_info', 'arguments': {}}}),
+    ]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def measure(transport, endpoint: Endpoint, state: Dict[str, str], iterations: int, warmup: int) -> Dict:
+    if endpoint.document:
+        _json(transport, 'POST', '/api/catia/document', {'operation': 'switch', 'document_id': state[endpoint.document]})
+    headers = endpoint.headers(transport) if callable(endpoint.headers) else endpoint.headers
+    latencies, errors = [], 0
+    for i in range(warmup + iterations):
+        body = endpoint.payload()
+        start = time.perf_counter()
+        status, _, _ = transport.request(endpoint.method, endpoint.path, body, headers)
+        elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        if status not in endpoint.expect:
+            errors += 1
+    total = sum(latencies)
+    return {
+        "endpoint": endpoint.name, "transport": transport.name, "requests": len(latencies), "errors": errors,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "rps": round(len(latencies) / total, 1) if total else 0.0
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    previous = {(row["endpoint"], row["transport"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get((row["endpoint"], row["transport"]))
+        if old and old["p50_ms"] and row["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{row['transport']} {row['endpoint']}: p50 {old['p50_ms']}ms -> {row['p50_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--transports', nargs='+', choices=['test_client', 'socket'], default=['test_client', 'socket'])
+    parser.add_argument('--only', help='只运行名称匹配该正则表达式的端点')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='模拟后端每次COM调用的延迟')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的JSON结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='p50允许的相对增长')
+    args = parser.parse_args()
+
+    os.environ['CATIA_BACKEND'] = 'fake'
+    os.environ.setdefault('CATIA_SWEEP_DIR', tempfile.mkdtemp(prefix='catia-bench-sweeps-'))
+    import logging
+    logging.disable(logging.INFO)
+    import fake_pycatia
+    from flask_jwt_extended import create_access_token
+    from catia_mcp_service import app
+    fake_pycatia.configure_latency(args.latency_ms)
+    with app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='benchmark')}",
+                   'Content-Type': 'application/json'}
+
+    transports: Dict[str, Callable] = {'test_client': TestClientTransport, 'socket': SocketTransport}
+    results = []
+    state: Optional[Dict[str, str]] = None
+    print(f"{'endpoint':<26} {'transport':<12} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'rps':>9} {'errors':>7}")
+    for name in args.transports:
+        transport = transports[name](app, headers)
+        try:
+            if state is None:
+                state = _setup(transport)
+            for endpoint in endpoints(state):
+                if args.only and not re.search(args.only, endpoint.name):
+                    continue
+                row = measure(transport, endpoint, state, args.iterations, args.warmup)
+                results.append(row)
+                print(f"{row['endpoint']:<26} {row['transport']:<12} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                      f"{row['p99_ms']:>9} {row['rps']:>9} {row['errors']:>7}")
+        finally:
+            transport.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"回退: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""HTTP服务压测：比较waitress、gunicorn与Flask开发服务器（app.run）的吞吐量和延迟
+
+为每种服务实现启动一个使用模拟后端的服务进程，多个客户端线程各自保持一个keep-alive连接，
+反复请求GET /api/catia/system（经过COM执行器）。最后发送SIGTERM并统计优雅停机耗时。
+
+    python benchmarks/http_benchmark.py --servers dev waitress gunicorn --clients 16 --requests 200 --latency-ms 0
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"服务未在{timeout}秒内启动")
+
+
+def _token() -> str:
+    from flask_jwt_extended import create_access_token
+    from catia_mcp_service import app
+    with app.app_context():
+        return create_access_token(identity='benchmark')
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run(server: str, clients: int, requests: int, env: dict) -> dict:
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'catia_mcp_service.py'),
+                                '--server', server, '--host', '127.0.0.1', '--port', str(port)],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        headers = {'Authorization': f"Bearer {_token()}", 'Content-Type': 'application/json'}
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request('POST', '/api/catia/connect', body=b'{}', headers=headers)
+        connection.getresponse().read()
+        connection.close()
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(clients + 1)
+
+        def client():
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local, failed = [], 0
+            barrier.wait()
+            for _ in range(requests):
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', '/api/catia/system', headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                local.append(time.perf_counter() - start)
+            connection.close()
+            with lock:
+                latencies.extend(local)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_start = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutdown = time.perf_counter() - stop_start
+    result = {
+        "server": server, "requests": len(latencies), "errors": sum(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "shutdown_s": round(shutdown, 2)
+    }
+    print(f"{server:<9} requests={result['requests']:<6} errors={result['errors']:<4} rps={result['rps']:<8} "
+          f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+          f"shutdown={result['shutdown_s']}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', nargs='+', default=['dev', 'waitress', 'gunicorn'])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16, help='waitress/gunicorn的请求线程数')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='模拟后端每次COM调用的延迟')
+    parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+    args = parser.parse_args()
+    env = dict(os.environ, CATIA_BACKEND='fake', CATIA_FAKE_LATENCY_MS=str(args.latency_ms),
+               CATIA_HTTP_THREADS=str(args.threads))
+    os.environ.update(env)
+    results = [run(server, args.clients, args.requests, env) for server in args.servers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""CATIA进程池调度压测（使用fake_pycatia模拟后端，可在Linux上运行）
+
+每个客户端线程打开一个独立文档并反复读取参数，比较不同进程池大小下的吞吐量。
+
+    python benchmarks/pool_benchmark.py --sizes 1 2 4 --clients 8 --requests 50 --latency-ms 2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(size: int, clients: int, requests: int) -> float:
+    from catia_pool import CATIAWorkerPool
+    pool = CATIAWorkerPool(size, backend='fake', max_pending=clients * 2)
+    pool.connect()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(index: int):
+        barrier.wait()
+        file_path = f"/bench/part_{index}.CATPart"
+        pool.open_document(file_path)
+        # 按文档亲和性路由到打开该文档的工作进程
+        document = pool.for_document(file_path)
+        for _ in range(requests):
+            document.get_parameters()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    pool.shutdown()
+    print(f"pool_size={size:<3} clients={clients:<3} calls={clients * (requests + 1):<6} "
+          f"elapsed={elapsed:.3f}s  throughput={clients * (requests + 1) / elapsed:.1f} calls/s  "
+          f"documents_per_worker={[w['documents'] for w in stats['workers']]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='模拟后端每次COM调用的延迟')
+    args = parser.parse_args()
+    os.environ['CATIA_FAKE_LATENCY_MS'] = str(args.latency_ms)
+    for size in args.sizes:
+        run(size, args.clients, args.requests)
+
+
+if __name__ == '__main__':
+    main()
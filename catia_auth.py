@@ -0,0 +1,173 @@
+"""带缓存的认证：替代flask_jwt_extended.jwt_required
+
+批量客户端以很高的频率使用同一个令牌发送请求，每次都解码并做HMAC校验是重复的CPU开销。
+校验通过的令牌按签名放入有界LRU缓存，缓存项在令牌的exp到期时失效；命中时直接使用缓存的声明。
+缓存未命中或令牌无效时走flask_jwt_extended的完整校验流程，错误响应与原来一致。
+
+可选地，CATIA_SESSION_KEY_IDENTITIES中列出的受信任内部客户端可以用JWT换取服务端签发的会话密钥（请求头X-CATIA-Session-Key），
+会话密钥只保存在服务进程内存中，查表即可完成认证，重启后失效。
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app, g, request
+from flask_jwt_extended import verify_jwt_in_request
+from flask_jwt_extended.exceptions import NoAuthorizationError
+
+AUTH_CACHE_SIZE = int(os.getenv('CATIA_AUTH_CACHE_SIZE', '4096'))
+SESSION_KEYS_ENABLED = os.getenv('CATIA_SESSION_KEYS', '0') == '1'
+SESSION_KEY_TTL = float(os.getenv('CATIA_SESSION_KEY_TTL', str(8 * 3600)))
+SESSION_KEY_IDENTITIES = frozenset(filter(None, (i.strip() for i in os.getenv('CATIA_SESSION_KEY_IDENTITIES', '').split(','))))
+SESSION_KEY_HEADER = 'X-CATIA-Session-Key'
+
+
+class TokenCache:
+    """已校验令牌的LRU缓存，键为令牌签名，值为(完整令牌, 头部, 声明, 过期时间)"""
+
+    def __init__(self, capacity: int = AUTH_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Tuple[Dict, Dict]]:
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            # 只按签名查找时还要比较完整令牌，防止保留签名、篡改载荷的令牌命中缓存
+            if entry is None or entry[0] != token:
+                self.misses += 1
+                return None
+            if entry[3] is not None and entry[3] <= time.time():
+                del self._entries[signature]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, token: str, header: Dict, claims: Dict):
+        if self.capacity <= 0:
+            return
+        signature = token.rpartition('.')[2]
+        expires_at = claims.get('exp')
+        with self._lock:
+            self._entries[signature] = (token, header, claims, expires_at)
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"size": len(self._entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+
+class SessionKeyStore:
+    """服务端签发的会话密钥；只保存密钥的SHA-256摘要"""
+
+    def __init__(self, ttl: float = SESSION_KEY_TTL):
+        self.ttl = ttl
+        self._keys: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def issue(self, identity: str) -> Dict:
+        key = secrets.token_urlsafe(32)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._keys[self._digest(key)] = (identity, expires_at)
+        return {"session_key": key, "identity": identity, "expires_at": expires_at, "header": SESSION_KEY_HEADER}
+
+    def lookup(self, key: str) -> Optional[str]:
+        digest = self._digest(key)
+        with self._lock:
+            entry = self._keys.get(digest)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._keys[digest]
+                return None
+            return entry[0]
+
+    def revoke(self, key: str) -> bool:
+        with self._lock:
+            return self._keys.pop(self._digest(key), None) is not None
+
+    def revoke_identity(self, identity: str) -> int:
+        with self._lock:
+            digests = [digest for digest, (owner, _) in self._keys.items() if owner == identity]
+            for digest in digests:
+                del self._keys[digest]
+        return len(digests)
+
+
+token_cache = TokenCache()
+session_keys = SessionKeyStore()
+
+
+def may_issue_session_key(identity: Any) -> bool:
+    """只有CATIA_SESSION_KEY_IDENTITIES中列出的受信任身份可以申请，未配置时任何人都不能申请"""
+    return SESSION_KEYS_ENABLED and str(identity) in SESSION_KEY_IDENTITIES
+
+
+def _set_identity(header: Dict, claims: Dict, location: str):
+    # 与verify_jwt_in_request保存的字段一致，get_jwt_identity()等函数照常可用
+    g._jwt_extended_jwt_user = {"loaded_user": None}
+    g._jwt_extended_jwt_header = header
+    g._jwt_extended_jwt = claims
+    g._jwt_extended_jwt_location = location
+
+
+def _bearer_token() -> Optional[str]:
+    auth = request.headers.get('Authorization', '')
+    if auth[:7].lower() == 'bearer ':
+        return auth[7:].strip()
+    return None
+
+
+def authenticate():
+    """认证当前请求：会话密钥 → 令牌缓存 → 完整JWT校验"""
+    if request.method in current_app.config.get('JWT_EXEMPT_METHODS', ['OPTIONS']):
+        return
+    if SESSION_KEYS_ENABLED:
+        key = request.headers.get(SESSION_KEY_HEADER)
+        if key:
+            identity = session_keys.lookup(key)
+            if identity is None:
+                raise NoAuthorizationError("会话密钥无效或已过期")
+            _set_identity({}, {"sub": identity, "type": "session_key"}, 'session_key')
+            return
+    token = _bearer_token()
+    if token and token_cache.capacity > 0:
+        cached = token_cache.get(token)
+        if cached is not None:
+            _set_identity(cached[0], cached[1], 'headers')
+            return
+    verify_jwt_in_request()
+    if token and g.get('_jwt_extended_jwt_location') == 'headers':
+        token_cache.put(token, g._jwt_extended_jwt_header, g._jwt_extended_jwt)
+
+
+def jwt_required():
+    """与flask_jwt_extended.jwt_required()用法相同的装饰器，带令牌缓存和会话密钥支持"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            authenticate()
+            return current_app.ensure_sync(fn)(*args, **kwargs)
+        return decorator
+    return wrapper
@@ -0,0 +1,48 @@
+"""干涉检查的包围盒粗筛
+
+对全部部件的轴对齐包围盒做sweep-and-prune：先按x轴最小值排序，用二分查找得到x区间重叠的候选对，
+再向量化过滤y、z区间不重叠的对。只有粗筛留下的候选对才需要调用CATIA做精确干涉检查。
+装配组件的包围盒在组件自身坐标系中，先用placed_boxes按放置位置变换到装配坐标系。
+"""
+import numpy as np
+
+
+def candidate_pairs(boxes: np.ndarray, margin: float = 0.0) -> np.ndarray:
+    """返回包围盒相交（含margin间隙）的部件对，形状为(k, 2)，每行i < j
+
+    boxes形状为(n, 6)，每行为xmin, ymin, zmin, xmax, ymax, zmax
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+    n = len(boxes)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    lower = boxes[:, :3] - margin
+    upper = boxes[:, 3:] + margin
+    order = np.argsort(lower[:, 0], kind='stable')
+    lower, upper = lower[order], upper[order]
+    # 排序后第i个盒子只可能与x起点不超过其x终点的后续盒子相交
+    ends = np.searchsorted(lower[:, 0], upper[:, 0], side='right')
+    counts = np.maximum(ends - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), counts)
+    starts = np.cumsum(counts) - counts
+    second = first + 1 + np.arange(counts.sum()) - np.repeat(starts, counts)
+    overlap = np.all((lower[second, 1:] <= upper[first, 1:]) & (lower[first, 1:] <= upper[second, 1:]), axis=1)
+    pairs = np.stack([order[first[overlap]], order[second[overlap]]], axis=1)
+    pairs.sort(axis=1)
+    return pairs
+
+
+def placed_boxes(boxes: np.ndarray, placements: np.ndarray) -> np.ndarray:
+    """把组件坐标系中的包围盒按放置位置变换为装配坐标系中的轴对齐包围盒
+
+    boxes形状为(n, 6)；placements形状为(n, 12)，为CATIA的位置数组：X、Y、Z轴方向和原点。
+    变换8个角点后取最小和最大值，旋转后的包围盒会比实际形状稍大，只用于粗筛。
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+    placements = np.asarray(placements, dtype=np.float64).reshape(-1, 12)
+    # 每个盒子的8个角点，形状(n, 8, 3)
+    selectors = np.array([[(k >> axis) & 1 for axis in range(3)] for k in range(8)], dtype=bool)
+    corners = np.where(selectors[None, :, :], boxes[:, None, 3:], boxes[:, None, :3])
+    axes = placements[:, :9].reshape(-1, 3, 3)
+    world = np.einsum('nkc,ncd->nkd', corners, axes) + placements[:, None, 9:]
+    return np.concatenate([world.min(axis=1), world.max(axis=1)], axis=1)
@@ -0,0 +1,232 @@
+"""响应编码：按Accept内容协商选择序列化格式，按Accept-Encoding压缩较大的响应
+
+flask-restful按api.representations中注册的媒体类型做内容协商，这里注册以下格式：
+
+- application/json：有orjson时用orjson序列化（直接支持NumPy数组），否则用标准库json
+- application/msgpack：MessagePack（需要安装msgpack）
+- application/vnd.catia.packed+json：紧凑格式，较长的数值列表编码为base64的小端二进制数组，
+  字段相同的字典列表（如参数列表）转为按列存储，数值列再按数组打包
+- application/vnd.catia.packed+msgpack：同上，数组直接以二进制保存，不做base64
+
+客户端用unpack()还原紧凑格式。Accept为*/*或未指定时仍返回JSON。
+响应体不小于CATIA_COMPRESS_MIN_BYTES时，按客户端的Accept-Encoding用zstd（需要安装zstandard）或gzip压缩；
+SSE、NDJSON等流式响应不压缩。
+"""
+import base64
+import gzip
+import json
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import catia_metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_ENCODER = os.getenv('CATIA_JSON_ENCODER', 'orjson')
+PACK_MIN_LENGTH = int(os.getenv('CATIA_PACK_MIN_LENGTH', '16'))
+COMPRESS_ENABLED = os.getenv('CATIA_COMPRESS', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.getenv('CATIA_COMPRESS_MIN_BYTES', '4096'))
+GZIP_LEVEL = int(os.getenv('CATIA_GZIP_LEVEL', '6'))
+ZSTD_LEVEL = int(os.getenv('CATIA_ZSTD_LEVEL', '3'))
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+PACKED_JSON = 'application/vnd.catia.packed+json'
+PACKED_MSGPACK = 'application/vnd.catia.packed+msgpack'
+
+PACKED_KEY = '$packed'
+COLUMNS_KEY = '$columns'
+
+
+def _default(value: Any) -> Any:
+    """标准库json、orjson和msgpack都无法直接处理的类型"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps_json(data: Any, indent: bool = False) -> bytes:
+    if orjson is not None and JSON_ENCODER == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=_default, option=option)
+        except TypeError:
+            # 超出64位的整数等orjson不支持的值，交给标准库处理
+            pass
+    dumped = json.dumps(data, ensure_ascii=False, default=_default, indent=4 if indent else None)
+    return (dumped + "\n").encode('utf-8')
+
+
+def dumps_msgpack(data: Any) -> bytes:
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+_NUMERIC = frozenset((int, float, type(None)))
+_SEQUENCES = (list, tuple)
+_CONTAINERS = (dict, list, tuple, np.ndarray)
+
+
+def _types(values) -> set:
+    # map/set在C层遍历，比逐项isinstance的生成器表达式快得多
+    return set(map(type, values))
+
+
+def _numeric_array(values: List) -> Optional[np.ndarray]:
+    """数值列表（None视为NaN）或等长数值列表的列表转为数组，其它情况返回None"""
+    types = _types(values)
+    if types <= _NUMERIC:
+        flat, rows = values, None
+    elif all(issubclass(t, _SEQUENCES) for t in types):
+        if len(set(map(len, values))) != 1 or not values[0]:
+            return None
+        flat = [v for row in values for v in row]
+        rows = len(values)
+        types = _types(flat)
+        if not types <= _NUMERIC:
+            return None
+    else:
+        return None
+    if types == {int}:
+        array = np.array(flat, dtype='<i8')
+    else:
+        array = np.array([math.nan if v is None else v for v in flat] if type(None) in types else flat, dtype='<f8')
+    return array if rows is None else array.reshape(rows, -1)
+
+
+def _packed_array(array: np.ndarray, binary: bool) -> Dict:
+    dtype = '<i8' if array.dtype.kind in 'iub' else '<f8'
+    data = np.ascontiguousarray(array, dtype=dtype).tobytes()
+    return {PACKED_KEY: dtype, "shape": list(array.shape),
+            "data": data if binary else base64.b64encode(data).decode('ascii')}
+
+
+def pack(value: Any, binary: bool = False) -> Any:
+    """把响应中的数值数组和字典列表转为紧凑格式；binary为True时数组保存为bytes（用于MessagePack）"""
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'iuf':
+        return _packed_array(value, binary)
+    if isinstance(value, dict):
+        return {key: pack(item, binary) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) >= PACK_MIN_LENGTH:
+            array = _numeric_array(value)
+            if array is not None:
+                return _packed_array(array, binary)
+            types = _types(value)
+            # 字段及顺序都相同的字典列表按列存储
+            if all(issubclass(t, dict) for t in types) and len(set(map(tuple, value))) == 1:
+                columns = {key: pack([item[key] for item in value], binary) for key in value[0]}
+                return {COLUMNS_KEY: columns, "length": len(value)}
+        else:
+            types = _types(value)
+        if not any(issubclass(t, _CONTAINERS) for t in types):
+            return list(value)
+        return [pack(item, binary) for item in value]
+    return value
+
+
+def unpack(value: Any, arrays: bool = False) -> Any:
+    """还原pack()的结果；arrays为True时数值数组返回NumPy数组，否则返回列表（NaN还原为None）"""
+    if isinstance(value, dict):
+        if PACKED_KEY in value:
+            data = value["data"]
+            raw = data if isinstance(data, bytes) else base64.b64decode(data)
+            array = np.frombuffer(raw, dtype=value[PACKED_KEY]).reshape(value["shape"])
+            if arrays:
+                return array
+            if array.dtype.kind == 'f':
+                return np.where(np.isnan(array), None, array).tolist()
+            return array.tolist()
+        if COLUMNS_KEY in value:
+            columns = {key: unpack(column) for key, column in value[COLUMNS_KEY].items()}
+            return [dict(zip(columns, row)) for row in zip(*columns.values())] if columns \
+                else [{} for _ in range(value["length"])]
+        return {key: unpack(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unpack(item, arrays) for item in value]
+    return value
+
+
+def encoders() -> Dict[str, Callable[[Any], bytes]]:
+    """当前环境可用的媒体类型及其编码函数，JSON排在第一位作为默认格式"""
+    from flask import current_app
+
+    formats: Dict[str, Callable[[Any], bytes]] = {
+        JSON: lambda data: dumps_json(data, indent=current_app.debug),
+        PACKED_JSON: lambda data: dumps_json(pack(data)),
+    }
+    if msgpack is not None:
+        formats[MSGPACK] = dumps_msgpack
+        formats[PACKED_MSGPACK] = lambda data: dumps_msgpack(pack(data, binary=True))
+    return formats
+
+
+def _representation(encode: Callable[[Any], bytes]) -> Callable:
+    from flask import make_response
+
+    def output(data, code, headers=None):
+        response = make_response(encode(data), code)
+        response.headers.extend(headers or {})
+        return response
+    return output
+
+
+def compress(body: bytes, accept_encodings) -> Optional[Tuple[str, bytes]]:
+    """按Accept-Encoding选择zstd或gzip，返回(编码名, 压缩后的数据)；不应压缩时返回None"""
+    if zstandard is not None and accept_encodings.quality('zstd') > 0:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip', gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return None
+
+
+def install(app, api):
+    """注册各媒体类型的响应编码，并在请求结束时压缩较大的响应"""
+    from flask import request
+
+    # 保留api.representations原有的顺序，JSON仍是默认格式
+    for mediatype, encode in encoders().items():
+        api.representations[mediatype] = _representation(encode)
+
+    if not COMPRESS_ENABLED:
+        return
+
+    @app.after_request
+    def _compress(response):
+        if response.direct_passthrough or response.is_streamed or response.status_code in (204, 304) \
+                or response.status_code < 200 or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        with catia_metrics.phase('compress'):
+            compressed = compress(body, request.accept_encodings)
+        if compressed is None or len(compressed[1]) >= len(body):
+            return response
+        response.set_data(compressed[1])
+        response.headers['Content-Encoding'] = compressed[0]
+        return response
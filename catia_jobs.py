@@ -0,0 +1,196 @@
+"""异步任务：长时间运行的CATIA操作由固定数量的后台工作线程执行
+
+提交后立即返回任务ID，客户端通过轮询或SSE事件流获取状态和结果。
+任务状态保存在进程内，结束超过TTL的任务会被清理；排队的任务数量有上限，队列满时拒绝提交（HTTP 429）。
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from werkzeug.exceptions import TooManyRequests
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL = float(os.getenv('CATIA_JOB_TTL', '3600'))
+MAX_HEAVY_JOBS = int(os.getenv('CATIA_MAX_HEAVY_JOBS', '2'))
+MAX_QUEUED_JOBS = int(os.getenv('CATIA_MAX_QUEUED_JOBS', '32'))
+SSE_HEARTBEAT = 15.0
+
+TERMINAL_STATES = frozenset({'succeeded', 'failed', 'cancelled'})
+
+
+class JobQueueFullError(TooManyRequests):
+    """等待执行的任务已达上限，对应HTTP 429"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"status": "error", "message": "任务队列已满，请稍后重试"}
+
+
+class Job:
+    def __init__(self, operation: str, owner: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.owner = owner
+        self.status = 'pending'
+        self.result: Any = None
+        self.message: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        self.revision = 0
+        self.on_finish: Optional[Callable[[], None]] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "result": self.result,
+            "message": self.message,
+            "cancel_requested": self.cancel_requested.is_set(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobStore:
+    """进程内任务存储；max_concurrent个工作线程按提交顺序执行任务，最多max_queued个任务等待"""
+
+    def __init__(self, max_concurrent: int = MAX_HEAVY_JOBS, ttl: float = JOB_TTL,
+                 max_queued: int = MAX_QUEUED_JOBS):
+        self.ttl = ttl
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[Tuple[Job, Callable[[Job], tuple]]] = deque()
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, operation: str, fn: Callable[[Job], tuple], owner: Optional[str] = None,
+               on_finish: Optional[Callable[[], None]] = None) -> Job:
+        """提交任务；fn接收Job对象，返回(success, result)；on_finish在任务结束（包括排队时被取消）后调用一次。
+        等待的任务已达上限时抛出JobQueueFullError，此时不会调用on_finish"""
+        job = Job(operation, owner)
+        job.on_finish = on_finish
+        with self._condition:
+            self._expire()
+            if len(self._queue) >= self.max_queued:
+                raise JobQueueFullError()
+            self._jobs[job.id] = job
+            self._queue.append((job, fn))
+            # 工作线程在第一次提交时启动，之后常驻
+            while len(self._workers) < self.max_concurrent:
+                worker = threading.Thread(target=self._work, name=f"catia-job-worker-{len(self._workers)}",
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                job, fn = self._queue.popleft()
+            self._run(job, fn)
+
+    def _run(self, job: Job, fn: Callable[[Job], tuple]):
+        if job.cancel_requested.is_set():
+            self._finish(job, 'cancelled', message="任务已取消")
+            return
+        self._update(job, status='running', started_at=time.time())
+        try:
+            success, result = fn(job)
+        except Exception as e:
+            logger.error("任务%s执行失败: %s", job.id, e)
+            self._finish(job, 'failed', message=str(e))
+            return
+        if job.cancel_requested.is_set():
+            # CATIA调用无法中途打断，取消请求在调用返回后生效，结果被丢弃
+            self._finish(job, 'cancelled', message="任务已取消")
+        elif success:
+            self._finish(job, 'succeeded', result=result)
+        else:
+            self._finish(job, 'failed', message=result)
+
+    def _update(self, job: Job, **changes):
+        with self._condition:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.revision += 1
+            self._condition.notify_all()
+
+    def _finish(self, job: Job, status: str, **changes):
+        self._update(job, status=status, finished_at=time.time(), **changes)
+        if job.on_finish is not None:
+            try:
+                job.on_finish()
+            except Exception as e:
+                logger.error("任务%s的结束回调失败: %s", job.id, e)
+
+    def _expire(self):
+        deadline = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < deadline]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        with self._condition:
+            self._expire()
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def list(self, owner: Optional[str] = None) -> List[Job]:
+        with self._condition:
+            self._expire()
+            return [job for job in self._jobs.values() if job.owner == owner]
+
+    def cancel(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        job = self.get(job_id, owner)
+        if job is None or job.status in TERMINAL_STATES:
+            return job
+        job.cancel_requested.set()
+        with self._condition:
+            queued = [entry for entry in self._queue if entry[0] is job]
+            for entry in queued:
+                self._queue.remove(entry)
+        if queued:
+            # 还在排队的任务直接结束，释放队列名额
+            self._finish(job, 'cancelled', message="任务已取消")
+        else:
+            self._update(job)
+        return job
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {"workers": len(self._workers), "queued": len(self._queue),
+                    "running": sum(1 for job in self._jobs.values() if job.status == 'running')}
+
+    def events(self, job: Job) -> Iterator[str]:
+        """以SSE格式推送任务状态变化，任务结束后关闭事件流"""
+        revision = -1
+        while True:
+            with self._condition:
+                if job.revision == revision:
+                    self._condition.wait_for(lambda: job.revision != revision, timeout=SSE_HEARTBEAT)
+                if job.revision == revision:
+                    snapshot = None
+                else:
+                    revision = job.revision
+                    snapshot = job.to_dict()
+            if snapshot is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if snapshot['status'] in TERMINAL_STATES:
+                return
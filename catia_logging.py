@@ -0,0 +1,187 @@
+"""非阻塞的结构化日志
+
+所有日志记录先放入内存队列（QueueHandler），由后台的QueueListener线程写入控制台和按大小或时间轮转的日志文件，
+请求线程不再直接写磁盘。日志格式默认为每行一个JSON对象，包含请求id、操作名和耗时；
+请求id取自请求头X-Request-ID，没有时自动生成，并在响应头中返回。
+
+CATIA调用完成后记录一条操作日志，可以按操作设置采样率，让高频且成功的调用只按比例记录，失败的调用总是记录。
+进程池的工作进程只输出到控制台（stderr继承自主进程），避免多个进程同时轮转同一个文件。
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Optional
+
+LOG_FILE = os.getenv('CATIA_LOG_FILE', 'catia_mcp.log')
+LOG_LEVEL = os.getenv('CATIA_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('CATIA_LOG_FORMAT', 'json')
+LOG_MAX_BYTES = int(os.getenv('CATIA_LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('CATIA_LOG_BACKUP_COUNT', '10'))
+LOG_ROTATE_WHEN = os.getenv('CATIA_LOG_ROTATE_WHEN', '')
+LOG_SAMPLE_DEFAULT = float(os.getenv('CATIA_LOG_SAMPLE_DEFAULT', '1'))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def _parse_rates(value: str) -> Dict[str, float]:
+    """解析形如"create_point=0.01,get_parameters=0.1"的采样率配置"""
+    rates = {}
+    for item in value.split(','):
+        if '=' in item:
+            operation, rate = item.rsplit('=', 1)
+            rates[operation.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+LOG_SAMPLE_RATES = _parse_rates(os.getenv('CATIA_LOG_SAMPLE', ''))
+
+operation_logger = logging.getLogger('catia.operations')
+request_logger = logging.getLogger('catia.requests')
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar('catia_request_id', default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def bind_request_id(request_id: Optional[str]):
+    """在COM线程等非请求线程中执行某个请求提交的任务时，让其日志带上该请求的id"""
+    _request_id.set(request_id)
+
+
+class RequestContextFilter(logging.Filter):
+    """把当前请求id附加到日志记录上，需要在产生日志的线程中执行"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，extra中的operation、duration_ms等字段原样保留"""
+
+    FIELDS = ('request_id', 'operation', 'outcome', 'duration_ms', 'wait_ms', 'session',
+              'method', 'path', 'status')
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _formatter() -> logging.Formatter:
+    return JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+
+
+def _file_handler() -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(LOG_FILE, when=LOG_ROTATE_WHEN,
+                                                         backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES,
+                                                backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+
+
+def setup_logging():
+    """安装队列日志；重复调用时不做任何事"""
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    root.setLevel(LOG_LEVEL)
+    formatter = _formatter()
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if multiprocessing.parent_process() is None:
+        handlers.append(_file_handler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(RequestContextFilter())
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台写入线程，写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def sampled(operation: str) -> bool:
+    rate = LOG_SAMPLE_RATES.get(operation, LOG_SAMPLE_DEFAULT)
+    return rate >= 1.0 or random.random() < rate
+
+
+def log_operation(operation: str, elapsed: float, wait: float, outcome: str, session: Optional[str] = None,
+                  request_id: Optional[str] = None):
+    """记录一次CATIA调用；成功的调用按采样率记录，失败的调用总是以WARNING记录"""
+    if outcome == 'success':
+        if not operation_logger.isEnabledFor(logging.INFO) or not sampled(operation):
+            return
+        level = logging.INFO
+    else:
+        level = logging.WARNING
+    extra = {"operation": operation, "outcome": outcome, "duration_ms": round(elapsed * 1000, 3),
+             "wait_ms": round(wait * 1000, 3), "session": session}
+    if request_id is not None:
+        extra["request_id"] = request_id
+    operation_logger.log(level, "CATIA调用%s: %s", "完成" if outcome == 'success' else "失败", operation, extra=extra)
+
+
+def install(app):
+    """为每个请求分配请求id，并在请求结束时记录一条访问日志（按路由规则采样）"""
+    from flask import g, request
+
+    @app.before_request
+    def _assign_request_id():
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_id = request_id
+        g.request_start = time.perf_counter()
+        _request_id.set(request_id)
+
+    @app.after_request
+    def _log_request(response):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return response
+        response.headers['X-Request-ID'] = request_id
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if response.status_code >= 400 or (request_logger.isEnabledFor(logging.INFO) and sampled(rule)):
+            request_logger.log(logging.WARNING if response.status_code >= 500 else logging.INFO,
+                               "%s %s %s", request.method, request.path, response.status_code,
+                               extra={"operation": rule, "method": request.method, "path": request.path,
+                                      "status": response.status_code,
+                                      "duration_ms": round((time.perf_counter() - g.request_start) * 1000, 3)})
+        return response
+
+    @app.teardown_request
+    def _clear_request_id(exc):
+        _request_id.set(None)
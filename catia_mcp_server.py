@@ -0,0 +1,247 @@
+"""原生MCP（Model Context Protocol）服务端
+
+实现MCP的JSON-RPC消息处理，支持两种传输方式：
+- stdio：每行一个JSON-RPC消息，由MCP客户端以子进程方式启动
+- Streamable HTTP：POST /mcp，客户端接受text/event-stream时以SSE流式返回进度通知和结果
+
+工具清单来自操作注册表（catia_operations），每个工具调用都通过会话的CATIA服务执行，
+与REST API共享COM执行器（或进程池）和会话状态。多个工具调用可以同时进行；
+请求带有progressToken时，长时间运行的调用会定期发送notifications/progress。
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from catia_operations import OPERATIONS, tool_manifest
+
+logger = logging.getLogger(__name__)
+
+MCP_MAX_CONCURRENCY = int(os.getenv('CATIA_MCP_MAX_CONCURRENCY', '8'))
+MCP_PROGRESS_INTERVAL = float(os.getenv('CATIA_MCP_PROGRESS_INTERVAL', '1'))
+PROTOCOL_VERSIONS = ('2025-06-18', '2025-03-26', '2024-11-05')
+SERVER_INFO = {"name": "catia-mcp-service", "version": "1.0"}
+
+# JSON-RPC错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+
+class MCPError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _error(message_id: Any, code: int, message: str) -> Dict:
+    return {"jsonrpc": "2.0", "id": message_id, "error": {"code": code, "message": message}}
+
+
+class MCPServer:
+    """MCP消息处理；service_for根据身份返回该会话的CATIA服务"""
+
+    def __init__(self, service_for: Callable[[str], Any], max_concurrency: int = MCP_MAX_CONCURRENCY):
+        self._service_for = service_for
+        self._tools = {operation.tool_name: operation for operation in OPERATIONS.values()}
+        self._manifest = tool_manifest()
+        self._calls = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='catia-mcp-call')
+        # 正在处理的请求和其中已被客户端取消的请求，键为(身份, 请求ID)，请求结束时移除
+        self._inflight: set = set()
+        self._cancelled: set = set()
+        self._lock = threading.Lock()
+
+    def handle(self, message: Any, identity: str, notify: Callable[[Dict], None]) -> Optional[Dict]:
+        """处理一条消息，返回响应；通知和客户端发来的响应没有返回值。notify用于发送进度通知"""
+        if not isinstance(message, dict) or message.get('jsonrpc') != '2.0':
+            return _error(None, INVALID_REQUEST, "无效的JSON-RPC消息")
+        method = message.get('method')
+        message_id = message.get('id')
+        if method is None:
+            # 客户端对服务端请求的响应，本服务不发起请求
+            return None
+        if 'id' not in message:
+            self._notification(method, message.get('params') or {}, identity)
+            return None
+        if not isinstance(message_id, (str, int)):
+            return _error(None, INVALID_REQUEST, "请求ID必须是字符串或整数")
+        key = (identity, message_id)
+        with self._lock:
+            self._inflight.add(key)
+        try:
+            result = self._request(method, message.get('params') or {}, identity, notify)
+        except MCPError as e:
+            return _error(message_id, e.code, e.message)
+        except Exception as e:
+            logger.error("处理MCP请求%s失败: %s", method, e)
+            return _error(message_id, INVALID_REQUEST, str(e))
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+                cancelled = key in self._cancelled
+                self._cancelled.discard(key)
+        if cancelled:
+            # 已被客户端取消的请求不再响应
+            return None
+        return {"jsonrpc": "2.0", "id": message_id, "result": result}
+
+    def _notification(self, method: str, params: Dict, identity: str):
+        if method == 'notifications/cancelled':
+            key = (identity, params.get('requestId'))
+            with self._lock:
+                # 只记录正在处理的请求，未知或已结束的请求ID直接忽略
+                if isinstance(key[1], (str, int)) and key in self._inflight:
+                    self._cancelled.add(key)
+
+    def _request(self, method: str, params: Dict, identity: str, notify: Callable[[Dict], None]) -> Dict:
+        if method == 'initialize':
+            requested = params.get('protocolVersion')
+            # MCP客户端直接调用工具，初始化时连接CATIA，无需单独的connect步骤
+            try:
+                self._service_for(identity).connect()
+            except Exception as e:
+                logger.error("MCP会话连接CATIA失败: %s", e)
+            return {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": SERVER_INFO
+            }
+        if method == 'ping':
+            return {}
+        if method == 'tools/list':
+            return {"tools": self._manifest}
+        if method == 'tools/call':
+            return self._call_tool(params, identity, notify)
+        raise MCPError(METHOD_NOT_FOUND, f"不支持的方法: {method}")
+
+    def _call_tool(self, params: Dict, identity: str, notify: Callable[[Dict], None]) -> Dict:
+        operation = self._tools.get(params.get('name'))
+        if operation is None:
+            raise MCPError(INVALID_PARAMS, f"未知工具: {params.get('name')}")
+        try:
+            args = operation.bind(params.get('arguments') or {})
+        except ValueError as e:
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        service = self._service_for(identity)
+        future = self._calls.submit(getattr(service, operation.method), *args)
+        progress_token = (params.get('_meta') or {}).get('progressToken')
+        start = time.perf_counter()
+        while True:
+            try:
+                success, result = future.result(timeout=MCP_PROGRESS_INTERVAL)
+                break
+            except FutureTimeoutError:
+                if progress_token is not None:
+                    elapsed = time.perf_counter() - start
+                    notify({"jsonrpc": "2.0", "method": "notifications/progress",
+                            "params": {"progressToken": progress_token, "progress": round(elapsed, 1),
+                                       "message": f"{operation.tool_name}已运行{elapsed:.0f}秒"}})
+            except Exception as e:
+                success, result = False, getattr(e, 'data', {}).get('message') or str(e)
+                break
+        if not success:
+            return {"content": [{"type": "text", "text": str(result)}], "isError": True}
+        structured = result if isinstance(result, dict) else {"result": result}
+        return {"content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False, default=str)}],
+                "structuredContent": structured, "isError": False}
+
+    def handle_batch(self, payload: Any, identity: str, emit: Callable[[Dict], None]):
+        """并发处理一条或一批消息，响应和进度通知都通过emit输出，全部完成后返回"""
+        messages = payload if isinstance(payload, list) else [payload]
+        threads = []
+        for message in messages:
+            def run(message=message):
+                response = self.handle(message, identity, emit)
+                if response is not None:
+                    emit(response)
+            if isinstance(message, dict) and message.get('method') == 'tools/call' and 'id' in message:
+                thread = threading.Thread(target=run, name='catia-mcp-request', daemon=True)
+                thread.start()
+                threads.append(thread)
+            else:
+                run()
+        for thread in threads:
+            thread.join()
+
+    def serve_stdio(self, identity: str, stdin=None, stdout=None):
+        """stdio传输：逐行读取JSON-RPC消息，工具调用在后台线程中并发执行，输出按行加锁写出"""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+        write_lock = threading.Lock()
+
+        def emit(message: Dict):
+            line = json.dumps(message, ensure_ascii=False, default=str)
+            with write_lock:
+                stdout.write(line + "\n")
+                stdout.flush()
+
+        for line in stdin:
+            if not line.strip():
+                continue
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                emit(_error(None, PARSE_ERROR, "JSON解析失败"))
+                continue
+            if self.has_tool_calls(payload):
+                threading.Thread(target=self.handle_batch, args=(payload, identity, emit),
+                                 name='catia-mcp-stdio', daemon=True).start()
+            else:
+                # initialize等消息按顺序同步处理，保证后续工具调用之前已经完成
+                self.handle_batch(payload, identity, emit)
+
+    def stream_http(self, payload: Any, identity: str) -> Iterator[str]:
+        """Streamable HTTP的SSE响应：边执行边输出进度通知和结果"""
+        events: List[Dict] = []
+        condition = threading.Condition()
+        done = threading.Event()
+
+        def emit(message: Dict):
+            with condition:
+                events.append(message)
+                condition.notify()
+
+        def run():
+            try:
+                self.handle_batch(payload, identity, emit)
+            finally:
+                with condition:
+                    done.set()
+                    condition.notify()
+
+        threading.Thread(target=run, name='catia-mcp-http', daemon=True).start()
+        while True:
+            with condition:
+                condition.wait_for(lambda: events or done.is_set())
+                pending, events[:] = list(events), []
+                finished = done.is_set()
+            for message in pending:
+                yield f"event: message\ndata: {json.dumps(message, ensure_ascii=False, default=str)}\n\n"
+            if finished and not pending:
+                return
+
+    @staticmethod
+    def has_requests(payload: Any) -> bool:
+        messages = payload if isinstance(payload, list) else [payload]
+        return any(isinstance(m, dict) and 'id' in m and 'method' in m for m in messages)
+
+    @staticmethod
+    def has_tool_calls(payload: Any) -> bool:
+        messages = payload if isinstance(payload, list) else [payload]
+        return any(isinstance(m, dict) and m.get('method') == 'tools/call' for m in messages)
+
+    @staticmethod
+    def is_initialize(payload: Any) -> bool:
+        messages = payload if isinstance(payload, list) else [payload]
+        return any(isinstance(m, dict) and m.get('method') == 'initialize' for m in messages)
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
@@ -1,392 +1,335 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_restful import Api, Resource
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required
-import pycatia
+from flask_jwt_extended import JWTManager, get_jwt, get_jwt_identity
+from werkzeug.exceptions import GatewayTimeout, TooManyRequests
+import argparse
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional
 import json
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('catia_mcp.log'),
-        logging.StreamHandler()
-    ]
-)
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from catia_jobs import JobQueueFullError, JobStore
+import catia_auth
+import catia_encoding
+import catia_logging
+import catia_metrics
+import catia_server
+import catia_snapshots
+import catia_tree
+from catia_mcp_server import MCPServer
+from catia_operations import OPERATIONS, openapi_document, tool_manifest
+from catia_pipeline import PIPELINE_MAX_STEPS, run_pipeline
+from catia_sessions import FairQueue, SessionManager
+from catia_sweep import Sweep, SweepConflictError, csv_lines, load_sweep, ndjson_lines, sweep_headers
+
+# 配置日志：经队列由后台线程写入控制台和轮转的日志文件，见catia_logging.py
+catia_logging.setup_logging()
 logger = logging.getLogger(__name__)
 
 # 加载环境变量
 load_dotenv()
 
+# CATIA后端和服务类，配置在load_dotenv之后读取
+from catia_service import CATIA_BACKEND, CATIAService
+
 app = Flask(__name__)
 CORS(app)
 api = Api(app)
+catia_logging.install(app)
+# 按Accept选择JSON（orjson）、MessagePack或紧凑数组格式，较大的响应按Accept-Encoding压缩
+catia_encoding.install(app, api)
 
 # JWT配置
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 jwt = JWTManager(app)
+# 已校验的令牌按签名缓存到exp为止，受信任的客户端可以使用服务端签发的会话密钥（见catia_auth.py）
+jwt_required = catia_auth.jwt_required
+
+# 运行时指标：请求各阶段计时，认证耗时通过包装jwt_required记录
+if catia_metrics.METRICS_ENABLED:
+    catia_metrics.install(app, api)
+    jwt_required = catia_metrics.timed_decorator(jwt_required, 'auth')
+
+# COM执行器配置
+EXECUTOR_QUEUE_SIZE = int(os.getenv('CATIA_EXECUTOR_QUEUE_SIZE', '64'))
+EXECUTOR_TIMEOUT = float(os.getenv('CATIA_EXECUTOR_TIMEOUT', '600'))
+EXECUTOR_COALESCE = os.getenv('CATIA_EXECUTOR_COALESCE', '1') == '1'
+
+class ExecutorBusyError(TooManyRequests):
+    """COM执行器队列已满，对应HTTP 429"""
 
-class CATIAService:
     def __init__(self):
-        self.catia = None
-        self.documents = None
-        self.part_document = None
-        self.part = None
-        self.hybrid_bodies = None
-        self.parameters = None
-        self.sketches = None
-        self.bodies = None
-        self.measure = None
-        self.analysis = None
-        self.drawing = None
-        self.product = None
-        self.system = None
-        
-    def connect(self):
-        try:
-            self.catia = pycatia.catia_application()
-            self.documents = self.catia.documents
-            self.system = self.catia.system
-            return True
-        except Exception as e:
-            logger.error(f"连接CATIA失败: {str(e)}")
-            return False
-
-    def open_document(self, file_path: str) -> bool:
-        try:
-            self.part_document = self.documents.open(file_path)
-            self._initialize_document_objects()
-            return True
-        except Exception as e:
-            logger.error(f"打开文档失败: {str(e)}")
-            return False
-
-    def _initialize_document_objects(self):
-        """初始化文档相关的对象"""
-        if self.part_document:
-            if self.part_document.type == "Part":
-                self.part = self.part_document.part
-                self.hybrid_bodies = self.part.hybrid_bodies
-                self.parameters = self.part.parameters
-                self.sketches = self.part.sketches
-                self.bodies = self.part.bodies
-                self.measure = self.part.measure
-                self.analysis = self.part.analysis
-            elif self.part_document.type == "Product":
-                self.product = self.part_document.product
-            elif self.part_document.type == "Drawing":
-                self.drawing = self.part_document.drawing
-
-    # 基础文档操作
-    def create_new_document(self, doc_type: str) -> tuple[bool, str]:
-        try:
-            if doc_type == "Part":
-                self.part_document = self.documents.add("Part")
-            elif doc_type == "Product":
-                self.part_document = self.documents.add("Product")
-            elif doc_type == "Drawing":
-                self.part_document = self.documents.add("Drawing")
-            else:
-                return False, "不支持的文档类型"
-            self._initialize_document_objects()
-            return True, "文档创建成功"
-        except Exception as e:
-            logger.error(f"创建文档失败: {str(e)}")
-            return False, f"创建文档失败: {str(e)}"
-
-    def save_document(self, file_path: Optional[str] = None) -> tuple[bool, str]:
-        try:
-            if not self.part_document:
-                return False, "没有活动的文档"
-            if file_path:
-                self.part_document.save_as(file_path)
-            else:
-                self.part_document.save()
-            return True, "文档保存成功"
-        except Exception as e:
-            logger.error(f"保存文档失败: {str(e)}")
-            return False, f"保存文档失败: {str(e)}"
+        super().__init__()
+        self.data = {"status": "error", "message": "CATIA请求队列已满，请稍后重试"}
 
-    def close_document(self) -> tuple[bool, str]:
-        try:
-            if self.part_document:
-                self.part_document.close()
-                self._reset_document_objects()
-                return True, "文档关闭成功"
-            return False, "没有活动的文档"
-        except Exception as e:
-            logger.error(f"关闭文档失败: {str(e)}")
-            return False, f"关闭文档失败: {str(e)}"
-
-    def _reset_document_objects(self):
-        """重置所有文档相关的对象"""
-        self.part_document = None
-        self.part = None
-        self.hybrid_bodies = None
-        self.parameters = None
-        self.sketches = None
-        self.bodies = None
-        self.measure = None
-        self.analysis = None
-        self.drawing = None
-        self.product = None
-
-    # 参数操作
-    def get_parameters(self) -> tuple[bool, Union[List[Dict], str]]:
-        try:
-            if not self.parameters:
-                return False, "没有活动的文档或参数"
-            params = []
-            for i in range(1, self.parameters.count + 1):
-                param = self.parameters.item(i)
-                params.append({
-                    "name": param.name,
-                    "value": param.value,
-                    "type": param.type
-                })
-            return True, params
-        except Exception as e:
-            logger.error(f"获取参数失败: {str(e)}")
-            return False, f"获取参数失败: {str(e)}"
-
-    def set_parameter(self, name: str, value: Any) -> tuple[bool, str]:
-        try:
-            if not self.parameters:
-                return False, "没有活动的文档或参数"
-            param = self.parameters.item(name)
-            param.value = value
-            return True, "参数设置成功"
-        except Exception as e:
-            logger.error(f"设置参数失败: {str(e)}")
-            return False, f"设置参数失败: {str(e)}"
-
-    # 几何操作
-    def create_point(self, x: float, y: float, z: float) -> tuple[bool, str]:
-        try:
-            if not self.hybrid_bodies:
-                return False, "没有活动的文档或几何体"
-            point = self.hybrid_bodies.add()
-            point.add_point(x, y, z)
-            return True, "点创建成功"
-        except Exception as e:
-            logger.error(f"创建点失败: {str(e)}")
-            return False, f"创建点失败: {str(e)}"
-
-    def create_line(self, start_point: List[float], end_point: List[float]) -> tuple[bool, str]:
-        try:
-            if not self.hybrid_bodies:
-                return False, "没有活动的文档或几何体"
-            line = self.hybrid_bodies.add()
-            line.add_line(start_point, end_point)
-            return True, "线创建成功"
-        except Exception as e:
-            logger.error(f"创建线失败: {str(e)}")
-            return False, f"创建线失败: {str(e)}"
-
-    def create_plane(self, origin: List[float], normal: List[float]) -> tuple[bool, str]:
-        try:
-            if not self.hybrid_bodies:
-                return False, "没有活动的文档或几何体"
-            plane = self.hybrid_bodies.add()
-            plane.add_plane(origin, normal)
-            return True, "平面创建成功"
-        except Exception as e:
-            logger.error(f"创建平面失败: {str(e)}")
-            return False, f"创建平面失败: {str(e)}"
-
-    # 草图操作
-    def create_sketch(self, plane: Any) -> tuple[bool, str]:
-        try:
-            if not self.sketches:
-                return False, "没有活动的文档或草图"
-            sketch = self.sketches.add(plane)
-            return True, "草图创建成功"
-        except Exception as e:
-            logger.error(f"创建草图失败: {str(e)}")
-            return False, f"创建草图失败: {str(e)}"
-
-    def add_line_to_sketch(self, sketch: Any, start_point: List[float], end_point: List[float]) -> tuple[bool, str]:
-        try:
-            if not sketch:
-                return False, "草图不存在"
-            line = sketch.add_line(start_point, end_point)
-            return True, "线添加成功"
-        except Exception as e:
-            logger.error(f"添加线失败: {str(e)}")
-            return False, f"添加线失败: {str(e)}"
-
-    def add_circle_to_sketch(self, sketch: Any, center: List[float], radius: float) -> tuple[bool, str]:
-        try:
-            if not sketch:
-                return False, "草图不存在"
-            circle = sketch.add_circle(center, radius)
-            return True, "圆添加成功"
-        except Exception as e:
-            logger.error(f"添加圆失败: {str(e)}")
-            return False, f"添加圆失败: {str(e)}"
-
-    # 特征操作
-    def create_pad(self, sketch: Any, length: float) -> tuple[bool, str]:
-        try:
-            if not self.bodies:
-                return False, "没有活动的文档或实体"
-            pad = self.bodies.add_pad(sketch, length)
-            return True, "凸台创建成功"
-        except Exception as e:
-            logger.error(f"创建凸台失败: {str(e)}")
-            return False, f"创建凸台失败: {str(e)}"
-
-    def create_pocket(self, sketch: Any, length: float) -> tuple[bool, str]:
-        try:
-            if not self.bodies:
-                return False, "没有活动的文档或实体"
-            pocket = self.bodies.add_pocket(sketch, length)
-            return True, "凹槽创建成功"
-        except Exception as e:
-            logger.error(f"创建凹槽失败: {str(e)}")
-            return False, f"创建凹槽失败: {str(e)}"
-
-    def create_revolution(self, sketch: Any, angle: float) -> tuple[bool, str]:
-        try:
-            if not self.bodies:
-                return False, "没有活动的文档或实体"
-            revolution = self.bodies.add_revolution(sketch, angle)
-            return True, "旋转体创建成功"
-        except Exception as e:
-            logger.error(f"创建旋转体失败: {str(e)}")
-            return False, f"创建旋转体失败: {str(e)}"
-
-    # 装配操作
-    def add_component(self, file_path: str, position: List[float] = [0, 0, 0]) -> tuple[bool, str]:
-        try:
-            if not self.product:
-                return False, "当前文档不是装配体"
-            component = self.product.add_component(file_path)
-            component.move(position)
-            return True, "组件添加成功"
-        except Exception as e:
-            logger.error(f"添加组件失败: {str(e)}")
-            return False, f"添加组件失败: {str(e)}"
-
-    def create_constraint(self, component1: str, component2: str, constraint_type: str, 
-                         reference1: Any, reference2: Any) -> tuple[bool, str]:
-        try:
-            if not self.product:
-                return False, "当前文档不是装配体"
-            constraint = self.product.add_constraint(component1, component2, constraint_type, reference1, reference2)
-            return True, "约束创建成功"
-        except Exception as e:
-            logger.error(f"创建约束失败: {str(e)}")
-            return False, f"创建约束失败: {str(e)}"
-
-    # 测量操作
-    def measure_distance(self, point1: List[float], point2: List[float]) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.measure:
-                return False, "没有活动的文档或测量工具"
-            distance = self.measure.distance(point1, point2)
-            return True, {"distance": distance}
-        except Exception as e:
-            logger.error(f"测量距离失败: {str(e)}")
-            return False, f"测量距离失败: {str(e)}"
-
-    def measure_angle(self, line1: Any, line2: Any) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.measure:
-                return False, "没有活动的文档或测量工具"
-            angle = self.measure.angle(line1, line2)
-            return True, {"angle": angle}
-        except Exception as e:
-            logger.error(f"测量角度失败: {str(e)}")
-            return False, f"测量角度失败: {str(e)}"
-
-    def measure_area(self, face: Any) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.measure:
-                return False, "没有活动的文档或测量工具"
-            area = self.measure.area(face)
-            return True, {"area": area}
-        except Exception as e:
-            logger.error(f"测量面积失败: {str(e)}")
-            return False, f"测量面积失败: {str(e)}"
-
-    def measure_volume(self, body: Any) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.measure:
-                return False, "没有活动的文档或测量工具"
-            volume = self.measure.volume(body)
-            return True, {"volume": volume}
-        except Exception as e:
-            logger.error(f"测量体积失败: {str(e)}")
-            return False, f"测量体积失败: {str(e)}"
-
-    # 分析操作
-    def analyze_mass(self, body: Any) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.analysis:
-                return False, "没有活动的文档或分析工具"
-            mass = self.analysis.mass(body)
-            return True, {"mass": mass}
-        except Exception as e:
-            logger.error(f"质量分析失败: {str(e)}")
-            return False, f"质量分析失败: {str(e)}"
-
-    def check_interference(self, body1: Any, body2: Any) -> tuple[bool, Union[Dict, str]]:
-        try:
-            if not self.analysis:
-                return False, "没有活动的文档或分析工具"
-            interference = self.analysis.interference(body1, body2)
-            return True, {"interference": interference}
-        except Exception as e:
-            logger.error(f"干涉检查失败: {str(e)}")
-            return False, f"干涉检查失败: {str(e)}"
-
-    # 工程图操作
-    def create_drawing_view(self, name: str, type: str = "Front") -> tuple[bool, str]:
+class ExecutorTimeoutError(GatewayTimeout):
+    """等待COM执行器结果超时，对应HTTP 504"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"status": "error", "message": "等待CATIA执行结果超时"}
+
+class _COMTask:
+    __slots__ = ('fn', 'args', 'kwargs', 'read_only', 'key', 'future', 'enqueued_at', 'metrics',
+                 'session', 'request_id')
+
+    def __init__(self, fn, args, kwargs, read_only: bool, session: Optional[str] = None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.read_only = read_only
+        self.key = None
+        if read_only:
+            # 保存完整的调用元组，合并时用==比较；只比较哈希值会把哈希冲突的不同调用（如hash(-1) == hash(-2)）合并
+            key = (fn, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+                self.key = key
+            except TypeError:
+                self.read_only = False
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        # 提交任务的HTTP请求的计时，COM线程执行后把排队和执行时间记到该请求上
+        self.metrics = catia_metrics.current()
+        self.session = session
+        self.request_id = catia_logging.current_request_id()
+
+class COMExecutor:
+    """单线程COM执行器：所有CATIA调用都在同一个线程中执行
+
+    COM自动化对象属于创建它们的单线程套间，Flask的请求线程只负责入队并等待结果。
+    队列有界，队列满时立即拒绝（HTTP 429）；不同会话的任务按加权轮询出队，
+    相邻且参数相同的只读调用可以合并为一次执行。
+    """
+
+    def __init__(self, queue_size: int = EXECUTOR_QUEUE_SIZE, coalesce: bool = EXECUTOR_COALESCE):
+        self.coalesce = coalesce
+        self._queue = FairQueue(maxsize=queue_size)
+        self._pending: Optional[_COMTask] = None
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='catia-com-executor', daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn, *args, read_only: bool = False, session: Optional[str] = None, **kwargs) -> Future:
+        self._ensure_started()
+        task = _COMTask(fn, args, kwargs, read_only, session)
         try:
-            if not self.drawing:
-                return False, "没有活动的工程图文档"
-            view = self.drawing.views.add(name, type)
-            return True, "视图创建成功"
-        except Exception as e:
-            logger.error(f"创建视图失败: {str(e)}")
-            return False, f"创建视图失败: {str(e)}"
-
-    def add_dimension(self, view: Any, reference1: Any, reference2: Any) -> tuple[bool, str]:
+            self._queue.put_nowait(task, session)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise ExecutorBusyError()
+        with self._stats_lock:
+            self.submitted += 1
+        return task.future
+
+    def call(self, fn, *args, read_only: bool = False, session: Optional[str] = None, **kwargs) -> Any:
+        future = self.submit(fn, *args, read_only=read_only, session=session, **kwargs)
         try:
-            if not self.drawing:
-                return False, "没有活动的工程图文档"
-            dimension = view.add_dimension(reference1, reference2)
-            return True, "尺寸添加成功"
-        except Exception as e:
-            logger.error(f"添加尺寸失败: {str(e)}")
-            return False, f"添加尺寸失败: {str(e)}"
-
-    # 系统操作
-    def get_system_info(self) -> tuple[bool, Union[Dict, str]]:
+            return future.result(timeout=EXECUTOR_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ExecutorTimeoutError()
+
+    def _next_batch(self) -> List[_COMTask]:
+        task = self._pending or self._queue.get()
+        self._pending = None
+        batch = [task]
+        if task.read_only and self.coalesce:
+            while True:
+                try:
+                    following = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if following.read_only and following.key == task.key:
+                    batch.append(following)
+                else:
+                    self._pending = following
+                    break
+        return batch
+
+    def _run(self):
         try:
-            if not self.system:
-                return False, "未连接到CATIA"
-            info = {
-                "version": self.system.version,
-                "license": self.system.license,
-                "workspace": self.system.workspace
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+        while True:
+            batch = [task for task in self._next_batch() if task.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._busy = True
+            started = time.perf_counter()
+            with self._stats_lock:
+                for task in batch:
+                    wait = started - task.enqueued_at
+                    self.wait_time_total += wait
+                    self.wait_time_max = max(self.wait_time_max, wait)
+                self.coalesced += len(batch) - 1
+            task = batch[0]
+            catia_logging.bind_request_id(task.request_id)
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+            except BaseException as e:
+                outcome = 'exception'
+                for task in batch:
+                    task.future.set_exception(e)
+            else:
+                outcome = catia_metrics.outcome(result)
+                for task in batch:
+                    task.future.set_result(result)
+            elapsed = time.perf_counter() - started
+            operation = getattr(batch[0].fn, '__name__', 'call')
+            for task in batch:
+                wait = started - task.enqueued_at
+                catia_metrics.record_com_call(task.metrics, operation, wait, elapsed, outcome)
+                catia_logging.log_operation(operation, elapsed, wait, outcome, task.session, task.request_id)
+            with self._stats_lock:
+                self.completed += len(batch)
+            self._busy = False
+
+    def drain(self, timeout: float) -> bool:
+        """等待已入队的任务全部执行完，用于优雅停机；超时返回False"""
+        deadline = time.monotonic() + timeout
+        while self._queue.qsize() or self._pending or self._busy:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            completed = self.completed
+            return {
+                "queue_depth": self._queue.qsize() + (1 if self._pending else 0),
+                "queue_capacity": self._queue.maxsize,
+                "sessions_waiting": self._queue.sessions_waiting(),
+                "submitted": self.submitted,
+                "completed": completed,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "wait_ms_avg": round(self.wait_time_total / completed * 1000, 3) if completed else 0.0,
+                "wait_ms_max": round(self.wait_time_max * 1000, 3)
             }
-            return True, info
-        except Exception as e:
-            logger.error(f"获取系统信息失败: {str(e)}")
-            return False, f"获取系统信息失败: {str(e)}"
 
-catia_service = CATIAService()
+class ServiceProxy:
+    """CATIAService代理：把每次方法调用转发到COM执行器线程执行"""
+
+    READ_ONLY_METHODS = frozenset({
+        'get_parameters', 'query_parameters', 'get_system_info', 'list_documents', 'list_bodies',
+        'measure_distance', 'measure_angle', 'measure_pairs', 'measure_bulk', 'measure_area', 'measure_volume',
+        'analyze_mass', 'check_interference', 'check_interference_matrix'
+    })
+
+    def __init__(self, service: CATIAService, executor: COMExecutor, session: Optional[str] = None):
+        self._service = service
+        self._executor = executor
+        self._session = session
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+        read_only = name in self.READ_ONLY_METHODS
+
+        def call(*args, **kwargs):
+            return self._executor.call(attr, *args, read_only=read_only, session=self._session, **kwargs)
+        return call
+
+# CATIA进程池配置：大于1时启用多进程CATIA实例池
+POOL_SIZE = int(os.getenv('CATIA_POOL_SIZE', '0'))
+
+com_executor = COMExecutor()
+if POOL_SIZE > 1:
+    from catia_pool import CATIAWorkerPool
+    catia_pool = CATIAWorkerPool(POOL_SIZE, backend=CATIA_BACKEND, max_pending=EXECUTOR_QUEUE_SIZE,
+                                 call_timeout=EXECUTOR_TIMEOUT)
+
+def _create_session_service(identity: str) -> Any:
+    """为JWT用户创建会话专属的CATIA服务：单进程时共享COM执行器，进程池模式下共享工作进程"""
+    if POOL_SIZE > 1:
+        return catia_pool.for_session(identity)
+    return ServiceProxy(CATIAService(), com_executor, session=identity)
+
+sessions = SessionManager(_create_session_service)
+
+# 文件结构快照缓存：提取任务以独立的会话身份提交给COM执行器（或进程池），与用户请求公平排队
+snapshot_cache = catia_snapshots.SnapshotCache(catia_snapshots.SNAPSHOT_DB,
+                                               _create_session_service('catia-snapshot').extract_snapshot)
+
+def start_background_tasks():
+    """启动只在服务进程中需要的后台线程；导入本模块的工具和压测脚本不会启动它们"""
+    if catia_snapshots.SNAPSHOT_REFRESH_INTERVAL > 0:
+        snapshot_cache.start_refresher()
+
+def current_session() -> Any:
+    """当前请求JWT身份对应的会话，需要在请求上下文中调用"""
+    return sessions.get(get_jwt_identity())
+
+def current_service() -> Any:
+    """当前请求JWT身份对应会话的CATIA服务，需要在请求上下文中调用"""
+    return current_session().service
+
+class _CurrentSessionService:
+    """按当前请求的JWT身份把方法调用转发到对应会话的CATIA服务"""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(current_service(), name)
+
+catia_service = _CurrentSessionService()
+
+catia_metrics.register_gauge('catia_com_queue_depth', 'COM执行器队列中等待的任务数',
+                             lambda: com_executor.stats()["queue_depth"])
+catia_metrics.register_gauge('catia_sessions', '当前的用户会话数', lambda: len(sessions))
+catia_metrics.register_gauge('catia_auth_cache_entries', '认证缓存中的令牌数',
+                             lambda: catia_auth.token_cache.stats()["size"])
+
+# MCP工具调用与REST API共享会话和COM执行器
+mcp_server = MCPServer(lambda identity: sessions.get(identity).service)
+MCP_STDIO_IDENTITY = os.getenv('CATIA_MCP_IDENTITY', 'mcp')
+
+job_store = JobStore()
+catia_metrics.register_gauge('catia_jobs_queued', '等待执行的后台任务数', lambda: job_store.stats()["queued"])
 
 # API资源类
+class OperationResource(Resource):
+    """按请求中的operation字段查操作注册表分派，参数由注册的模型一次校验"""
+    resource: str = ''
+
+    @jwt_required()
+    def post(self):
+        data = request.get_json()
+        operation = OPERATIONS.get((self.resource, data.get('operation')))
+        if operation is None:
+            return {"status": "error", "message": "不支持的操作"}, 400
+        try:
+            args = operation.bind(data)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        success, result = getattr(catia_service, operation.method)(*args)
+        return operation.respond(success, result)
+
 class CATIAConnection(Resource):
     @jwt_required()
     def post(self):
@@ -394,290 +337,252 @@ class CATIAConnection(Resource):
             return {"status": "success", "message": "CATIA连接成功"}
         return {"status": "error", "message": "CATIA连接失败"}, 500
 
-class DocumentOperation(Resource):
+class DocumentOperation(OperationResource):
+    resource = 'document'
+
+class TreeOperation(Resource):
+    """结构树遍历：默认以NDJSON逐个返回节点，每页作为一次COM执行器任务；format=json时只返回一页"""
+
+    @jwt_required()
+    def get(self):
+        operation = OPERATIONS[('document', 'tree')]
+        try:
+            document_id, cursor, limit, max_depth, types = operation.bind(request.args.to_dict())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        output_format = request.args.get('format', 'ndjson')
+        if output_format not in ('ndjson', 'json'):
+            return {"status": "error", "message": "不支持的输出格式"}, 400
+        # 节点在响应流中逐页获取，此时已离开请求上下文，需要提前绑定会话，并在流结束前固定会话
+        session = current_session()
+        service = session.service
+        success, first = service.walk_tree(document_id, cursor, limit, max_depth, types)
+        if output_format == 'json' or not success:
+            return operation.respond(success, first)
+        fetch = lambda next_cursor: service.walk_tree(first["document_id"], next_cursor, limit, max_depth, types)
+        rows = catia_tree.stream(fetch, first, request.args.get('max_nodes', type=int))
+        return Response(ndjson_lines(sessions.held(session, rows)), mimetype='application/x-ndjson')
+
+# 可以作为后台任务提交的操作：任务的operation字段 -> 操作注册表中的键
+JOB_OPERATIONS = {
+    'open': ('document', 'open'),
+    'save': ('document', 'save'),
+    'interference': ('analysis', 'interference'),
+    'interference_matrix': ('analysis', 'interference_matrix'),
+    'mass': ('analysis', 'mass'),
+}
+
+class JobOperation(Resource):
+    @jwt_required()
+    def get(self):
+        return {"status": "success", "data": [job.to_dict() for job in job_store.list(get_jwt_identity())]}
+
     @jwt_required()
     def post(self):
         data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'open':
-            file_path = data.get('file_path')
-            if not file_path:
-                return {"status": "error", "message": "未提供文件路径"}, 400
-            if catia_service.open_document(file_path):
-                return {"status": "success", "message": "文档打开成功"}
-            return {"status": "error", "message": "文档打开失败"}, 500
-            
-        elif operation == 'save':
-            file_path = data.get('file_path')
-            success, message = catia_service.save_document(file_path)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'create':
-            doc_type = data.get('doc_type', 'Part')
-            success, message = catia_service.create_new_document(doc_type)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'close':
-            success, message = catia_service.close_document()
-            return {"status": "success" if success else "error", "message": message}
-            
-        else:
+        name = data.get('operation')
+        operation = OPERATIONS.get(JOB_OPERATIONS.get(name))
+        if operation is None:
             return {"status": "error", "message": "不支持的操作"}, 400
+        try:
+            args = operation.bind(data)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        # 任务在后台线程中执行，提交时就绑定当前用户的会话，任务结束前会话不会因空闲被回收
+        session = current_session()
+        method = getattr(session.service, operation.method)
+
+        def run(job):
+            return method(*args)
+
+        sessions.pin(session)
+        try:
+            job = job_store.submit(name, run, owner=get_jwt_identity(), on_finish=lambda: sessions.unpin(session))
+        except JobQueueFullError:
+            sessions.unpin(session)
+            raise
+        return {"status": "success", "message": "任务已提交", "data": job.to_dict()}, 202
+
+class JobStatus(Resource):
+    @jwt_required()
+    def get(self, job_id):
+        job = job_store.get(job_id, get_jwt_identity())
+        if job is None:
+            return {"status": "error", "message": "任务不存在"}, 404
+        return {"status": "success", "data": job.to_dict()}
+
+    @jwt_required()
+    def delete(self, job_id):
+        job = job_store.cancel(job_id, get_jwt_identity())
+        if job is None:
+            return {"status": "error", "message": "任务不存在"}, 404
+        return {"status": "success", "message": "已请求取消任务", "data": job.to_dict()}
+
+class JobEvents(Resource):
+    @jwt_required()
+    def get(self, job_id):
+        job = job_store.get(job_id, get_jwt_identity())
+        if job is None:
+            return {"status": "error", "message": "任务不存在"}, 404
+        return Response(job_store.events(job), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 class ParameterOperation(Resource):
     @jwt_required()
     def get(self):
-        success, result = catia_service.get_parameters()
-        if success:
-            return {"status": "success", "data": result}
-        return {"status": "error", "message": result}, 500
+        operation = OPERATIONS[('parameters', 'get')]
+        try:
+            args = operation.bind(request.args.to_dict())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        success, result = catia_service.query_parameters(*args)
+        if not success:
+            return operation.respond(success, result)
+        # 合并执行的相同请求共享同一个结果字典，这里只读不改
+        etag = result['etag']
+        if etag.strip('"') in request.if_none_match:
+            return None, 304, {"ETag": etag}
+        meta = {key: value for key, value in result.items() if key not in ('etag', 'items')}
+        return {"status": "success", "data": result['items'], **meta}, 200, {"ETag": etag}
 
     @jwt_required()
     def post(self):
-        data = request.get_json()
-        name = data.get('name')
-        value = data.get('value')
-        
-        if not name or value is None:
-            return {"status": "error", "message": "参数名称和值不能为空"}, 400
-            
-        success, message = catia_service.set_parameter(name, value)
-        return {"status": "success" if success else "error", "message": message}
+        operation = OPERATIONS[('parameters', 'set')]
+        try:
+            args = operation.bind(request.get_json())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        return operation.respond(*catia_service.set_parameter(*args))
 
-class GeometryOperation(Resource):
+class ParameterBulkOperation(Resource):
     @jwt_required()
     def post(self):
-        data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'point':
-            x = data.get('x')
-            y = data.get('y')
-            z = data.get('z')
-            if None in (x, y, z):
-                return {"status": "error", "message": "点的坐标不能为空"}, 400
-            success, message = catia_service.create_point(x, y, z)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'line':
-            start = data.get('start_point')
-            end = data.get('end_point')
-            if not start or not end:
-                return {"status": "error", "message": "线的起点和终点不能为空"}, 400
-            success, message = catia_service.create_line(start, end)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'plane':
-            origin = data.get('origin')
-            normal = data.get('normal')
-            if not origin or not normal:
-                return {"status": "error", "message": "平面的原点和法向量不能为空"}, 400
-            success, message = catia_service.create_plane(origin, normal)
-            return {"status": "success" if success else "error", "message": message}
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
-
-class SketchOperation(Resource):
+        operation = OPERATIONS[('parameters', 'bulk')]
+        try:
+            args = operation.bind(request.get_json())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        success, result = catia_service.set_parameters(*args)
+        if not success:
+            return operation.respond(success, result)
+        if result["failures"]:
+            message = "参数校验失败" if "rolled_back" not in result else "参数设置失败，已回滚"
+            return {"status": "error", "message": message, "data": result}, 400 if "rolled_back" not in result else 500
+        return {"status": "success", "message": "参数校验通过" if result["dry_run"] else "参数设置成功", "data": result}
+
+class PipelineOperation(Resource):
     @jwt_required()
     def post(self):
         data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'create':
-            plane = data.get('plane')
-            if not plane:
-                return {"status": "error", "message": "平面不能为空"}, 400
-            success, message = catia_service.create_sketch(plane)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'add_line':
-            sketch = data.get('sketch')
-            start_point = data.get('start_point')
-            end_point = data.get('end_point')
-            if None in (sketch, start_point, end_point):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.add_line_to_sketch(sketch, start_point, end_point)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'add_circle':
-            sketch = data.get('sketch')
-            center = data.get('center')
-            radius = data.get('radius')
-            if None in (sketch, center, radius):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.add_circle_to_sketch(sketch, center, radius)
-            return {"status": "success" if success else "error", "message": message}
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
-
-class FeatureOperation(Resource):
+        steps = data.get('steps')
+        if not isinstance(steps, list) or not steps:
+            return {"status": "error", "message": "步骤列表不能为空"}, 400
+        if len(steps) > PIPELINE_MAX_STEPS:
+            return {"status": "error", "message": f"步骤数量不能超过{PIPELINE_MAX_STEPS}"}, 400
+        if not all(isinstance(step, dict) for step in steps):
+            return {"status": "error", "message": "步骤格式错误"}, 400
+        on_error = data.get('on_error', 'stop')
+        if on_error not in ('stop', 'continue'):
+            return {"status": "error", "message": "on_error只能是stop或continue"}, 400
+        result = run_pipeline(current_service(), steps, OPERATIONS, on_error)
+        if result["failed"]:
+            return {"status": "error", "message": "部分步骤执行失败", "data": result}
+        return {"status": "success", "data": result}
+
+class SweepOperation(Resource):
     @jwt_required()
     def post(self):
         data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'pad':
-            sketch = data.get('sketch')
-            length = data.get('length')
-            if None in (sketch, length):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.create_pad(sketch, length)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'pocket':
-            sketch = data.get('sketch')
-            length = data.get('length')
-            if None in (sketch, length):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.create_pocket(sketch, length)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'revolution':
-            sketch = data.get('sketch')
-            angle = data.get('angle')
-            if None in (sketch, angle):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.create_revolution(sketch, angle)
-            return {"status": "success" if success else "error", "message": message}
-            
+        try:
+            sweep = Sweep.from_request(data, CATIAService.MEASUREMENT_METHODS)
+        except SweepConflictError as e:
+            return {"status": "error", "message": str(e)}, 409
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        output_format = data.get('format', 'ndjson')
+        if output_format not in ('ndjson', 'csv'):
+            return {"status": "error", "message": "不支持的输出格式"}, 400
+        try:
+            processes = int(data.get('processes', 1))
+        except (TypeError, ValueError):
+            processes = 0
+        if processes < 1:
+            return {"status": "error", "message": "processes必须是正整数"}, 400
+        # 结果在响应流中逐行生成，此时已离开请求上下文，需要提前绑定会话，并在扫描结束前固定会话
+        session = current_session()
+        if POOL_SIZE > 1 and processes > 1:
+            if not sweep.spec.get('file_path'):
+                return {"status": "error", "message": "多进程扫描需要提供file_path"}, 400
+            services = [session.service.worker(i) for i in range(min(processes, POOL_SIZE))]
         else:
-            return {"status": "error", "message": "不支持的操作"}, 400
+            services = [session.service]
+        rows = sessions.held(session, sweep.run(services))
+        if output_format == 'csv':
+            return Response(csv_lines(sweep, rows), mimetype='text/csv', headers=sweep_headers(sweep))
+        return Response(ndjson_lines(rows), mimetype='application/x-ndjson', headers=sweep_headers(sweep))
 
-class AssemblyOperation(Resource):
+class SweepStatus(Resource):
     @jwt_required()
-    def post(self):
-        data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'add_component':
-            file_path = data.get('file_path')
-            position = data.get('position', [0, 0, 0])
-            if not file_path:
-                return {"status": "error", "message": "组件文件路径不能为空"}, 400
-            success, message = catia_service.add_component(file_path, position)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'create_constraint':
-            component1 = data.get('component1')
-            component2 = data.get('component2')
-            constraint_type = data.get('constraint_type')
-            reference1 = data.get('reference1')
-            reference2 = data.get('reference2')
-            
-            if None in (component1, component2, constraint_type, reference1, reference2):
-                return {"status": "error", "message": "约束参数不完整"}, 400
-                
-            success, message = catia_service.create_constraint(
-                component1, component2, constraint_type, reference1, reference2
-            )
-            return {"status": "success" if success else "error", "message": message}
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
-
-class MeasureOperation(Resource):
+    def get(self, sweep_id):
+        sweep = load_sweep(sweep_id)
+        if sweep is None:
+            return {"status": "error", "message": "扫描任务不存在"}, 404
+        completed = sweep.completed()
+        failed = sum(1 for row in completed.values() if row["status"] != "success")
+        return {"status": "success", "data": {"sweep_id": sweep.id, "total": sweep.total,
+                                              "completed": len(completed), "failed": failed}}
+
+class GeometryOperation(OperationResource):
+    resource = 'geometry'
+
+class GeometryBatchOperation(Resource):
     @jwt_required()
     def post(self):
-        data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'distance':
-            point1 = data.get('point1')
-            point2 = data.get('point2')
-            if None in (point1, point2):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, result = catia_service.measure_distance(point1, point2)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        elif operation == 'angle':
-            line1 = data.get('line1')
-            line2 = data.get('line2')
-            if None in (line1, line2):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, result = catia_service.measure_angle(line1, line2)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        elif operation == 'area':
-            face = data.get('face')
-            if not face:
-                return {"status": "error", "message": "面不能为空"}, 400
-            success, result = catia_service.measure_area(face)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        elif operation == 'volume':
-            body = data.get('body')
-            if not body:
-                return {"status": "error", "message": "实体不能为空"}, 400
-            success, result = catia_service.measure_volume(body)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
+        operation = OPERATIONS[('geometry', 'batch')]
+        try:
+            args = operation.bind(request.get_json())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        return operation.respond(*catia_service.create_geometry_batch(*args))
 
-class AnalysisOperation(Resource):
+class SketchOperation(OperationResource):
+    resource = 'sketch'
+
+class FeatureOperation(OperationResource):
+    resource = 'feature'
+
+class AssemblyOperation(OperationResource):
+    resource = 'assembly'
+
+class AssemblyBulkOperation(Resource):
     @jwt_required()
     def post(self):
-        data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'mass':
-            body = data.get('body')
-            if not body:
-                return {"status": "error", "message": "实体不能为空"}, 400
-            success, result = catia_service.analyze_mass(body)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        elif operation == 'interference':
-            body1 = data.get('body1')
-            body2 = data.get('body2')
-            if None in (body1, body2):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, result = catia_service.check_interference(body1, body2)
-            if success:
-                return {"status": "success", "data": result}
-            return {"status": "error", "message": result}, 500
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
+        operation = OPERATIONS[('assembly', 'bulk')]
+        try:
+            args = operation.bind(request.get_json())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        success, result = catia_service.add_components(*args)
+        return operation.respond(success, result)
 
-class DrawingOperation(Resource):
+class MeasureOperation(OperationResource):
+    resource = 'measure'
+
+class MeasureBulkOperation(Resource):
     @jwt_required()
     def post(self):
-        data = request.get_json()
-        operation = data.get('operation')
-        
-        if operation == 'create_view':
-            name = data.get('name')
-            view_type = data.get('type', 'Front')
-            if not name:
-                return {"status": "error", "message": "视图名称不能为空"}, 400
-            success, message = catia_service.create_drawing_view(name, view_type)
-            return {"status": "success" if success else "error", "message": message}
-            
-        elif operation == 'add_dimension':
-            view = data.get('view')
-            reference1 = data.get('reference1')
-            reference2 = data.get('reference2')
-            if None in (view, reference1, reference2):
-                return {"status": "error", "message": "参数不完整"}, 400
-            success, message = catia_service.add_dimension(view, reference1, reference2)
-            return {"status": "success" if success else "error", "message": message}
-            
-        else:
-            return {"status": "error", "message": "不支持的操作"}, 400
+        operation = OPERATIONS[('measure', 'bulk')]
+        try:
+            args = operation.bind(request.get_json())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        return operation.respond(*catia_service.measure_bulk(*args))
+
+class AnalysisOperation(OperationResource):
+    resource = 'analysis'
+
+class DrawingOperation(OperationResource):
+    resource = 'drawing'
 
 class SystemOperation(Resource):
     @jwt_required()
@@ -687,18 +592,202 @@ class SystemOperation(Resource):
             return {"status": "success", "data": result}
         return {"status": "error", "message": result}, 500
 
+class MCPEndpoint(Resource):
+    """MCP Streamable HTTP传输，客户端接受text/event-stream时以SSE返回进度通知和结果"""
+
+    @jwt_required()
+    def post(self):
+        payload = request.get_json(silent=True)
+        if payload is None:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "JSON解析失败"}}, 400
+        identity = str(get_jwt_identity())
+        headers = {}
+        if MCPServer.is_initialize(payload):
+            headers['Mcp-Session-Id'] = MCPServer.new_session_id()
+        if not MCPServer.has_requests(payload):
+            mcp_server.handle_batch(payload, identity, lambda message: None)
+            return Response(status=202, headers=headers)
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(mcp_server.stream_http(payload, identity), mimetype='text/event-stream',
+                            headers=dict(headers, **{'Cache-Control': 'no-cache'}))
+        responses = []
+        mcp_server.handle_batch(payload, identity,
+                                lambda message: 'id' in message and responses.append(message))
+        if not responses:
+            # 请求全部在处理期间被客户端取消，与只含通知的消息一样没有响应体
+            return Response(status=202, headers=headers)
+        return (responses if isinstance(payload, list) else responses[0]), 200, headers
+
+    @jwt_required()
+    def get(self):
+        # 不提供服务端主动推送的独立SSE流
+        return Response(status=405, headers={'Allow': 'POST'})
+
+class ToolManifest(Resource):
+    @jwt_required()
+    def get(self):
+        return {"status": "success", "data": {"tools": tool_manifest()}}
+
+class OpenAPIDocument(Resource):
+    @jwt_required()
+    def get(self):
+        return openapi_document()
+
+class SnapshotOperation(Resource):
+    """按文件路径查询结构快照，文件未变化时不访问CATIA"""
+
+    SECTIONS = ('structure', 'parameters', 'mass')
+
+    @jwt_required()
+    def get(self):
+        args = request.args
+        file_path = args.get('file_path')
+        if not file_path:
+            return {"status": "error", "message": "缺少file_path"}, 400
+        include = [item for item in args.get('include', '').split(',') if item]
+        types = [item for item in args.get('types', '').split(',') if item]
+        if set(include) - set(self.SECTIONS) or set(types) - set(catia_tree.NODE_TYPES):
+            return {"status": "error", "message": "include或types参数无效"}, 400
+        if not os.path.exists(file_path):
+            return {"status": "error", "message": f"文件不存在: {file_path}"}, 404
+        success, result = snapshot_cache.ensure(file_path, refresh=args.get('refresh', '').lower() in ('1', 'true'))
+        if not success:
+            return {"status": "error", "message": result}, 500
+        if 'structure' in include:
+            result['structure'] = snapshot_cache.structure(file_path, args.get('max_depth', type=int), types,
+                                                           args.get('offset', 0, type=int),
+                                                           args.get('limit', type=int))
+        if 'parameters' in include:
+            result['parameters'] = snapshot_cache.parameters(file_path, args.get('prefix'))
+        if 'mass' in include:
+            result['mass'] = snapshot_cache.mass(file_path)
+        return {"status": "success", "data": result}
+
+    @jwt_required()
+    def delete(self):
+        file_path = request.args.get('file_path')
+        if not file_path:
+            return {"status": "error", "message": "缺少file_path"}, 400
+        if not snapshot_cache.remove(file_path):
+            return {"status": "error", "message": "该文件没有快照"}, 404
+        return {"status": "success", "message": "快照已删除"}
+
+class SnapshotList(Resource):
+    @jwt_required()
+    def get(self):
+        return {"status": "success", "data": {"files": snapshot_cache.files(), **snapshot_cache.stats()}}
+
+class SnapshotWhereUsed(Resource):
+    """在全部已缓存的装配中反查引用了某个零件号或节点名称的位置"""
+
+    @jwt_required()
+    def get(self):
+        part_number, name = request.args.get('part_number'), request.args.get('name')
+        if not part_number and not name:
+            return {"status": "error", "message": "需要提供part_number或name"}, 400
+        rows = snapshot_cache.where_used(part_number, name, request.args.get('limit', 1000, type=int))
+        return {"status": "success", "data": rows}
+
+class SessionOperation(Resource):
+    @jwt_required()
+    def get(self):
+        session = sessions.get(get_jwt_identity())
+        success, documents = session.service.list_documents()
+        return {"status": "success", "data": dict(session.to_dict(), documents=documents)}
+
+    @jwt_required()
+    def delete(self):
+        sessions.close(get_jwt_identity())
+        return {"status": "success", "message": "会话已结束，文档已关闭"}
+
+class SessionKeyOperation(Resource):
+    """用JWT换取服务端签发的会话密钥，供受信任的内部客户端使用"""
+
+    @jwt_required()
+    def post(self):
+        identity = get_jwt_identity()
+        if get_jwt().get('type') == 'session_key':
+            return {"status": "error", "message": "会话密钥不能用于签发新的会话密钥，请使用JWT"}, 403
+        if not catia_auth.may_issue_session_key(identity):
+            return {"status": "error", "message": "未启用会话密钥，或当前用户不在受信任列表中"}, 403
+        return {"status": "success", "data": catia_auth.session_keys.issue(str(identity))}, 201
+
+    @jwt_required()
+    def delete(self):
+        key = request.headers.get(catia_auth.SESSION_KEY_HEADER)
+        if key:
+            catia_auth.session_keys.revoke(key)
+            return {"status": "success", "message": "会话密钥已吊销"}
+        revoked = catia_auth.session_keys.revoke_identity(str(get_jwt_identity()))
+        return {"status": "success", "message": f"已吊销{revoked}个会话密钥"}
+
+class ExecutorStatus(Resource):
+    @jwt_required()
+    def get(self):
+        return {"status": "success", "data": com_executor.stats()}
+
+class MetricsSnapshot(Resource):
+    @jwt_required()
+    def get(self):
+        return {"status": "success", "data": catia_metrics.snapshot()}
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus文本格式的指标，供抓取使用，不需要JWT"""
+    return Response(catia_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+class PoolStatus(Resource):
+    @jwt_required()
+    def get(self):
+        if POOL_SIZE <= 1:
+            return {"status": "error", "message": "未启用CATIA进程池"}, 404
+        return {"status": "success", "data": catia_pool.stats()}
+
 # 注册API路由
 api.add_resource(CATIAConnection, '/api/catia/connect')
 api.add_resource(DocumentOperation, '/api/catia/document')
+api.add_resource(TreeOperation, '/api/catia/tree')
+api.add_resource(JobOperation, '/api/catia/jobs')
+api.add_resource(JobStatus, '/api/catia/jobs/<string:job_id>')
+api.add_resource(JobEvents, '/api/catia/jobs/<string:job_id>/events')
 api.add_resource(ParameterOperation, '/api/catia/parameters')
+api.add_resource(ParameterBulkOperation, '/api/catia/parameters/bulk')
+api.add_resource(PipelineOperation, '/api/catia/pipeline')
+api.add_resource(SweepOperation, '/api/catia/sweep')
+api.add_resource(SweepStatus, '/api/catia/sweep/<string:sweep_id>')
 api.add_resource(GeometryOperation, '/api/catia/geometry')
+api.add_resource(GeometryBatchOperation, '/api/catia/geometry/batch')
 api.add_resource(SketchOperation, '/api/catia/sketch')
 api.add_resource(FeatureOperation, '/api/catia/feature')
 api.add_resource(AssemblyOperation, '/api/catia/assembly')
+api.add_resource(AssemblyBulkOperation, '/api/catia/assembly/bulk')
 api.add_resource(MeasureOperation, '/api/catia/measure')
+api.add_resource(MeasureBulkOperation, '/api/catia/measure/bulk')
 api.add_resource(AnalysisOperation, '/api/catia/analysis')
 api.add_resource(DrawingOperation, '/api/catia/drawing')
 api.add_resource(SystemOperation, '/api/catia/system')
+api.add_resource(ToolManifest, '/api/catia/tools')
+api.add_resource(MCPEndpoint, '/mcp')
+api.add_resource(OpenAPIDocument, '/api/catia/openapi.json')
+api.add_resource(SessionOperation, '/api/catia/session')
+api.add_resource(SnapshotOperation, '/api/catia/snapshot')
+api.add_resource(SnapshotWhereUsed, '/api/catia/snapshot/where-used')
+api.add_resource(SnapshotList, '/api/catia/snapshots')
+api.add_resource(SessionKeyOperation, '/api/catia/auth/session-key')
+api.add_resource(ExecutorStatus, '/api/catia/system/executor')
+api.add_resource(PoolStatus, '/api/catia/system/pool')
+api.add_resource(MetricsSnapshot, '/api/catia/system/metrics')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="CATIA MCP服务")
+    parser.add_argument('--mcp-stdio', action='store_true', help="以stdio传输运行MCP服务端，不启动HTTP服务")
+    parser.add_argument('--server', choices=catia_server.SERVERS, default=catia_server.HTTP_SERVER,
+                        help="HTTP服务实现，dev为Flask开发服务器")
+    parser.add_argument('--host', default=catia_server.HTTP_HOST)
+    parser.add_argument('--port', type=int, default=catia_server.HTTP_PORT)
+    options = parser.parse_args()
+    if options.mcp_stdio:
+        mcp_server.serve_stdio(MCP_STDIO_IDENTITY)
+    else:
+        catia_server.serve(app, options.server, options.host, options.port, drain=com_executor.drain,
+                           on_start=start_background_tasks)
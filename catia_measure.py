@@ -0,0 +1,84 @@
+"""批量测量的向量化计算
+
+纯坐标输入（点坐标、方向向量、由两点表示的线）直接用NumPy在服务端一次算完，
+引用CATIA几何（句柄或名称）的条目收集起来，交给一次COM调用逐对测量。
+"""
+import base64
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+OPERATIONS = ('distance', 'angle')
+
+
+def unpack_floats(buffer: str, width: int = 3) -> np.ndarray:
+    """解码base64编码的小端float64数组，按width列重排"""
+    values = np.frombuffer(base64.b64decode(buffer), dtype='<f8')
+    if len(values) % width:
+        raise ValueError(f"坐标数量必须是{width}的倍数")
+    return values.reshape(-1, width)
+
+
+def pack_floats(values: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(values, dtype='<f8').tobytes()).decode('ascii')
+
+
+def _parse_entries(entries: Any, operation: str) -> Tuple[np.ndarray, Dict[int, Any]]:
+    """把输入拆成坐标矩阵和几何引用；引用所在行填NaN。角度测量中两点表示的线转换为方向向量"""
+    if isinstance(entries, np.ndarray):
+        return entries.astype(np.float64, copy=False), {}
+    coordinates = np.full((len(entries), 3), np.nan)
+    references: Dict[int, Any] = {}
+    for index, entry in enumerate(entries):
+        if isinstance(entry, (list, tuple)) and len(entry) == 2 and operation == 'angle' \
+                and all(isinstance(point, (list, tuple)) for point in entry):
+            coordinates[index] = np.subtract(entry[1], entry[0], dtype=np.float64)
+        elif isinstance(entry, (list, tuple)) and len(entry) == 3:
+            coordinates[index] = entry
+        elif isinstance(entry, (str, dict)):
+            references[index] = entry
+        else:
+            raise ValueError(f"第{index}项格式错误")
+    return coordinates, references
+
+
+def bulk_measure(operation: str, entries1: Any, entries2: Any,
+                 measure_geometry: Callable[[str, List[Tuple[int, Any, Any]]], Tuple[List, List]]) -> Dict:
+    """计算逐对的距离或角度（度）
+
+    measure_geometry接收[(index, 输入1, 输入2), ...]，返回(结果列表, 错误列表)，只对含几何引用的条目调用一次
+    """
+    if operation not in OPERATIONS:
+        raise ValueError("不支持的测量类型")
+    first, first_refs = _parse_entries(entries1, operation)
+    second, second_refs = _parse_entries(entries2, operation)
+    if len(first) != len(second):
+        raise ValueError("两组输入的数量必须相同")
+    values = np.full(len(first), np.nan)
+    numeric = ~(np.isnan(first).any(axis=1) | np.isnan(second).any(axis=1))
+    a, b = first[numeric], second[numeric]
+    if operation == 'distance':
+        values[numeric] = np.linalg.norm(a - b, axis=1)
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosine = np.einsum('ij,ij->i', a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+        values[numeric] = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+    errors: List = []
+    geometry_indices = sorted(first_refs.keys() | second_refs.keys())
+    if geometry_indices:
+        pairs = [(i, first_refs.get(i, _as_list(entries1, i)), second_refs.get(i, _as_list(entries2, i)))
+                 for i in geometry_indices]
+        results, errors = measure_geometry(operation, pairs)
+        values[geometry_indices] = [np.nan if value is None else value for value in results]
+    return {"values": values, "errors": errors, "geometry_count": len(geometry_indices)}
+
+
+def _as_list(entries: Any, index: int) -> Any:
+    entry = entries[index]
+    return entry.tolist() if isinstance(entry, np.ndarray) else entry
+
+
+def to_json_list(values: np.ndarray) -> List[Optional[float]]:
+    """NaN（测量失败）转为null，保证JSON合法"""
+    return [None if math.isnan(value) else value for value in values.tolist()]
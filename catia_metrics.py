@@ -0,0 +1,293 @@
+"""运行时指标：按操作和结果统计的延迟直方图、每个请求的COM调用次数、排队等待和进行中的请求
+
+请求开始时创建RequestMetrics并绑定到当前上下文；COM执行器提交任务时记下它，任务执行后把排队时间和
+CATIA执行时间记到该请求上。请求结束时按阶段（认证、JSON解析、排队、CATIA、序列化、其他）汇总，
+可以看出慢请求的时间花在哪里。指标在进程内累加，/metrics以Prometheus文本格式输出，
+/api/catia/system/metrics返回JSON快照。每次记录只有一次二分查找和几次加法，可以在生产环境常开。
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv('CATIA_METRICS_ENABLED', '1') == '1'
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class _Series:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """带标签的直方图，桶上界语义与Prometheus的le一致"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def _items(self) -> List[Tuple[Tuple, List[int], float, int]]:
+        with self._lock:
+            return [(labels, list(s.counts), s.sum, s.count) for labels, s in self._series.items()]
+
+    def _quantile(self, counts: List[int], total: int, fraction: float) -> Optional[float]:
+        """按桶估计分位数，返回所在桶的上界；落在+Inf桶时返回None"""
+        target = fraction * total
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            if running >= target:
+                return bound
+        return None
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts, total_sum, total in sorted(self._items()):
+            base = _format_labels(self.labels, labels)
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                yield f"{self.name}_bucket{{{base}{',' if base else ''}le=\"{bound:g}\"}} {running}"
+            yield f"{self.name}_bucket{{{base}{',' if base else ''}le=\"+Inf\"}} {total}"
+            yield f"{self.name}_sum{{{base}}} {total_sum:.6f}" if base else f"{self.name}_sum {total_sum:.6f}"
+            yield f"{self.name}_count{{{base}}} {total}" if base else f"{self.name}_count {total}"
+
+    def snapshot(self, scale: float = 1000.0) -> List[Dict]:
+        """JSON快照；延迟类指标乘以1000换算为毫秒"""
+        rows = []
+        for labels, counts, total_sum, total in sorted(self._items()):
+            row: Dict[str, Any] = dict(zip(self.labels, labels))
+            row["count"] = total
+            row["avg"] = round(total_sum / total * scale, 3) if total else 0.0
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                bound = self._quantile(counts, total, fraction)
+                row[name] = None if bound is None else round(bound * scale, 3)
+            rows.append(row)
+        return rows
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+REQUEST_DURATION = Histogram('catia_http_request_duration_seconds', 'HTTP请求总耗时',
+                             ('endpoint', 'method', 'status'))
+REQUEST_PHASE = Histogram('catia_http_request_phase_seconds', 'HTTP请求各阶段耗时', ('phase',))
+REQUEST_COM_CALLS = Histogram('catia_http_request_com_calls', '每个HTTP请求提交给COM线程的CATIA调用次数',
+                              ('endpoint',), COUNT_BUCKETS)
+OPERATION_DURATION = Histogram('catia_operation_duration_seconds', 'CATIA服务方法在COM线程中的执行耗时',
+                               ('operation', 'outcome'))
+QUEUE_WAIT = Histogram('catia_com_queue_wait_seconds', 'CATIA调用等待COM执行器或工作进程的时间')
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_PHASE, REQUEST_COM_CALLS, OPERATION_DURATION, QUEUE_WAIT)
+_gauges: List[Tuple[str, str, Callable[[], float]]] = []
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """单个HTTP请求的计时，阶段耗时可能由COM线程写入"""
+    __slots__ = ('start', 'phases', 'com_calls', 'status', '_auth_start')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.com_calls = 0
+        self.status = 500
+        self._auth_start: Optional[float] = None
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('catia_request_metrics', default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def begin_request() -> RequestMetrics:
+    global _in_flight
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    with _in_flight_lock:
+        _in_flight += 1
+    return metrics
+
+
+def end_request(endpoint: str, method: str):
+    global _in_flight
+    metrics = _current.get()
+    if metrics is None:
+        return
+    _current.set(None)
+    with _in_flight_lock:
+        _in_flight -= 1
+    total = time.perf_counter() - metrics.start
+    REQUEST_DURATION.observe(total, endpoint, method, str(metrics.status))
+    REQUEST_COM_CALLS.observe(metrics.com_calls, endpoint)
+    for phase, seconds in metrics.phases.items():
+        REQUEST_PHASE.observe(seconds, phase)
+    REQUEST_PHASE.observe(max(0.0, total - sum(metrics.phases.values())), 'other')
+
+
+def outcome(result: Any) -> str:
+    """服务方法返回(success, result)，按success区分成功和失败"""
+    if isinstance(result, tuple) and result and isinstance(result[0], bool):
+        return 'success' if result[0] else 'error'
+    return 'success'
+
+
+def record_com_call(metrics: Optional[RequestMetrics], operation: str, wait: float, elapsed: float,
+                    result_outcome: str):
+    OPERATION_DURATION.observe(elapsed, operation, result_outcome)
+    QUEUE_WAIT.observe(wait)
+    if metrics is not None:
+        metrics.com_calls += 1
+        metrics.add('queue_wait', wait)
+        metrics.add('catia', elapsed)
+
+
+@contextmanager
+def phase(name: str):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def timed_decorator(factory: Callable, name: str) -> Callable:
+    """包装装饰器工厂（如jwt_required），把装饰器自身在视图函数之前花费的时间记为一个阶段"""
+    @wraps(factory)
+    def make(*args, **kwargs):
+        decorator = factory(*args, **kwargs)
+
+        def wrap(fn):
+            @wraps(fn)
+            def body(*a, **k):
+                metrics = _current.get()
+                if metrics is not None and metrics._auth_start is not None:
+                    metrics.add(name, time.perf_counter() - metrics._auth_start)
+                    metrics._auth_start = None
+                return fn(*a, **k)
+            protected = decorator(body)
+
+            @wraps(fn)
+            def outer(*a, **k):
+                metrics = _current.get()
+                if metrics is not None:
+                    metrics._auth_start = time.perf_counter()
+                try:
+                    return protected(*a, **k)
+                finally:
+                    # 认证失败时视图函数不会执行，同样记录认证耗时
+                    if metrics is not None and metrics._auth_start is not None:
+                        metrics.add(name, time.perf_counter() - metrics._auth_start)
+                        metrics._auth_start = None
+            return outer
+        return wrap
+    return make
+
+
+def register_gauge(name: str, help: str, fn: Callable[[], float]):
+    _gauges.append((name, help, fn))
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP catia_http_requests_in_flight 正在处理的HTTP请求数",
+        "# TYPE catia_http_requests_in_flight gauge",
+        f"catia_http_requests_in_flight {_in_flight}",
+    ]
+    for name, help, fn in _gauges:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {fn()}")
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> Dict:
+    return {
+        "in_flight": _in_flight,
+        "gauges": {name: fn() for name, _, fn in _gauges},
+        "requests_ms": REQUEST_DURATION.snapshot(),
+        "phases_ms": REQUEST_PHASE.snapshot(),
+        "com_calls_per_request": REQUEST_COM_CALLS.snapshot(scale=1.0),
+        "operations_ms": OPERATION_DURATION.snapshot(),
+        "queue_wait_ms": QUEUE_WAIT.snapshot()
+    }
+
+
+def install(app, api):
+    """在Flask应用上安装请求计时：请求起止、JSON解析和flask-restful各媒体类型的响应序列化"""
+    from flask import request
+
+    class TimedRequest(app.request_class):
+        def get_json(self, *args, **kwargs):
+            with phase('parse'):
+                return super().get_json(*args, **kwargs)
+
+    app.request_class = TimedRequest
+
+    def timed(representation):
+        def output(data, code, headers=None):
+            with phase('serialize'):
+                return representation(data, code, headers)
+        return output
+
+    for mediatype, representation in list(api.representations.items()):
+        api.representations[mediatype] = timed(representation)
+
+    @app.before_request
+    def _begin():
+        begin_request()
+
+    @app.after_request
+    def _status(response):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _end(exc):
+        rule = request.url_rule
+        end_request(rule.rule if rule is not None else 'unmatched', request.method)
@@ -0,0 +1,588 @@
+"""操作注册表：(resource, operation) -> 服务方法 + 请求模型
+
+每个操作的pydantic模型在导入时创建一次，REST资源、命令流水线都通过字典查表找到操作，
+再用一次model_validate完成参数校验和类型转换。模型字段按服务方法的参数顺序声明。
+同一张注册表还用于生成MCP工具清单和OpenAPI文档，新增操作只需要在这里注册，不再增加if/elif分支。
+"""
+import base64
+import sys
+from array import array
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Type, Union
+
+import numpy as np
+from pydantic import AfterValidator, BaseModel, Field, StrictBool, StrictInt, ValidationError, field_validator, \
+    model_validator
+
+from catia_measure import unpack_floats
+from catia_tree import NODE_TYPES, TREE_PAGE_SIZE
+
+
+def _required(value: Any) -> Any:
+    if value is None:
+        raise ValueError("不能为空")
+    return value
+
+
+# 几何引用：对象句柄、名称或坐标
+Reference = Annotated[Any, AfterValidator(_required)]
+Vector = List[float]
+ParameterValue = Union[StrictBool, StrictInt, float, str]
+
+
+def unpack_points(data: Dict) -> Optional[List[tuple]]:
+    """解析批量点坐标：points为[[x,y,z],...]或扁平列表，points_buffer为base64编码的小端float64数组"""
+    if data.get('points_buffer'):
+        values = array('d')
+        values.frombytes(base64.b64decode(data['points_buffer']))
+        if sys.byteorder != 'little':
+            values.byteswap()
+    elif data.get('points'):
+        points = data['points']
+        if isinstance(points[0], (list, tuple)):
+            if any(len(point) != 3 for point in points):
+                raise ValueError("每个点必须包含3个坐标")
+            return [tuple(point) for point in points]
+        values = points
+    else:
+        return None
+    if len(values) % 3:
+        raise ValueError("坐标数量必须是3的倍数")
+    return list(zip(values[0::3], values[1::3], values[2::3]))
+
+
+class OpenDocument(BaseModel):
+    """打开文档，已打开的文件直接切换为活动文档"""
+    file_path: str
+
+
+class SaveDocument(BaseModel):
+    """保存活动文档，提供file_path时另存为"""
+    file_path: Optional[str] = None
+
+
+class CreateDocument(BaseModel):
+    """新建文档"""
+    doc_type: Literal['Part', 'Product', 'Drawing'] = 'Part'
+
+
+class CloseDocument(BaseModel):
+    """关闭文档，默认关闭活动文档"""
+    document_id: Optional[str] = None
+
+
+class SwitchDocument(BaseModel):
+    """切换活动文档"""
+    document_id: str
+
+
+class WalkTree(BaseModel):
+    """按深度优先顺序分页遍历文档结构树（装配的子产品，零件的实体、几何图形集和草图），默认遍历活动文档"""
+    document_id: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = Field(TREE_PAGE_SIZE, ge=1, le=10000)
+    max_depth: Optional[int] = Field(None, ge=0)
+    types: Optional[List[Literal[NODE_TYPES]]] = None
+
+    @field_validator('types', mode='before')
+    @classmethod
+    def _split_types(cls, value: Any) -> Any:
+        # 查询字符串中以逗号分隔
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(',') if item.strip()]
+        return value
+
+
+class NoArguments(BaseModel):
+    pass
+
+
+class ListBodies(BaseModel):
+    """列出活动零件中的实体及其句柄，faces为true时同时返回每个实体的面句柄"""
+    faces: bool = False
+
+
+class QueryParameters(BaseModel):
+    """查询活动零件的参数，支持增量、前缀过滤和分页"""
+    since: Optional[int] = None
+    prefix: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+    refresh: bool = False
+
+
+class SetParameter(BaseModel):
+    """设置单个参数"""
+    name: str
+    value: ParameterValue
+
+
+class SetParameters(BaseModel):
+    """在一次零件更新中设置多个参数，任一失败时全部回滚"""
+    parameters: Dict[str, ParameterValue] = Field(min_length=1)
+    dry_run: bool = False
+    update: bool = True
+
+    @field_validator('parameters', mode='before')
+    @classmethod
+    def _from_list(cls, value: Any) -> Any:
+        if isinstance(value, list):
+            return {item.get('name'): item.get('value') for item in value if isinstance(item, dict)}
+        return value
+
+
+class CreatePoint(BaseModel):
+    """创建点"""
+    x: float
+    y: float
+    z: float
+
+
+class CreateLine(BaseModel):
+    """由起点和终点创建线"""
+    start_point: Vector
+    end_point: Vector
+
+
+class CreatePlane(BaseModel):
+    """由原点和法向量创建平面"""
+    origin: Vector
+    normal: Vector
+
+
+_GEOMETRY_MODELS: Dict[str, Type[BaseModel]] = {'point': CreatePoint, 'line': CreateLine, 'plane': CreatePlane}
+
+
+class CreateGeometryBatch(BaseModel):
+    """在一个几何图形集中批量创建几何体，只更新一次零件"""
+    items: List[Dict[str, Any]] = []
+    points: Optional[List[Tuple[float, float, float]]] = None
+
+    @field_validator('items', mode='before')
+    @classmethod
+    def _items(cls, value: Any) -> Any:
+        """每项按operation对应的单个创建模型校验，任一项不合法时整批拒绝，不创建任何几何体"""
+        if not isinstance(value, list):
+            return value
+        items = []
+        for index, item in enumerate(value):
+            if not isinstance(item, dict):
+                raise ValueError(f"[{index}] 应为包含operation的对象")
+            model = _GEOMETRY_MODELS.get(item.get('operation'))
+            if model is None:
+                raise ValueError(f"[{index}] 不支持的操作: {item.get('operation')}")
+            try:
+                values = model.model_validate(item)
+            except ValidationError as e:
+                raise ValueError(f"[{index}] {_field_errors(e)}")
+            items.append({"operation": item['operation'], **values.model_dump()})
+        return items
+
+    @model_validator(mode='before')
+    @classmethod
+    def _unpack(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            try:
+                return dict(data, points=unpack_points(data))
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"点坐标格式错误: {str(e)}")
+        return data
+
+    @model_validator(mode='after')
+    def _not_empty(self) -> "CreateGeometryBatch":
+        if not self.items and not self.points:
+            raise ValueError("几何体列表不能为空")
+        return self
+
+
+class CreateSketch(BaseModel):
+    """在平面上创建草图"""
+    plane: Reference
+
+
+class AddSketchLine(BaseModel):
+    """向草图添加直线"""
+    sketch: Reference
+    start_point: Vector
+    end_point: Vector
+
+
+class AddSketchCircle(BaseModel):
+    """向草图添加圆"""
+    sketch: Reference
+    center: Vector
+    radius: float
+
+
+class CreatePad(BaseModel):
+    """由草图拉伸凸台"""
+    sketch: Reference
+    length: float
+
+
+class CreatePocket(BaseModel):
+    """由草图创建凹槽"""
+    sketch: Reference
+    length: float
+
+
+class CreateRevolution(BaseModel):
+    """由草图创建旋转体"""
+    sketch: Reference
+    angle: float
+
+
+class AddComponent(BaseModel):
+    """向装配体添加组件"""
+    file_path: str
+    position: Vector = [0, 0, 0]
+
+
+IDENTITY_TRANSFORM = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0)
+TRANSFORM_TOLERANCE = 1e-6
+
+
+def catia_transform(matrix: Any) -> Tuple[float, ...]:
+    """4x4齐次变换矩阵（按行排列，嵌套或扁平的16个数）转换为CATIA的12元数组：X、Y、Z轴方向和原点"""
+    if len(matrix) == 4 and all(isinstance(row, (list, tuple)) and len(row) == 4 for row in matrix):
+        values = [float(value) for row in matrix for value in row]
+    elif len(matrix) == 16:
+        values = [float(value) for value in matrix]
+    else:
+        raise ValueError("变换矩阵必须是4x4")
+    rows = [values[i:i + 4] for i in range(0, 16, 4)]
+    if any(abs(value - expected) > TRANSFORM_TOLERANCE for value, expected in zip(rows[3], (0, 0, 0, 1))):
+        raise ValueError("变换矩阵最后一行必须是[0, 0, 0, 1]")
+    axes = [[rows[r][c] for r in range(3)] for c in range(3)]
+    for i in range(3):
+        for j in range(i, 3):
+            if abs(sum(a * b for a, b in zip(axes[i], axes[j])) - (i == j)) > TRANSFORM_TOLERANCE:
+                raise ValueError("变换矩阵的旋转部分必须是正交矩阵")
+    return (*axes[0], *axes[1], *axes[2], rows[0][3], rows[1][3], rows[2][3])
+
+
+class AddComponents(BaseModel):
+    """批量向装配体添加组件：每个文件只加载一次，重复的文件作为已加载组件的新实例添加，全部添加后统一放置"""
+    components: List[Tuple[str, Tuple[float, ...]]] = Field(min_length=1)
+
+    @field_validator('components', mode='before')
+    @classmethod
+    def _entries(cls, value: Any) -> Any:
+        """每项为{"file_path", "transform"}或[file_path, transform]，transform为4x4矩阵；
+        字典中也可以只给position（平移），都不给时不移动"""
+        if not isinstance(value, list):
+            return value
+        entries = []
+        for index, item in enumerate(value):
+            if isinstance(item, dict):
+                file_path, matrix, position = item.get('file_path'), item.get('transform'), item.get('position')
+            elif isinstance(item, (list, tuple)) and len(item) == 2:
+                (file_path, matrix), position = item, None
+            else:
+                raise ValueError(f"[{index}] 应为{{file_path, transform}}或[file_path, transform]")
+            if not file_path or not isinstance(file_path, str):
+                raise ValueError(f"[{index}] 缺少file_path")
+            try:
+                if matrix is not None:
+                    transform = catia_transform(matrix)
+                elif position is not None:
+                    if len(position) != 3:
+                        raise ValueError("position必须包含3个坐标")
+                    transform = IDENTITY_TRANSFORM[:9] + tuple(float(value) for value in position)
+                else:
+                    transform = IDENTITY_TRANSFORM
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"[{index}] {e}")
+            entries.append((file_path, transform))
+        return entries
+
+
+class CreateConstraint(BaseModel):
+    """在两个组件之间创建约束"""
+    component1: Reference
+    component2: Reference
+    constraint_type: str
+    reference1: Reference
+    reference2: Reference
+
+
+class MeasureDistance(BaseModel):
+    """测量两点（坐标或几何引用）之间的距离"""
+    point1: Reference
+    point2: Reference
+
+
+class MeasureAngle(BaseModel):
+    """测量两条线之间的角度"""
+    line1: Reference
+    line2: Reference
+
+
+class MeasureBulk(BaseModel):
+    """批量测量逐对的距离或角度：纯坐标条目在服务端向量化计算，引用几何的条目在一次调用中逐对测量
+
+    input1/input2为条目列表，也可以用input1_buffer/input2_buffer传base64编码的小端float64坐标；
+    packed为true时结果以values_buffer返回
+    """
+    operation: Literal['distance', 'angle']
+    input1: Reference
+    input2: Reference
+    packed: bool = False
+
+    @model_validator(mode='before')
+    @classmethod
+    def _unpack(cls, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        for field in ('input1', 'input2'):
+            if data.get(f'{field}_buffer'):
+                try:
+                    data[field] = unpack_floats(data.pop(f'{field}_buffer'))
+                except (ValueError, TypeError) as e:
+                    raise ValueError(f"坐标格式错误: {str(e)}")
+        return data
+
+    @model_validator(mode='after')
+    def _same_length(self) -> "MeasureBulk":
+        if not all(isinstance(entries, (list, np.ndarray)) for entries in (self.input1, self.input2)):
+            raise ValueError("输入必须是条目列表")
+        if len(self.input1) != len(self.input2):
+            raise ValueError("两组输入的数量必须相同")
+        for entries in (self.input1, self.input2):
+            for index, entry in enumerate(entries if isinstance(entries, list) else ()):
+                # 几何引用、坐标，或角度测量中由两点表示的线
+                sizes = (2, 3) if self.operation == 'angle' else (3,)
+                if not (isinstance(entry, (str, dict)) or isinstance(entry, (list, tuple)) and len(entry) in sizes):
+                    raise ValueError(f"第{index}项格式错误")
+        return self
+
+
+class MeasureArea(BaseModel):
+    """测量面积"""
+    face: Reference
+
+
+class MeasureVolume(BaseModel):
+    """测量体积"""
+    body: Reference
+
+
+class AnalyzeMass(BaseModel):
+    """计算实体质量"""
+    body: Reference
+
+
+class CheckInterference(BaseModel):
+    """检查两个实体是否干涉"""
+    body1: Reference
+    body2: Reference
+
+
+class CheckInterferenceMatrix(BaseModel):
+    """包围盒粗筛加精确检查的两两干涉检查：装配中检查组件（默认根产品下的全部组件），零件中检查实体（默认全部）"""
+    bodies: Optional[List[Reference]] = Field(None, min_length=2)
+    margin: float = Field(0.0, ge=0)
+    components: Optional[List[Reference]] = Field(None, min_length=2)
+
+
+class CreateDrawingView(BaseModel):
+    """创建工程图视图"""
+    name: str
+    type: str = 'Front'
+
+
+class AddDimension(BaseModel):
+    """在视图中添加尺寸"""
+    view: Reference
+    reference1: Reference
+    reference2: Reference
+
+
+def _format_errors(error: ValidationError) -> str:
+    return "参数错误: " + _field_errors(error)
+
+
+def _field_errors(error: ValidationError) -> str:
+    """每个字段只报告第一条错误，联合类型的多个候选分支不逐一列出"""
+    messages: Dict[str, str] = {}
+    for item in error.errors():
+        field = str(item['loc'][0]) if item['loc'] else ''
+        if field in messages:
+            continue
+        if item['type'] == 'missing' or item.get('input', '') is None:
+            message = "不能为空"
+        else:
+            message = item['msg'].replace('Value error, ', '')
+        messages[field] = f"{field}: {message}" if field else message
+    return "; ".join(messages.values())
+
+
+class Operation:
+    """一个已注册的操作：服务方法名、请求模型和响应格式
+
+    response为message时返回{"message", "data"}（创建类操作），为data时把结果整体放在data中；
+    error_status是服务返回失败时的HTTP状态码
+    """
+
+    def __init__(self, resource: str, name: str, method: str, model: Type[BaseModel] = NoArguments,
+                 response: str = 'message', error_status: int = 200, read_only: bool = False,
+                 description: Optional[str] = None):
+        self.resource = resource
+        self.name = name
+        self.method = method
+        self.model = model
+        self.response = response
+        self.error_status = error_status
+        self.read_only = read_only
+        self._description = description
+        self.params = tuple(model.model_fields)
+
+    @property
+    def tool_name(self) -> str:
+        return f"{self.resource}_{self.name}"
+
+    @property
+    def description(self) -> str:
+        return (self._description or self.model.__doc__ or self.method).strip()
+
+    def bind(self, args: Dict) -> list:
+        """校验参数并按服务方法的参数顺序返回，校验失败时抛出ValueError"""
+        try:
+            values = self.model.model_validate(args)
+        except ValidationError as e:
+            raise ValueError(_format_errors(e))
+        return [getattr(values, name) for name in self.params]
+
+    def __call__(self, service: Any, args: Dict) -> tuple:
+        return getattr(service, self.method)(*self.bind(args))
+
+    def respond(self, success: bool, result: Any):
+        """把服务返回的(success, result)转换为REST响应"""
+        if not success:
+            return {"status": "error", "message": result}, self.error_status
+        if self.response == 'data':
+            return {"status": "success", "data": result}
+        if isinstance(result, str):
+            return {"status": "success", "message": result}
+        data = dict(result)
+        return {"status": "success", "message": data.pop("message"), "data": data}
+
+    def json_schema(self, ref_template: str = '#/$defs/{model}') -> Dict:
+        schema = self.model.model_json_schema(ref_template=ref_template)
+        schema.pop('title', None)
+        return schema
+
+
+OPERATIONS: Dict[Tuple[str, str], Operation] = {}
+
+
+def register(resource: str, name: str, method: str, model: Type[BaseModel] = NoArguments, **options) -> Operation:
+    operation = Operation(resource, name, method, model, **options)
+    OPERATIONS[(resource, name)] = operation
+    return operation
+
+
+register('document', 'open', 'open_document', OpenDocument, error_status=500)
+register('document', 'save', 'save_document', SaveDocument)
+register('document', 'create', 'create_new_document', CreateDocument)
+register('document', 'close', 'close_document', CloseDocument)
+register('document', 'close_all', 'close_all_documents', description="关闭当前会话打开的全部文档")
+register('document', 'switch', 'switch_document', SwitchDocument, error_status=404)
+register('document', 'list', 'list_documents', response='data', read_only=True,
+         description="列出当前会话打开的文档")
+register('document', 'bodies', 'list_bodies', ListBodies, response='data', error_status=500, read_only=True)
+register('document', 'tree', 'walk_tree', WalkTree, response='data', error_status=400, read_only=True)
+register('parameters', 'get', 'query_parameters', QueryParameters, response='data', error_status=500,
+         read_only=True)
+register('parameters', 'set', 'set_parameter', SetParameter)
+register('parameters', 'bulk', 'set_parameters', SetParameters, response='data', error_status=500)
+register('geometry', 'point', 'create_point', CreatePoint)
+register('geometry', 'line', 'create_line', CreateLine)
+register('geometry', 'plane', 'create_plane', CreatePlane)
+register('geometry', 'batch', 'create_geometry_batch', CreateGeometryBatch, response='data', error_status=500)
+register('sketch', 'create', 'create_sketch', CreateSketch)
+register('sketch', 'add_line', 'add_line_to_sketch', AddSketchLine)
+register('sketch', 'add_circle', 'add_circle_to_sketch', AddSketchCircle)
+register('feature', 'pad', 'create_pad', CreatePad)
+register('feature', 'pocket', 'create_pocket', CreatePocket)
+register('feature', 'revolution', 'create_revolution', CreateRevolution)
+register('assembly', 'add_component', 'add_component', AddComponent)
+register('assembly', 'create_constraint', 'create_constraint', CreateConstraint)
+register('assembly', 'bulk', 'add_components', AddComponents, response='data', error_status=500)
+register('measure', 'distance', 'measure_distance', MeasureDistance, response='data', error_status=500,
+         read_only=True)
+register('measure', 'angle', 'measure_angle', MeasureAngle, response='data', error_status=500, read_only=True)
+register('measure', 'bulk', 'measure_bulk', MeasureBulk, response='data', error_status=500, read_only=True)
+register('measure', 'area', 'measure_area', MeasureArea, response='data', error_status=500, read_only=True)
+register('measure', 'volume', 'measure_volume', MeasureVolume, response='data', error_status=500,
+         read_only=True)
+register('analysis', 'mass', 'analyze_mass', AnalyzeMass, response='data', error_status=500, read_only=True)
+register('analysis', 'interference', 'check_interference', CheckInterference, response='data',
+         error_status=500, read_only=True)
+register('analysis', 'interference_matrix', 'check_interference_matrix', CheckInterferenceMatrix,
+         response='data', error_status=500, read_only=True)
+register('drawing', 'create_view', 'create_drawing_view', CreateDrawingView)
+register('drawing', 'add_dimension', 'add_dimension', AddDimension)
+register('system', 'info', 'get_system_info', response='data', error_status=500, read_only=True,
+         description="获取CATIA版本、许可证和工作空间信息")
+
+
+def tool_manifest() -> List[Dict]:
+    """MCP工具清单：每个操作一个工具，inputSchema为请求模型的JSON Schema"""
+    return [{"name": operation.tool_name, "description": operation.description,
+             "inputSchema": operation.json_schema(),
+             "annotations": {"readOnlyHint": operation.read_only}}
+            for operation in OPERATIONS.values()]
+
+
+# 不通过operation字段分派的REST端点
+_REST_PATHS = {
+    ('document', 'tree'): ('/api/catia/tree', 'get'),
+    ('parameters', 'get'): ('/api/catia/parameters', 'get'),
+    ('parameters', 'set'): ('/api/catia/parameters', 'post'),
+    ('parameters', 'bulk'): ('/api/catia/parameters/bulk', 'post'),
+    ('geometry', 'batch'): ('/api/catia/geometry/batch', 'post'),
+    ('assembly', 'bulk'): ('/api/catia/assembly/bulk', 'post'),
+    ('measure', 'bulk'): ('/api/catia/measure/bulk', 'post'),
+    ('system', 'info'): ('/api/catia/system', 'get'),
+}
+
+
+def openapi_document() -> Dict:
+    """由注册表生成OpenAPI 3.0文档；同一端点的多个操作以operation字段区分"""
+    paths: Dict[str, Dict] = {}
+    schemas: Dict[str, Dict] = {}
+    for key, operation in OPERATIONS.items():
+        schema = operation.json_schema('#/components/schemas/{model}')
+        schemas.update(schema.pop('$defs', {}))
+        path, method = _REST_PATHS.get(key, (None, 'post'))
+        if path is None:
+            schema['title'] = operation.tool_name
+            schema['properties'] = {"operation": {"type": "string", "enum": [operation.name]},
+                                    **schema.get('properties', {})}
+            schema['required'] = ["operation", *schema.get('required', [])]
+            entry = paths.setdefault(f"/api/catia/{operation.resource}", {}).setdefault('post', {
+                "operationId": operation.resource,
+                "requestBody": {"content": {"application/json": {"schema": {"oneOf": []}}}},
+                "responses": {"200": {"description": "成功"}}
+            })
+            entry["requestBody"]["content"]["application/json"]["schema"]["oneOf"].append(schema)
+            continue
+        entry = {"operationId": operation.tool_name, "summary": operation.description,
+                 "responses": {"200": {"description": "成功"}}}
+        if method == 'get':
+            entry["parameters"] = [{"name": name, "in": "query", "schema": field}
+                                   for name, field in schema.get('properties', {}).items()]
+        else:
+            entry["requestBody"] = {"content": {"application/json": {"schema": schema}}}
+        paths.setdefault(path, {})[method] = entry
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "CATIA MCP服务", "version": "1.0"},
+        "paths": paths,
+        "components": {
+            "schemas": schemas,
+            "securitySchemes": {"bearerAuth": {"type": "http", "scheme": "bearer", "bearerFormat": "JWT"}}
+        },
+        "security": [{"bearerAuth": []}]
+    }
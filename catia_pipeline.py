@@ -0,0 +1,88 @@
+"""命令流水线：一次请求中按顺序执行多个CATIA操作
+
+每个步骤为{resource, operation, args}，通过操作注册表（catia_operations）查表找到对应的服务方法。
+args中形如"$<步骤id>.<路径>"的字符串引用前面步骤的输出，例如"$sketch.handle"表示id为sketch的步骤返回的句柄；
+未指定id的步骤可以用序号引用，如"$0.handle"。
+"""
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PIPELINE_MAX_STEPS = int(os.getenv('CATIA_PIPELINE_MAX_STEPS', '100'))
+
+_REFERENCE = re.compile(r'^\$([A-Za-z0-9_-]+)((?:\.[A-Za-z0-9_-]+)*)$')
+
+
+def _resolve(value: Any, outputs: Dict[str, Any]) -> Any:
+    """把参数中的步骤输出引用替换为实际值"""
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        if not match:
+            return value
+        step_id, path = match.group(1), match.group(2)
+        if step_id not in outputs:
+            raise ValueError(f"引用的步骤不存在或未成功: {step_id}")
+        result = outputs[step_id]
+        for key in filter(None, path.split('.')):
+            try:
+                result = result[int(key)] if isinstance(result, list) else result[key]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise ValueError(f"引用路径无效: {value}")
+        return result
+    if isinstance(value, list):
+        return [_resolve(item, outputs) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item, outputs) for key, item in value.items()}
+    return value
+
+
+def _split_result(result: Any) -> Tuple[Optional[str], Any]:
+    """创建类操作返回{"message", ...}，消息和数据分开；其他操作的结果整体作为数据"""
+    if isinstance(result, dict) and 'message' in result:
+        data = dict(result)
+        return data.pop('message'), data
+    return None, result
+
+
+def run_pipeline(service: Any, steps: List[Dict], operations: Dict[Tuple[str, str], Any],
+                 on_error: str = 'stop') -> Dict:
+    """按顺序执行步骤，返回每个步骤的状态、输出和耗时
+
+    on_error为stop时遇到失败的步骤后停止，后续步骤标记为skipped；为continue时继续执行
+    """
+    outputs: Dict[str, Any] = {}
+    results = []
+    stopped = False
+    start = time.perf_counter()
+    for index, step in enumerate(steps):
+        step_id = str(step.get('id', index))
+        row = {"id": step_id, "resource": step.get('resource'), "operation": step.get('operation')}
+        results.append(row)
+        if stopped:
+            row["status"] = "skipped"
+            continue
+        step_start = time.perf_counter()
+        try:
+            operation = operations.get((step.get('resource'), step.get('operation')))
+            if operation is None:
+                raise ValueError("不支持的操作")
+            success, result = operation(service, _resolve(step.get('args') or {}, outputs))
+        except Exception as e:
+            success, result = False, getattr(e, 'data', {}).get('message') or str(e)
+        row["elapsed_ms"] = round((time.perf_counter() - step_start) * 1000, 3)
+        if success:
+            message, data = _split_result(result)
+            outputs[step_id] = data
+            row["status"] = "success"
+            if message is not None:
+                row["message"] = message
+            row["data"] = data
+        else:
+            row["status"] = "error"
+            row["message"] = result
+            stopped = on_error == 'stop'
+    counts = {status: sum(1 for row in results if row["status"] == status)
+              for status in ("success", "error", "skipped")}
+    return {"steps": results, "succeeded": counts["success"], "failed": counts["error"],
+            "skipped": counts["skipped"], "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
@@ -0,0 +1,413 @@
+"""多进程CATIA实例池
+
+每个工作进程持有独立的CATIA应用句柄，并为每个用户会话维护一个CATIAService，主进程按文档亲和性调度：
+打开已在某个进程中打开的文档时路由到该进程，新文档分配给负载最低的进程，
+其余调用路由到该会话最近一次打开或创建文档的进程。同一工作进程上不同会话的调用按加权轮询交替执行。
+后台线程定期做健康检查，进程崩溃或卡死时自动重启。
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from werkzeug.exceptions import GatewayTimeout, InternalServerError, TooManyRequests
+
+import catia_logging
+import catia_metrics
+from catia_sessions import FairLock
+
+logger = logging.getLogger(__name__)
+
+HEALTH_INTERVAL = float(os.getenv('CATIA_POOL_HEALTH_INTERVAL', '10'))
+HEALTH_TIMEOUT = float(os.getenv('CATIA_POOL_HEALTH_TIMEOUT', '5'))
+
+
+class PoolBusyError(TooManyRequests):
+    """进程池待处理请求已满，对应HTTP 429"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"status": "error", "message": "CATIA进程池繁忙，请稍后重试"}
+
+
+class WorkerCrashedError(InternalServerError):
+    """工作进程在执行调用时崩溃，已重启，进程中的文档状态丢失"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"status": "error", "message": "CATIA工作进程异常退出，已重启，请重新打开文档"}
+
+
+class WorkerTimeoutError(GatewayTimeout):
+    """工作进程执行调用超时，已重启"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"status": "error", "message": "CATIA工作进程执行超时，已重启，请重新打开文档"}
+
+
+def _worker_main(conn, backend: str):
+    """工作进程入口：持有独立的CATIA应用句柄，按顺序执行主进程发来的调用
+
+    每个会话对应一个CATIAService，同一进程内的会话共享CATIA应用连接
+    """
+    # 只导入服务类，不加载Flask应用、执行器和快照刷新等主进程才需要的组件
+    from catia_service import CATIAService
+    catia_logging.setup_logging()
+    services: Dict[Optional[str], Any] = {}
+    while True:
+        try:
+            session, method, args, kwargs = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if method == '__ping__':
+            conn.send(('ok', os.getpid()))
+            continue
+        service = services.get(session)
+        if service is None:
+            service = services[session] = CATIAService(backend)
+        try:
+            conn.send(('ok', getattr(service, method)(*args, **kwargs)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+        if method == 'close_all_documents':
+            services.pop(session, None)
+
+
+def _document_key(file_path: str) -> str:
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+class _Worker:
+    def __init__(self, index: int, backend: str, context):
+        self.index = index
+        self.backend = backend
+        self._context = context
+        self.lock = FairLock()
+        self.process = None
+        self.conn = None
+        self.in_flight = 0
+        # 文档ID -> 文件路径键（新建文档为None）
+        self.documents: Dict[str, Optional[str]] = {}
+        self.active_document: Optional[str] = None
+        self.connected = False
+        self.restarts = 0
+        self.last_health_ms: Optional[float] = None
+
+    def start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(target=_worker_main, args=(child_conn, self.backend),
+                                             name=f"catia-worker-{self.index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def stop(self):
+        if self.conn is not None:
+            self.conn.close()
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+
+    def request(self, session: Optional[str], method: str, args: tuple, kwargs: Dict, timeout: float) -> Any:
+        """发送一次调用并等待结果，调用方需持有self.lock"""
+        self.conn.send((session, method, args, kwargs))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(method)
+        status, payload = self.conn.recv()
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+
+class _SessionRoute:
+    """某个用户会话的调用接口，与CATIAService的方法一致"""
+
+    def __init__(self, pool: "CATIAWorkerPool", session: Optional[str]):
+        self._pool = pool
+        self._session = session
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool._dispatch(self._session, name, args, kwargs)
+        return call
+
+    def for_document(self, file_path: str) -> "_DocumentRoute":
+        return _DocumentRoute(self._pool, _document_key(file_path), self._session)
+
+    def worker(self, index: int) -> "_WorkerRoute":
+        return _WorkerRoute(self._pool, self._pool._workers[index], self._session)
+
+
+class _DocumentRoute:
+    def __init__(self, pool: "CATIAWorkerPool", key: str, session: Optional[str] = None):
+        self._pool = pool
+        self._key = key
+        self._session = session
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool._call_document(self._key, self._session, name, args, kwargs)
+        return call
+
+
+class _WorkerRoute:
+    def __init__(self, pool: "CATIAWorkerPool", worker: _Worker, session: Optional[str] = None):
+        self._pool = pool
+        self._worker = worker
+        self._session = session
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            if not self._pool._started:
+                self._pool.start()
+            return self._pool._call_worker(self._worker, self._session, name, args, kwargs)
+        return call
+
+
+class CATIAWorkerPool:
+    """CATIA进程池，对外提供与CATIAService相同的方法调用接口"""
+
+    def __init__(self, size: int, backend: str = 'pycatia', max_pending: int = 64, call_timeout: float = 600.0):
+        self.size = size
+        self.backend = backend
+        self.max_pending = max_pending
+        self.call_timeout = call_timeout
+        context = multiprocessing.get_context('spawn')
+        self._workers = [_Worker(i, backend, context) for i in range(size)]
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._affinity: Dict[str, _Worker] = {}
+        # 会话 -> 最近一次打开、创建或切换文档的工作进程
+        self._active: Dict[Optional[str], _Worker] = {}
+        self._pending = 0
+        self._started = False
+        self._stopping = threading.Event()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        return call
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            for worker in self._workers:
+                worker.start()
+            threading.Thread(target=self._monitor_loop, name='catia-pool-monitor', daemon=True).start()
+            atexit.register(self.shutdown)
+            self._started = True
+            logger.info("CATIA进程池已启动，工作进程数: %s", self.size)
+
+    def shutdown(self):
+        self._stopping.set()
+        for worker in self._workers:
+            worker.stop()
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        return self._dispatch(None, method, args, kwargs)
+
+    def _dispatch(self, session: Optional[str], method: str, args: tuple, kwargs: Dict) -> Any:
+        if not self._started:
+            self.start()
+        if method == 'connect':
+            return all([self._call_worker(worker, session, method, args, kwargs) for worker in self._workers])
+        if method == 'list_documents':
+            documents = []
+            for worker in self._workers:
+                success, result = self._call_worker(worker, session, method, args, kwargs)
+                active = worker is self._active.get(session)
+                documents.extend(dict(item, worker=worker.index, active=item['active'] and active)
+                                 for item in result)
+            return True, documents
+        if method == 'close_all_documents':
+            document_ids = []
+            for worker in self._workers:
+                success, result = self._call_worker(worker, session, method, args, kwargs)
+                document_ids.extend(result['document_ids'])
+            with self._lock:
+                self._active.pop(session, None)
+            return True, {"message": f"已关闭{len(document_ids)}个文档", "document_ids": document_ids}
+        return self._call_worker(None, session, method, args, kwargs)
+
+    def for_session(self, session: Optional[str]) -> "_SessionRoute":
+        """返回某个用户会话的调用接口，会话在每个工作进程中拥有独立的文档和句柄"""
+        return _SessionRoute(self, session)
+
+    def for_document(self, file_path: str) -> "_DocumentRoute":
+        """返回固定路由到持有该文档的工作进程的调用接口"""
+        return _DocumentRoute(self, _document_key(file_path))
+
+    def worker(self, index: int) -> "_WorkerRoute":
+        """返回固定路由到指定工作进程的调用接口，用于需要在多个进程上并行执行的任务"""
+        return _WorkerRoute(self, self._workers[index])
+
+    def _call_document(self, key: str, session: Optional[str], method: str, args: tuple, kwargs: Dict) -> Any:
+        if not self._started:
+            self.start()
+        with self._lock:
+            worker = self._affinity.get(key)
+        return self._call_worker(worker, session, method, args, kwargs)
+
+    def _call_worker(self, worker: Optional[_Worker], session: Optional[str], method: str, args: tuple,
+                     kwargs: Dict) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolBusyError()
+            self._pending += 1
+            worker = worker or self._route(session, method, args, kwargs)
+            worker.in_flight += 1
+        try:
+            result = self._invoke(worker, session, method, args, kwargs)
+            self._after_call(worker, session, method, args, kwargs, result)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+                worker.in_flight -= 1
+
+    def _least_loaded(self) -> _Worker:
+        return min(self._workers, key=lambda w: (w.in_flight, len(w.documents), w.index))
+
+    def _route(self, session: Optional[str], method: str, args: tuple, kwargs: Dict) -> _Worker:
+        if method == 'open_document':
+            worker = self._affinity.get(_document_key(args[0] if args else kwargs['file_path']))
+            return worker or self._least_loaded()
+        if method in ('create_new_document', 'get_system_info'):
+            return self._least_loaded()
+        if method in ('switch_document', 'close_document'):
+            document_id = args[0] if args else kwargs.get('document_id')
+            if document_id:
+                return self._affinity.get(document_id) or self._active.get(session) or self._least_loaded()
+        return self._active.get(session) or self._least_loaded()
+
+    def _after_call(self, worker: _Worker, session: Optional[str], method: str, args: tuple, kwargs: Dict,
+                    result: Any):
+        with self._lock:
+            if method == 'connect':
+                worker.connected = bool(result)
+                return
+            if method not in ('open_document', 'create_new_document', 'switch_document', 'close_document',
+                              'close_all_documents') or not result[0]:
+                return
+            if method in ('close_document', 'close_all_documents'):
+                if method == 'close_all_documents':
+                    document_ids = result[1]['document_ids']
+                else:
+                    document_ids = [(args[0] if args else kwargs.get('document_id')) or worker.active_document]
+                for document_id in document_ids:
+                    key = worker.documents.pop(document_id, None)
+                    self._affinity.pop(document_id, None)
+                    if key is not None and self._affinity.get(key) is worker \
+                            and key not in worker.documents.values():
+                        self._affinity.pop(key, None)
+                    if worker.active_document == document_id:
+                        worker.active_document = None
+                return
+            document_id = result[1]['document_id']
+            if method == 'open_document':
+                key = _document_key(args[0] if args else kwargs['file_path'])
+                self._affinity[key] = worker
+                worker.documents[document_id] = key
+            elif method == 'create_new_document':
+                worker.documents[document_id] = None
+            self._affinity[document_id] = worker
+            worker.active_document = document_id
+            self._active[session] = worker
+
+    def _invoke(self, worker: _Worker, session: Optional[str], method: str, args: tuple, kwargs: Dict) -> Any:
+        enqueued = time.perf_counter()
+        worker.lock.acquire(key=session)
+        started = time.perf_counter()
+        outcome = 'exception'
+        try:
+            result = worker.request(session, method, args, kwargs, self.call_timeout)
+            outcome = catia_metrics.outcome(result)
+            return result
+        except TimeoutError:
+            logger.error("CATIA工作进程%s执行%s超时", worker.index, method)
+            self._restart(worker)
+            raise WorkerTimeoutError()
+        except (EOFError, OSError) as e:
+            logger.error("CATIA工作进程%s异常退出: %s", worker.index, e)
+            self._restart(worker)
+            raise WorkerCrashedError()
+        finally:
+            worker.lock.release()
+            elapsed = time.perf_counter() - started
+            catia_metrics.record_com_call(catia_metrics.current(), method, started - enqueued, elapsed, outcome)
+            catia_logging.log_operation(method, elapsed, started - enqueued, outcome, session)
+
+    def _restart(self, worker: _Worker):
+        """重启工作进程，调用方需持有worker.lock"""
+        with self._lock:
+            for document_id, key in worker.documents.items():
+                self._affinity.pop(document_id, None)
+                self._affinity.pop(key, None)
+            worker.documents.clear()
+            worker.active_document = None
+            for session in [session for session, active in self._active.items() if active is worker]:
+                del self._active[session]
+        worker.stop()
+        worker.start()
+        worker.restarts += 1
+        if worker.connected:
+            try:
+                worker.connected = bool(worker.request(None, 'connect', (), {}, self.call_timeout))
+            except Exception as e:
+                worker.connected = False
+                logger.error("CATIA工作进程%s重启后连接失败: %s", worker.index, e)
+
+    def check_health(self, worker: _Worker) -> bool:
+        """对空闲的工作进程做一次心跳检查，失败时重启；正在执行调用的进程视为健康"""
+        if not worker.lock.acquire(blocking=False):
+            return True
+        try:
+            if worker.process.is_alive():
+                try:
+                    start = time.perf_counter()
+                    worker.request(None, '__ping__', (), {}, HEALTH_TIMEOUT)
+                    worker.last_health_ms = round((time.perf_counter() - start) * 1000, 3)
+                    return True
+                except (TimeoutError, EOFError, OSError):
+                    pass
+            logger.warning("CATIA工作进程%s健康检查失败，正在重启", worker.index)
+            self._restart(worker)
+            return False
+        finally:
+            worker.lock.release()
+
+    def _monitor_loop(self):
+        while not self._stopping.wait(HEALTH_INTERVAL):
+            for worker in self._workers:
+                self.check_health(worker)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            workers: List[Dict] = [{
+                "index": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": bool(worker.process and worker.process.is_alive()),
+                "in_flight": worker.in_flight,
+                "documents": len(worker.documents),
+                "restarts": worker.restarts,
+                "last_health_ms": worker.last_health_ms
+            } for worker in self._workers]
+            return {"size": self.size, "pending": self._pending, "max_pending": self.max_pending,
+                    "workers": workers}
@@ -0,0 +1,178 @@
+"""生产环境HTTP服务启动器
+
+默认使用waitress（纯Python，可在运行CATIA的Windows上使用），也可以选择gunicorn（仅Linux/macOS）
+或Flask开发服务器。HTTP并发只通过单进程内的多个请求线程实现：所有CATIA调用仍然进入同一个COM执行器
+（或CATIA进程池），多个HTTP工作进程会各自持有一套会话和文档状态，因此工作进程数固定为1，
+需要并行的CATIA实例时使用CATIA_POOL_SIZE。
+
+停机时先停止接收新请求（返回503），等待进行中的请求和COM执行器队列在CATIA_HTTP_GRACEFUL_TIMEOUT内完成。
+"""
+import _thread
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+HTTP_SERVER = os.getenv('CATIA_HTTP_SERVER', 'waitress')
+HTTP_HOST = os.getenv('CATIA_HTTP_HOST', '0.0.0.0')
+HTTP_PORT = int(os.getenv('CATIA_HTTP_PORT', '5000'))
+HTTP_WORKERS = int(os.getenv('CATIA_HTTP_WORKERS', '1'))
+HTTP_THREADS = int(os.getenv('CATIA_HTTP_THREADS', '16'))
+HTTP_TIMEOUT = float(os.getenv('CATIA_HTTP_TIMEOUT', '660'))
+HTTP_KEEPALIVE = float(os.getenv('CATIA_HTTP_KEEPALIVE', '30'))
+HTTP_GRACEFUL_TIMEOUT = float(os.getenv('CATIA_HTTP_GRACEFUL_TIMEOUT', '30'))
+HTTP_BACKLOG = int(os.getenv('CATIA_HTTP_BACKLOG', '1024'))
+HTTP_CONNECTION_LIMIT = int(os.getenv('CATIA_HTTP_CONNECTION_LIMIT', '1000'))
+
+SERVERS = ('waitress', 'gunicorn', 'dev')
+
+
+class DrainMiddleware:
+    """统计进行中的请求；进入排空状态后新请求直接返回503"""
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.draining = False
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self.draining:
+            body = json.dumps({"status": "error", "message": "服务正在停止，请稍后重试"}, ensure_ascii=False).encode('utf-8')
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json'),
+                                                       ('Content-Length', str(len(body))),
+                                                       ('Retry-After', '5')])
+            return [body]
+        with self._lock:
+            self._in_flight += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._finished()
+            raise
+        # 流式响应（SSE、NDJSON）在响应体关闭后才算完成
+        return ClosingIterator(result, self._finished)
+
+    def _finished(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def wait_idle(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._in_flight:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+
+def _effective_workers() -> int:
+    if HTTP_WORKERS > 1:
+        logger.warning("CATIA_HTTP_WORKERS=%s被忽略：多个HTTP工作进程无法共享COM执行器和会话状态，"
+                       "请增加CATIA_HTTP_THREADS，或使用CATIA_POOL_SIZE启用CATIA进程池", HTTP_WORKERS)
+    return 1
+
+
+def _serve_waitress(app: Any, host: str, port: int, drain: Callable[[float], bool]):
+    from waitress.server import create_server
+
+    middleware = DrainMiddleware(app)
+    server = create_server(middleware, host=host, port=port, threads=HTTP_THREADS,
+                           channel_timeout=HTTP_KEEPALIVE, backlog=HTTP_BACKLOG,
+                           connection_limit=HTTP_CONNECTION_LIMIT, ident='catia-mcp-service')
+    stopped = threading.Event()
+
+    def shutdown():
+        start = time.monotonic()
+        logger.info("开始优雅停机，进行中的请求: %s", middleware.in_flight)
+        idle = middleware.wait_idle(HTTP_GRACEFUL_TIMEOUT)
+        remaining = max(0.0, HTTP_GRACEFUL_TIMEOUT - (time.monotonic() - start))
+        drained = drain(remaining)
+        if not (idle and drained):
+            logger.warning("优雅停机超时，仍有%s个请求未完成", middleware.in_flight)
+        logger.info("停机排空耗时%.1f秒", time.monotonic() - start)
+        stopped.set()
+        _thread.interrupt_main()
+
+    def on_signal(signum, frame):
+        if stopped.is_set() or middleware.draining:
+            # 排空完成，或再次收到信号时立即退出
+            raise KeyboardInterrupt
+        middleware.draining = True
+        threading.Thread(target=shutdown, name='catia-http-drain', daemon=True).start()
+
+    for name in ('SIGTERM', 'SIGINT', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+    logger.info("waitress启动: http://%s:%s，请求线程数%s", host, port, HTTP_THREADS)
+    # run()收到KeyboardInterrupt时关闭监听套接字和连接后返回
+    server.run()
+    server.task_dispatcher.shutdown()
+
+
+def _serve_gunicorn(app: Any, host: str, port: int, drain: Callable[[float], bool],
+                    on_start: Callable[[], None]):
+    from gunicorn.app.base import BaseApplication
+
+    def post_worker_init(worker):
+        # 后台线程不能跨fork，在工作进程中启动
+        on_start()
+
+    def worker_exit(server, worker):
+        # gunicorn已在graceful_timeout内等待进行中的请求，这里等待后台任务提交的COM调用
+        drain(HTTP_GRACEFUL_TIMEOUT)
+
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': _effective_workers(),
+        'worker_class': 'gthread',
+        'threads': HTTP_THREADS,
+        'timeout': int(HTTP_TIMEOUT),
+        'graceful_timeout': int(HTTP_GRACEFUL_TIMEOUT),
+        'keepalive': int(HTTP_KEEPALIVE),
+        'backlog': HTTP_BACKLOG,
+        'worker_connections': HTTP_CONNECTION_LIMIT,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value if callable(value) else str(value))
+
+        def load(self):
+            return app
+
+    _Application().run()
+
+
+def serve(app: Any, server: Optional[str] = None, host: str = HTTP_HOST, port: int = HTTP_PORT,
+          drain: Callable[[float], bool] = lambda timeout: True, on_start: Callable[[], None] = lambda: None):
+    """启动HTTP服务；drain(timeout)在停机时等待COM执行器排空，on_start在处理请求的进程中启动后台任务"""
+    server = server or HTTP_SERVER
+    if server not in SERVERS:
+        raise ValueError(f"不支持的HTTP服务: {server}，可选: {', '.join(SERVERS)}")
+    if server == 'gunicorn':
+        _serve_gunicorn(app, host, port, drain, on_start)
+        return
+    on_start()
+    if server == 'waitress':
+        _effective_workers()
+        try:
+            _serve_waitress(app, host, port, drain)
+            return
+        except ImportError:
+            logger.warning("未安装waitress，改用Flask开发服务器")
+    app.run(host=host, port=port, threaded=True)
@@ -0,0 +1,1106 @@
+"""CATIA服务：文档表、对象句柄、参数缓存和全部CATIA操作
+
+本模块只定义CATIAService及其依赖，导入时不创建Flask应用、COM执行器、进程池或后台线程，
+进程池的工作进程只导入本模块。HTTP接口、会话和执行器的装配见catia_mcp_service.py。
+"""
+import importlib
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import catia_snapshots
+import catia_tree
+from catia_clash import candidate_pairs, placed_boxes
+from catia_measure import bulk_measure, pack_floats, to_json_list
+from catia_operations import IDENTITY_TRANSFORM
+
+logger = logging.getLogger(__name__)
+
+# CATIA后端配置：pycatia为真实CATIA，fake为内存模拟后端（见fake_pycatia.py）
+CATIA_BACKEND = os.getenv('CATIA_BACKEND', 'pycatia')
+_BACKEND_MODULES = {'pycatia': 'pycatia', 'fake': 'fake_pycatia'}
+
+def _load_backend(name: str):
+    """按名称加载CATIA后端模块，模块需提供catia_application()"""
+    if name not in _BACKEND_MODULES:
+        raise ValueError(f"不支持的CATIA后端: {name}")
+    return importlib.import_module(_BACKEND_MODULES[name])
+
+# 句柄注册表配置
+HANDLE_CAPACITY = int(os.getenv('CATIA_HANDLE_CAPACITY', '10000'))
+
+class HandleRegistry:
+    """对象句柄注册表：为创建的pycatia对象分配不透明ID，跨请求按ID引用，超出容量时按LRU淘汰"""
+
+    _HANDLE_PATTERN = re.compile(r'^[a-z_]+#[0-9a-f]{16}$')
+
+    def __init__(self, capacity: int = HANDLE_CAPACITY):
+        self.capacity = capacity
+        self.scope: Optional[str] = None
+        self._objects: OrderedDict = OrderedDict()
+        self._keyed: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, obj: Any, key: Optional[str] = None) -> str:
+        """注册对象，句柄归属于当前作用域（活动文档），文档关闭时一并清除
+
+        key为对象在文档中的稳定标识（如实体名称）。COM每次访问集合都返回新的包装对象，
+        提供key时同一文档中同类型、同key的对象复用已有句柄，并把句柄指向最新取得的对象
+        """
+        with self._lock:
+            identity = (self.scope, kind, key) if key is not None else None
+            handle = self._keyed.get(identity) if identity is not None else None
+            if handle is None:
+                handle = f"{kind}#{uuid.uuid4().hex[:16]}"
+                if identity is not None:
+                    self._keyed[identity] = handle
+            self._objects[handle] = (self.scope, obj, identity)
+            self._objects.move_to_end(handle)
+            if len(self._objects) > self.capacity:
+                _, (_, _, evicted) = self._objects.popitem(last=False)
+                self._keyed.pop(evicted, None)
+        return handle
+
+    def resolve(self, value: Any) -> Any:
+        """将句柄解析为缓存对象；非句柄的值（如平面名称）原样返回"""
+        if not isinstance(value, str) or not self._HANDLE_PATTERN.match(value):
+            return value
+        with self._lock:
+            if value not in self._objects:
+                raise ValueError(f"句柄不存在或已失效: {value}")
+            self._objects.move_to_end(value)
+            return self._objects[value][1]
+
+    def clear(self, scope: Optional[str] = None):
+        """清除指定作用域的句柄，不指定时清除全部"""
+        with self._lock:
+            if scope is None:
+                self._objects.clear()
+                self._keyed.clear()
+                return
+            for handle in [h for h, (owner, _, _) in self._objects.items() if owner == scope]:
+                _, _, identity = self._objects.pop(handle)
+                self._keyed.pop(identity, None)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+# 多文档配置：超过打开文档数量或估算内存预算时按LRU关闭空闲文档
+MAX_OPEN_DOCUMENTS = int(os.getenv('CATIA_MAX_OPEN_DOCUMENTS', '32'))
+DOCUMENT_MEMORY_MB = float(os.getenv('CATIA_DOCUMENT_MEMORY_MB', '8192'))
+DOCUMENT_MEMORY_FACTOR = float(os.getenv('CATIA_DOCUMENT_MEMORY_FACTOR', '3'))
+
+def _normalize_path(file_path: str) -> str:
+    return os.path.normcase(os.path.abspath(file_path))
+
+def _estimate_document_mb(file_path: Optional[str]) -> float:
+    """按文件大小估算文档在CATIA中占用的内存，新建文档按1MB计"""
+    try:
+        return max(1.0, os.path.getsize(file_path) * DOCUMENT_MEMORY_FACTOR / 2 ** 20)
+    except (OSError, TypeError):
+        return 1.0
+
+class _LazyDocumentObject:
+    """首次访问时才通过COM获取的文档对象，结果缓存在DocumentState上并记录获取耗时
+
+    resolver返回None表示该类型的文档没有这个对象
+    """
+
+    def __init__(self, resolver: Callable[["DocumentState"], Any]):
+        self.resolver = resolver
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, state, owner=None):
+        if state is None:
+            return self
+        start = time.perf_counter()
+        value = self.resolver(state)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # 写入实例字典后，后续访问不再经过描述符
+        state.__dict__[self.name] = value
+        state.fetch_ms[self.name] = round(elapsed_ms, 3)
+        logger.info("获取文档对象%s耗时%.1fms: %s", self.name, elapsed_ms, state.name)
+        return value
+
+def _part_collection(name: str) -> _LazyDocumentObject:
+    return _LazyDocumentObject(lambda state: getattr(state.part, name) if state.part is not None else None)
+
+class DocumentState:
+    """一个已打开的文档，零件、参数、几何图形集等集合对象在首次使用时获取并缓存，切换活动文档时直接复用"""
+
+    part = _LazyDocumentObject(lambda state: state.document.part if state.type == "Part" else None)
+    hybrid_bodies = _part_collection('hybrid_bodies')
+    parameters = _part_collection('parameters')
+    sketches = _part_collection('sketches')
+    bodies = _part_collection('bodies')
+    measure = _part_collection('measure')
+    analysis = _part_collection('analysis')
+    product = _LazyDocumentObject(lambda state: state.document.product if state.type == "Product" else None)
+    drawing = _LazyDocumentObject(lambda state: state.document.drawing if state.type == "Drawing" else None)
+
+    _CACHED = ('part', 'hybrid_bodies', 'parameters', 'sketches', 'bodies', 'measure', 'analysis',
+               'product', 'drawing')
+
+    def __init__(self, document: Any, file_path: Optional[str] = None):
+        self.id = f"doc-{uuid.uuid4().hex[:16]}"
+        self.document = document
+        self.file_path = file_path
+        self.name = document.name
+        self.type = document.type
+        self.fetch_ms: Dict[str, float] = {}
+        self.estimated_mb = _estimate_document_mb(file_path)
+        self.last_used = time.monotonic()
+
+    def invalidate(self):
+        """丢弃已缓存的集合对象，下次访问时重新获取"""
+        for name in self._CACHED:
+            self.__dict__.pop(name, None)
+        self.fetch_ms.clear()
+
+    def to_dict(self, active: bool = False) -> Dict:
+        return {
+            "document_id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "file_path": self.file_path,
+            "active": active,
+            "estimated_mb": round(self.estimated_mb, 1),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "fetch_ms": dict(self.fetch_ms)
+        }
+
+class _ActiveDocumentAttribute:
+    """CATIAService上的文档相关属性，转发到当前活动文档"""
+
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+
+    def __set_name__(self, owner, name):
+        self.source = self.source or name
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        state = service.active
+        return getattr(state, self.source) if state is not None else None
+
+# 参数缓存版本号在进程内单调递增，文档重新打开后旧版本号不会与新缓存混淆
+_parameter_versions = itertools.count(1)
+
+def _value_matches_type(value: Any, param_type: str) -> bool:
+    """检查参数值与CATIA参数类型是否兼容"""
+    if param_type == "Boolean":
+        return isinstance(value, bool)
+    if param_type == "String":
+        return isinstance(value, str)
+    if param_type == "Integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class ParameterTable:
+    """单个文档的参数缓存，记录每个参数最后一次变化时的版本号"""
+
+    def __init__(self):
+        self.base_version = next(_parameter_versions)
+        self.version = self.base_version
+        self.entries: Dict[str, Dict] = {}
+        self.removed: Dict[str, int] = {}
+        self.stale = True
+        self.loaded = False
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.base_version}-{self.version}"'
+
+    def load(self, parameters: Any):
+        """从CATIA重新读取全部参数，只为值或类型发生变化的参数分配新版本号"""
+        version = next(_parameter_versions)
+        entries = {}
+        changed = False
+        for i in range(1, parameters.count + 1):
+            param = parameters.item(i)
+            name, value, param_type = param.name, param.value, param.type
+            entry = self.entries.get(name)
+            if entry is None or entry["value"] != value or entry["type"] != param_type:
+                entry = {"name": name, "value": value, "type": param_type, "version": version}
+                changed = True
+            entries[name] = entry
+        for name in self.entries.keys() - entries.keys():
+            self.removed[name] = version
+            changed = True
+        self.entries = entries
+        if changed:
+            self.version = version
+        self.stale = False
+        self.loaded = True
+
+    def query(self, since: Optional[int] = None, prefix: Optional[str] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Dict:
+        full = since is None or since < self.base_version
+        items = [
+            {"name": entry["name"], "value": entry["value"], "type": entry["type"]}
+            for entry in self.entries.values()
+            if (full or entry["version"] > since) and (not prefix or entry["name"].startswith(prefix))
+        ]
+        result = {
+            "version": self.version,
+            "etag": self.etag,
+            "full": full,
+            "total": len(items),
+            "items": items[offset:offset + limit if limit is not None else None]
+        }
+        if not full:
+            result["removed"] = [name for name, version in self.removed.items()
+                                 if version > since and (not prefix or name.startswith(prefix))]
+        return result
+
+class SharedDocument:
+    """多个会话按同一路径打开的CATIA文档：引用计数和参数缓存由全部持有者共用，
+    任一会话修改参数后其他会话的缓存同时失效，ETag随之变化"""
+
+    def __init__(self, document: Any):
+        self.document = document
+        self.holders = 1
+        self.parameter_table: Optional[ParameterTable] = None
+
+class CATIAService:
+    part_document = _ActiveDocumentAttribute('document')
+    part = _ActiveDocumentAttribute()
+    hybrid_bodies = _ActiveDocumentAttribute()
+    parameters = _ActiveDocumentAttribute()
+    sketches = _ActiveDocumentAttribute()
+    bodies = _ActiveDocumentAttribute()
+    measure = _ActiveDocumentAttribute()
+    analysis = _ActiveDocumentAttribute()
+    drawing = _ActiveDocumentAttribute()
+    product = _ActiveDocumentAttribute()
+
+    # 同一进程内的全部会话共享CATIA应用连接和按路径打开的文档
+    _applications: Dict[str, Any] = {}
+    _shared_documents: Dict[str, SharedDocument] = {}
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend or CATIA_BACKEND
+        self.catia = None
+        self.documents = None
+        self.system = None
+        if self.backend in self._applications:
+            self._bind_application(self._applications[self.backend])
+        self.active: Optional[DocumentState] = None
+        self._open_documents: OrderedDict = OrderedDict()
+        self._document_paths: Dict[str, str] = {}
+        self.handles = HandleRegistry()
+        self._parameter_tables: Dict[str, ParameterTable] = {}
+        
+    def connect(self):
+        try:
+            self._bind_application(_load_backend(self.backend).catia_application())
+            self._applications[self.backend] = self.catia
+            return True
+        except Exception as e:
+            logger.error("连接CATIA失败: %s", e)
+            return False
+
+    def _bind_application(self, application: Any):
+        self.catia = application
+        self.documents = application.documents
+        self.system = application.system
+
+    def open_document(self, file_path: str) -> tuple[bool, Union[Dict, str]]:
+        try:
+            document_id = self._document_paths.get(_normalize_path(file_path))
+            if document_id is not None:
+                # 已打开的文档直接切换，无需重新从磁盘加载
+                self._activate(self._open_documents[document_id])
+                return True, {"message": "文档已打开，已切换为活动文档", "document_id": document_id}
+            shared = self._shared_documents.get(_normalize_path(file_path))
+            if shared is not None:
+                # 其他会话已打开同一文件，复用CATIA中的文档
+                document = shared.document
+                shared.holders += 1
+            else:
+                document = self.documents.open(file_path)
+                self._shared_documents[_normalize_path(file_path)] = SharedDocument(document)
+            state = self._initialize_document_objects(document, file_path)
+            return True, {"message": "文档打开成功", "document_id": state.id}
+        except Exception as e:
+            logger.error("打开文档失败: %s", e)
+            return False, f"打开文档失败: {str(e)}"
+
+    def _initialize_document_objects(self, document: Any, file_path: Optional[str] = None) -> DocumentState:
+        """初始化文档相关的对象，登记到文档表并设为活动文档"""
+        state = DocumentState(document, file_path)
+        self._open_documents[state.id] = state
+        if file_path:
+            self._document_paths[_normalize_path(file_path)] = state.id
+        self._activate(state)
+        self._evict_idle_documents()
+        return state
+
+    def _activate(self, state: DocumentState):
+        self.active = state
+        self._open_documents.move_to_end(state.id)
+        state.last_used = time.monotonic()
+        self.handles.scope = state.id
+
+    def _evict_idle_documents(self):
+        """超出文档数量上限或内存预算时，按最近最少使用顺序关闭非活动文档"""
+        while len(self._open_documents) > 1 and (
+                len(self._open_documents) > MAX_OPEN_DOCUMENTS or
+                sum(state.estimated_mb for state in self._open_documents.values()) > DOCUMENT_MEMORY_MB):
+            victim = next(state for state in self._open_documents.values() if state is not self.active)
+            logger.info("关闭空闲文档以释放内存: %s", victim.name)
+            try:
+                self._close_state(victim)
+            except Exception as e:
+                logger.error("关闭空闲文档失败: %s", e)
+            self._reset_document_objects(victim)
+
+    def _close_state(self, state: DocumentState):
+        """关闭文档；其他会话仍在使用同一文件时只减少引用计数"""
+        shared = self._shared_document(state)
+        if shared is not None:
+            shared.holders -= 1
+            if shared.holders > 0:
+                return
+            del self._shared_documents[_normalize_path(state.file_path)]
+        state.document.close()
+
+    def _shared_document(self, state: DocumentState) -> Optional[SharedDocument]:
+        if not state.file_path:
+            return None
+        shared = self._shared_documents.get(_normalize_path(state.file_path))
+        return shared if shared is not None and shared.document is state.document else None
+
+    # 基础文档操作
+    def create_new_document(self, doc_type: str) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if doc_type == "Part":
+                document = self.documents.add("Part")
+            elif doc_type == "Product":
+                document = self.documents.add("Product")
+            elif doc_type == "Drawing":
+                document = self.documents.add("Drawing")
+            else:
+                return False, "不支持的文档类型"
+            state = self._initialize_document_objects(document)
+            return True, {"message": "文档创建成功", "document_id": state.id}
+        except Exception as e:
+            logger.error("创建文档失败: %s", e)
+            return False, f"创建文档失败: {str(e)}"
+
+    def switch_document(self, document_id: str) -> tuple[bool, Union[Dict, str]]:
+        state = self._open_documents.get(document_id)
+        if state is None:
+            return False, "文档不存在或已关闭"
+        self._activate(state)
+        return True, {"message": "已切换活动文档", "document_id": state.id}
+
+    def list_documents(self) -> tuple[bool, List[Dict]]:
+        return True, [state.to_dict(state is self.active) for state in self._open_documents.values()]
+
+    _TREE_ROOTS = {"Product": "product", "Part": "part", "Drawing": "drawing"}
+
+    def walk_tree(self, document_id: Optional[str] = None, cursor: Optional[str] = None,
+                  limit: int = catia_tree.TREE_PAGE_SIZE, max_depth: Optional[int] = None,
+                  types: Optional[List[str]] = None) -> tuple[bool, Union[Dict, str]]:
+        """遍历结构树的一页，不切换活动文档；提供游标时默认遍历游标所属的文档"""
+        try:
+            if document_id is None and cursor:
+                document_id = catia_tree.decode_cursor(cursor)[0]
+            state = self._open_documents.get(document_id) if document_id else self.active
+            if state is None:
+                return False, "文档不存在或已关闭" if document_id else "没有活动的文档"
+            root_type = self._TREE_ROOTS.get(state.type)
+            root = getattr(state, root_type) if root_type else None
+            if root is None:
+                return False, "该文档没有可遍历的结构树"
+            result = catia_tree.page(root, root_type, state.id, cursor, limit, max_depth, types)
+            return True, dict(result, document_id=state.id)
+        except ValueError as e:
+            return False, str(e)
+        except Exception as e:
+            logger.error("遍历结构树失败: %s", e)
+            return False, f"遍历结构树失败: {str(e)}"
+
+    def save_document(self, file_path: Optional[str] = None) -> tuple[bool, str]:
+        try:
+            if not self.part_document:
+                return False, "没有活动的文档"
+            if file_path:
+                self.part_document.save_as(file_path)
+            else:
+                self.part_document.save()
+            return True, "文档保存成功"
+        except Exception as e:
+            logger.error("保存文档失败: %s", e)
+            return False, f"保存文档失败: {str(e)}"
+
+    def close_document(self, document_id: Optional[str] = None) -> tuple[bool, str]:
+        try:
+            state = self._open_documents.get(document_id) if document_id else self.active
+            if state is None:
+                return False, "文档不存在或已关闭" if document_id else "没有活动的文档"
+            self._close_state(state)
+            self._reset_document_objects(state)
+            return True, "文档关闭成功"
+        except Exception as e:
+            logger.error("关闭文档失败: %s", e)
+            return False, f"关闭文档失败: {str(e)}"
+
+    def close_all_documents(self) -> tuple[bool, Dict]:
+        """关闭本服务（会话）打开的全部文档，用于会话结束或空闲超时"""
+        document_ids = list(self._open_documents)
+        for state in list(self._open_documents.values()):
+            try:
+                self._close_state(state)
+            except Exception as e:
+                logger.error("关闭文档失败: %s", e)
+            self._reset_document_objects(state)
+        return True, {"message": f"已关闭{len(document_ids)}个文档", "document_ids": document_ids}
+
+    def extract_snapshot(self, file_path: str) -> tuple[bool, Union[Dict, str]]:
+        """打开文件提取结构、参数和质量快照；文件已被某个会话打开时直接读取，否则提取后关闭
+
+        快照按磁盘文件的修改时间和大小缓存，已打开的文档有未保存的修改时与磁盘内容不一致，不提取
+        """
+        try:
+            if self.documents is None and not self.connect():
+                return False, "CATIA连接失败"
+            shared = self._shared_documents.get(_normalize_path(file_path))
+            if shared is not None and not getattr(shared.document, 'saved', False):
+                return False, "文件已在会话中打开且有未保存的修改，保存后才能提取快照"
+            document = shared.document if shared is not None else self.documents.open(file_path)
+            try:
+                return True, catia_snapshots.extract(document)
+            finally:
+                if shared is None:
+                    document.close()
+        except Exception as e:
+            logger.error("提取文件快照失败: %s", e)
+            return False, f"提取文件快照失败: {str(e)}"
+
+    def _reset_document_objects(self, state: DocumentState):
+        """从文档表中移除文档，并清除它的句柄和参数缓存"""
+        self._open_documents.pop(state.id, None)
+        if state.file_path:
+            self._document_paths.pop(_normalize_path(state.file_path), None)
+        self._parameter_tables.pop(state.id, None)
+        self.handles.clear(state.id)
+        state.invalidate()
+        if self.active is state:
+            self.active = None
+            self.handles.scope = None
+
+    # 参数操作
+    def _cached_parameter_table(self) -> Optional[ParameterTable]:
+        """当前文档已有的参数缓存；按路径共享的文档使用共享记录上的缓存"""
+        shared = self._shared_document(self.active)
+        if shared is not None:
+            return shared.parameter_table
+        return self._parameter_tables.get(self.active.id)
+
+    def _parameter_table(self, refresh: bool = False) -> ParameterTable:
+        """返回当前文档的参数缓存，缓存失效或要求刷新时从CATIA重新读取"""
+        table = self._cached_parameter_table()
+        if table is None:
+            table = ParameterTable()
+            shared = self._shared_document(self.active)
+            if shared is not None:
+                shared.parameter_table = table
+            else:
+                self._parameter_tables[self.active.id] = table
+        if table.stale or refresh:
+            table.load(self.parameters)
+        return table
+
+    def _validate_parameter_values(self, values: Dict[str, Any]) -> List[Dict]:
+        """按参数缓存校验名称和类型；已加载过的缓存即使失效也可用于校验，参数名和类型不会因赋值改变"""
+        table = self._cached_parameter_table()
+        if table is None or not table.loaded:
+            table = self._parameter_table()
+        failures = []
+        for name, value in values.items():
+            entry = table.entries.get(name)
+            if entry is None:
+                failures.append({"name": name, "message": "参数不存在"})
+            elif not _value_matches_type(value, entry["type"]):
+                failures.append({"name": name, "message": f"参数类型为{entry['type']}，值类型不匹配"})
+        return failures
+
+    def set_parameters(self, values: Dict[str, Any], dry_run: bool = False,
+                       update: bool = True) -> tuple[bool, Union[Dict, str]]:
+        """批量设置参数并只更新一次零件；任一参数赋值或零件更新失败时回滚全部已修改的参数"""
+        try:
+            if not self.parameters:
+                return False, "没有活动的文档或参数"
+            failures = self._validate_parameter_values(values)
+            if failures or dry_run:
+                return True, {"applied": 0, "dry_run": dry_run, "failures": failures}
+            table = self._cached_parameter_table()
+            table.stale = True
+            params = {name: self.parameters.item(name) for name in values}
+            # 回滚用赋值前从CATIA读取的当前值，参数缓存可能已过期
+            previous = {}
+            applied = []
+            for name, value in values.items():
+                try:
+                    previous[name] = params[name].value
+                    params[name].value = value
+                    applied.append(name)
+                except Exception as e:
+                    failures.append({"name": name, "message": str(e)})
+                    break
+            if not failures and update:
+                try:
+                    self.part.update()
+                except Exception as e:
+                    failures.append({"name": None, "message": f"零件更新失败: {str(e)}"})
+            if failures:
+                for name in reversed(applied):
+                    try:
+                        params[name].value = previous[name]
+                    except Exception as e:
+                        logger.error("回滚参数%s失败: %s", name, e)
+                if update and applied:
+                    try:
+                        self.part.update()
+                    except Exception as e:
+                        logger.error("回滚后更新零件失败: %s", e)
+                return True, {"applied": 0, "rolled_back": len(applied), "dry_run": False, "failures": failures}
+            return True, {"applied": len(applied), "updated": update, "dry_run": False, "failures": []}
+        except Exception as e:
+            logger.error("批量设置参数失败: %s", e)
+            return False, f"批量设置参数失败: {str(e)}"
+
+    def get_parameters(self) -> tuple[bool, Union[List[Dict], str]]:
+        try:
+            if not self.parameters:
+                return False, "没有活动的文档或参数"
+            return True, self._parameter_table().query()["items"]
+        except Exception as e:
+            logger.error("获取参数失败: %s", e)
+            return False, f"获取参数失败: {str(e)}"
+
+    def query_parameters(self, since: Optional[int] = None, prefix: Optional[str] = None, offset: int = 0,
+                         limit: Optional[int] = None, refresh: bool = False) -> tuple[bool, Union[Dict, str]]:
+        """按版本增量、名称前缀和分页查询参数，结果附带版本号和ETag"""
+        try:
+            if not self.parameters:
+                return False, "没有活动的文档或参数"
+            return True, self._parameter_table(refresh).query(since, prefix, offset, limit)
+        except Exception as e:
+            logger.error("获取参数失败: %s", e)
+            return False, f"获取参数失败: {str(e)}"
+
+    def set_parameter(self, name: str, value: Any) -> tuple[bool, str]:
+        try:
+            if not self.parameters:
+                return False, "没有活动的文档或参数"
+            param = self.parameters.item(name)
+            param.value = value
+            # 公式关联的参数可能随之变化，下次读取时整表比对刷新
+            table = self._cached_parameter_table()
+            if table is not None:
+                table.stale = True
+            return True, "参数设置成功"
+        except Exception as e:
+            logger.error("设置参数失败: %s", e)
+            return False, f"设置参数失败: {str(e)}"
+
+    # 参数扫描
+    MEASUREMENT_METHODS = {'volume': 'measure_volume', 'area': 'measure_area', 'mass': 'analyze_mass'}
+
+    def evaluate_variant(self, parameters: Dict[str, Any], measurements: List[Dict]) -> tuple[bool, Union[Dict, str]]:
+        """设置一组参数、更新零件并执行测量，供参数扫描在COM线程中一次完成一个变体"""
+        success, result = self.set_parameters(parameters)
+        if not success:
+            return False, result
+        if result["failures"]:
+            return False, "; ".join(f"{failure['name']}: {failure['message']}" for failure in result["failures"])
+        values = {}
+        for measurement in measurements:
+            measure_type = measurement['type']
+            success, result = getattr(self, self.MEASUREMENT_METHODS[measure_type])(measurement.get('target'))
+            if not success:
+                return False, result
+            values[measurement['name']] = result[measure_type]
+        return True, values
+
+    # 几何操作
+    def create_point(self, x: float, y: float, z: float) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.hybrid_bodies:
+                return False, "没有活动的文档或几何体"
+            hybrid_body = self.hybrid_bodies.add()
+            point = hybrid_body.add_point(x, y, z)
+            return True, {"message": "点创建成功", "handle": self.handles.register("point", point)}
+        except Exception as e:
+            logger.error("创建点失败: %s", e)
+            return False, f"创建点失败: {str(e)}"
+
+    def create_line(self, start_point: List[float], end_point: List[float]) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.hybrid_bodies:
+                return False, "没有活动的文档或几何体"
+            hybrid_body = self.hybrid_bodies.add()
+            line = hybrid_body.add_line(start_point, end_point)
+            return True, {"message": "线创建成功", "handle": self.handles.register("line", line)}
+        except Exception as e:
+            logger.error("创建线失败: %s", e)
+            return False, f"创建线失败: {str(e)}"
+
+    def create_plane(self, origin: List[float], normal: List[float]) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.hybrid_bodies:
+                return False, "没有活动的文档或几何体"
+            hybrid_body = self.hybrid_bodies.add()
+            plane = hybrid_body.add_plane(origin, normal)
+            return True, {"message": "平面创建成功", "handle": self.handles.register("plane", plane)}
+        except Exception as e:
+            logger.error("创建平面失败: %s", e)
+            return False, f"创建平面失败: {str(e)}"
+
+    def create_geometry_batch(self, items: List[Dict], points: Optional[Sequence[Sequence[float]]] = None) -> tuple[bool, Union[Dict, str]]:
+        """在同一个几何图形集中批量创建点/线/平面，最后只更新一次零件"""
+        try:
+            if not self.hybrid_bodies:
+                return False, "没有活动的文档或几何体"
+            start = time.perf_counter()
+            hybrid_body = self.hybrid_bodies.add()
+            results = []
+            created = 0
+            for item in items:
+                # 条目已由CreateGeometryBatch按单个创建操作的模型校验
+                try:
+                    operation = item['operation']
+                    if operation == 'point':
+                        obj = hybrid_body.add_point(item['x'], item['y'], item['z'])
+                    elif operation == 'line':
+                        obj = hybrid_body.add_line(item['start_point'], item['end_point'])
+                    else:
+                        obj = hybrid_body.add_plane(item['origin'], item['normal'])
+                    results.append({"status": "success", "handle": self.handles.register(operation, obj)})
+                    created += 1
+                except Exception as e:
+                    results.append({"status": "error", "message": str(e)})
+            for x, y, z in points or ():
+                try:
+                    hybrid_body.add_point(x, y, z)
+                    results.append({"status": "success"})
+                    created += 1
+                except Exception as e:
+                    results.append({"status": "error", "message": str(e)})
+            self.part.update()
+            elapsed = time.perf_counter() - start
+            return True, {
+                "handle": self.handles.register("hybrid_body", hybrid_body),
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "items_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None
+            }
+        except Exception as e:
+            logger.error("批量创建几何体失败: %s", e)
+            return False, f"批量创建几何体失败: {str(e)}"
+
+    # 草图操作
+    def create_sketch(self, plane: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.sketches:
+                return False, "没有活动的文档或草图"
+            sketch = self.sketches.add(self.handles.resolve(plane))
+            return True, {"message": "草图创建成功", "handle": self.handles.register("sketch", sketch)}
+        except Exception as e:
+            logger.error("创建草图失败: %s", e)
+            return False, f"创建草图失败: {str(e)}"
+
+    def add_line_to_sketch(self, sketch: Any, start_point: List[float], end_point: List[float]) -> tuple[bool, Union[Dict, str]]:
+        try:
+            sketch = self.handles.resolve(sketch)
+            if not sketch:
+                return False, "草图不存在"
+            line = sketch.add_line(start_point, end_point)
+            return True, {"message": "线添加成功", "handle": self.handles.register("sketch_line", line)}
+        except Exception as e:
+            logger.error("添加线失败: %s", e)
+            return False, f"添加线失败: {str(e)}"
+
+    def add_circle_to_sketch(self, sketch: Any, center: List[float], radius: float) -> tuple[bool, Union[Dict, str]]:
+        try:
+            sketch = self.handles.resolve(sketch)
+            if not sketch:
+                return False, "草图不存在"
+            circle = sketch.add_circle(center, radius)
+            return True, {"message": "圆添加成功", "handle": self.handles.register("sketch_circle", circle)}
+        except Exception as e:
+            logger.error("添加圆失败: %s", e)
+            return False, f"添加圆失败: {str(e)}"
+
+    # 特征操作
+    def create_pad(self, sketch: Any, length: float) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.bodies:
+                return False, "没有活动的文档或实体"
+            pad = self.bodies.add_pad(self.handles.resolve(sketch), length)
+            return True, {"message": "凸台创建成功", "handle": self.handles.register("pad", pad),
+                          "body": self.handles.register("body", pad.body, pad.body.name)}
+        except Exception as e:
+            logger.error("创建凸台失败: %s", e)
+            return False, f"创建凸台失败: {str(e)}"
+
+    def create_pocket(self, sketch: Any, length: float) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.bodies:
+                return False, "没有活动的文档或实体"
+            pocket = self.bodies.add_pocket(self.handles.resolve(sketch), length)
+            return True, {"message": "凹槽创建成功", "handle": self.handles.register("pocket", pocket),
+                          "body": self.handles.register("body", pocket.body, pocket.body.name)}
+        except Exception as e:
+            logger.error("创建凹槽失败: %s", e)
+            return False, f"创建凹槽失败: {str(e)}"
+
+    def create_revolution(self, sketch: Any, angle: float) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.bodies:
+                return False, "没有活动的文档或实体"
+            revolution = self.bodies.add_revolution(self.handles.resolve(sketch), angle)
+            return True, {"message": "旋转体创建成功", "handle": self.handles.register("revolution", revolution),
+                          "body": self.handles.register("body", revolution.body, revolution.body.name)}
+        except Exception as e:
+            logger.error("创建旋转体失败: %s", e)
+            return False, f"创建旋转体失败: {str(e)}"
+
+    def list_bodies(self, faces: bool = False) -> tuple[bool, Union[List[Dict], str]]:
+        """列出活动零件中的实体并返回句柄，faces为true时同时返回每个实体的面句柄"""
+        try:
+            if not self.bodies:
+                return False, "没有活动的文档或实体"
+            result = []
+            for i in range(1, self.bodies.count + 1):
+                body = self.bodies.item(i)
+                # 实体按名称、面按所属实体和序号标识，重复列出时复用句柄，不会挤占句柄注册表
+                entry = {"name": body.name, "handle": self.handles.register("body", body, body.name)}
+                if faces:
+                    entry["faces"] = []
+                    for j in range(1, body.faces.count + 1):
+                        face = body.faces.item(j)
+                        entry["faces"].append({"name": face.name,
+                                               "handle": self.handles.register("face", face, f"{body.name}/{j}")})
+                result.append(entry)
+            return True, result
+        except Exception as e:
+            logger.error("列出实体失败: %s", e)
+            return False, f"列出实体失败: {str(e)}"
+
+    # 装配操作
+    def add_component(self, file_path: str, position: List[float] = [0, 0, 0]) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.product:
+                return False, "当前文档不是装配体"
+            component = self.product.add_component(file_path)
+            component.move(position)
+            return True, {"message": "组件添加成功", "handle": self.handles.register("component", component)}
+        except Exception as e:
+            logger.error("添加组件失败: %s", e)
+            return False, f"添加组件失败: {str(e)}"
+
+    def add_components(self, components: List[tuple]) -> tuple[bool, Union[Dict, str]]:
+        """批量添加组件：每个不同的文件只加载一次，其余出现作为已加载组件的新实例添加；
+        全部添加后再统一放置（单位矩阵不移动），最后只更新一次装配。单项失败不影响其他条目"""
+        try:
+            if not self.product:
+                return False, "当前文档不是装配体"
+            start = time.perf_counter()
+            references: Dict[str, Any] = {}
+            failed_files: Dict[str, str] = {}
+            handles: List[Optional[str]] = [None] * len(components)
+            errors = []
+            placements = []
+            load_seconds = 0.0
+            for index, (file_path, transform) in enumerate(components):
+                key = catia_snapshots.normalize_path(file_path)
+                if key in failed_files:
+                    errors.append([index, failed_files[key]])
+                    continue
+                try:
+                    reference = references.get(key)
+                    if reference is None:
+                        loaded = time.perf_counter()
+                        component = references[key] = self.product.add_component(file_path)
+                        load_seconds += time.perf_counter() - loaded
+                    else:
+                        component = self.product.add_instance(reference)
+                except Exception as e:
+                    if key not in references:
+                        failed_files[key] = f"加载文件失败: {str(e)}"
+                        errors.append([index, failed_files[key]])
+                    else:
+                        errors.append([index, str(e)])
+                    continue
+                handles[index] = self.handles.register("component", component)
+                if tuple(transform) != IDENTITY_TRANSFORM:
+                    placements.append((index, component, transform))
+            added = time.perf_counter()
+            for index, component, transform in placements:
+                try:
+                    component.place(transform)
+                except Exception as e:
+                    errors.append([index, f"放置失败: {str(e)}"])
+            placed = time.perf_counter()
+            self.product.update()
+            end = time.perf_counter()
+            errors.sort(key=lambda error: error[0])
+            succeeded = sum(handle is not None for handle in handles)
+            return True, {
+                "handles": handles,
+                "added": succeeded,
+                "failed": len(errors),
+                "errors": errors,
+                "files_loaded": len(references),
+                "placed": len(placements),
+                "timings": {
+                    "load_ms": round(load_seconds * 1000, 3),
+                    "instance_ms": round((added - start - load_seconds) * 1000, 3),
+                    "place_ms": round((placed - added) * 1000, 3),
+                    "update_ms": round((end - placed) * 1000, 3),
+                    "total_ms": round((end - start) * 1000, 3),
+                },
+                "components_per_second": round(succeeded / (end - start), 1) if end > start else None
+            }
+        except Exception as e:
+            logger.error("批量添加组件失败: %s", e)
+            return False, f"批量添加组件失败: {str(e)}"
+
+    def create_constraint(self, component1: str, component2: str, constraint_type: str, 
+                         reference1: Any, reference2: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.product:
+                return False, "当前文档不是装配体"
+            resolve = self.handles.resolve
+            constraint = self.product.add_constraint(resolve(component1), resolve(component2), constraint_type,
+                                                     resolve(reference1), resolve(reference2))
+            return True, {"message": "约束创建成功", "handle": self.handles.register("constraint", constraint)}
+        except Exception as e:
+            logger.error("创建约束失败: %s", e)
+            return False, f"创建约束失败: {str(e)}"
+
+    # 测量操作
+    def measure_distance(self, point1: List[float], point2: List[float]) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.measure:
+                return False, "没有活动的文档或测量工具"
+            distance = self.measure.distance(self.handles.resolve(point1), self.handles.resolve(point2))
+            return True, {"distance": distance}
+        except Exception as e:
+            logger.error("测量距离失败: %s", e)
+            return False, f"测量距离失败: {str(e)}"
+
+    def measure_angle(self, line1: Any, line2: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.measure:
+                return False, "没有活动的文档或测量工具"
+            angle = self.measure.angle(self.handles.resolve(line1), self.handles.resolve(line2))
+            return True, {"angle": angle}
+        except Exception as e:
+            logger.error("测量角度失败: %s", e)
+            return False, f"测量角度失败: {str(e)}"
+
+    def measure_pairs(self, operation: str, pairs: List[tuple]) -> tuple[bool, Union[Dict, str]]:
+        """在一次调用中逐对测量引用了CATIA几何的条目，单项失败不影响其他条目"""
+        try:
+            if not self.measure:
+                return False, "没有活动的文档或测量工具"
+            measure = self.measure.distance if operation == 'distance' else self.measure.angle
+            values = []
+            errors = []
+            for index, first, second in pairs:
+                try:
+                    values.append(measure(self.handles.resolve(first), self.handles.resolve(second)))
+                except Exception as e:
+                    values.append(None)
+                    errors.append([index, str(e)])
+            return True, {"values": values, "errors": errors}
+        except Exception as e:
+            logger.error("批量测量失败: %s", e)
+            return False, f"批量测量失败: {str(e)}"
+
+    def measure_bulk(self, operation: str, input1: Any, input2: Any,
+                     packed: bool = False) -> tuple[bool, Union[Dict, str]]:
+        """批量测量：纯坐标条目向量化计算，引用几何的条目交给measure_pairs逐对测量"""
+        def measure_geometry(operation, pairs):
+            success, result = self.measure_pairs(operation, pairs)
+            if not success:
+                raise RuntimeError(result)
+            return result["values"], result["errors"]
+
+        start = time.perf_counter()
+        try:
+            result = bulk_measure(operation, input1, input2, measure_geometry)
+        except (ValueError, RuntimeError) as e:
+            return False, str(e)
+        values = result["values"]
+        response = {
+            "operation": operation,
+            "count": len(values),
+            "geometry_count": result["geometry_count"],
+            "errors": result["errors"],
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        if packed:
+            response["values_buffer"] = pack_floats(values)
+        else:
+            response["values"] = to_json_list(values)
+        return True, response
+
+    def measure_area(self, face: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.measure:
+                return False, "没有活动的文档或测量工具"
+            area = self.measure.area(self.handles.resolve(face))
+            return True, {"area": area}
+        except Exception as e:
+            logger.error("测量面积失败: %s", e)
+            return False, f"测量面积失败: {str(e)}"
+
+    def measure_volume(self, body: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.measure:
+                return False, "没有活动的文档或测量工具"
+            volume = self.measure.volume(self.handles.resolve(body))
+            return True, {"volume": volume}
+        except Exception as e:
+            logger.error("测量体积失败: %s", e)
+            return False, f"测量体积失败: {str(e)}"
+
+    # 分析操作
+    def analyze_mass(self, body: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.analysis:
+                return False, "没有活动的文档或分析工具"
+            mass = self.analysis.mass(self.handles.resolve(body))
+            return True, {"mass": mass}
+        except Exception as e:
+            logger.error("质量分析失败: %s", e)
+            return False, f"质量分析失败: {str(e)}"
+
+    def check_interference(self, body1: Any, body2: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.analysis:
+                return False, "没有活动的文档或分析工具"
+            interference = self.analysis.interference(self.handles.resolve(body1), self.handles.resolve(body2))
+            return True, {"interference": interference}
+        except Exception as e:
+            logger.error("干涉检查失败: %s", e)
+            return False, f"干涉检查失败: {str(e)}"
+
+    def check_interference_matrix(self, bodies: Optional[List[Any]] = None, margin: float = 0.0,
+                                  components: Optional[List[Any]] = None) -> tuple[bool, Union[Dict, str]]:
+        """整体干涉检查：一次性获取全部包围盒，粗筛后只对候选对做精确检查，返回稀疏干涉矩阵
+
+        活动文档为装配时检查组件之间的干涉（默认根产品下的全部组件），组件的包围盒按其放置位置变换到装配坐标系；
+        为零件时检查实体之间的干涉
+        """
+        try:
+            start = time.perf_counter()
+            if self.product:
+                if components is None:
+                    products = self.product.products
+                    targets = [products.item(i) for i in range(1, products.count + 1)]
+                else:
+                    targets = [self._resolve_component(component) for component in components]
+                names = [getattr(component, 'name', str(i)) for i, component in enumerate(targets)]
+                boxes = placed_boxes([component.bounding_box() for component in targets],
+                                     [component.placement() for component in targets])
+                check = self.product.interference
+            elif self.analysis:
+                if bodies is None:
+                    targets = [self.bodies.item(i) for i in range(1, self.bodies.count + 1)]
+                else:
+                    targets = [self.handles.resolve(body) for body in bodies]
+                names = [body if isinstance(body, str) else getattr(body, 'name', str(i))
+                         for i, body in enumerate(bodies if bodies is not None else targets)]
+                boxes = [self.analysis.bounding_box(body) for body in targets]
+                check = self.analysis.interference
+            else:
+                return False, "没有活动的零件或装配文档"
+            bbox_done = time.perf_counter()
+            pairs = candidate_pairs(boxes, margin)
+            broad_done = time.perf_counter()
+            clashes = []
+            errors = []
+            for i, j in pairs.tolist():
+                try:
+                    interference = check(targets[i], targets[j])
+                except Exception as e:
+                    errors.append([i, j, str(e)])
+                    continue
+                if interference:
+                    clashes.append([i, j, interference])
+            narrow_done = time.perf_counter()
+            return True, {
+                "names": names,
+                "clashes": clashes,
+                "errors": errors,
+                "pairs_total": len(targets) * (len(targets) - 1) // 2,
+                "candidates": len(pairs),
+                "timings_ms": {
+                    "bounding_boxes": round((bbox_done - start) * 1000, 3),
+                    "broad_phase": round((broad_done - bbox_done) * 1000, 3),
+                    "narrow_phase": round((narrow_done - broad_done) * 1000, 3)
+                }
+            }
+        except Exception as e:
+            logger.error("整体干涉检查失败: %s", e)
+            return False, f"整体干涉检查失败: {str(e)}"
+
+    def _resolve_component(self, component: Any) -> Any:
+        """组件句柄或根产品下的组件名称"""
+        target = self.handles.resolve(component)
+        return self.product.products.item(target) if isinstance(target, str) else target
+
+    # 工程图操作
+    def create_drawing_view(self, name: str, type: str = "Front") -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.drawing:
+                return False, "没有活动的工程图文档"
+            view = self.drawing.views.add(name, type)
+            return True, {"message": "视图创建成功", "handle": self.handles.register("view", view)}
+        except Exception as e:
+            logger.error("创建视图失败: %s", e)
+            return False, f"创建视图失败: {str(e)}"
+
+    def add_dimension(self, view: Any, reference1: Any, reference2: Any) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.drawing:
+                return False, "没有活动的工程图文档"
+            resolve = self.handles.resolve
+            dimension = resolve(view).add_dimension(resolve(reference1), resolve(reference2))
+            return True, {"message": "尺寸添加成功", "handle": self.handles.register("dimension", dimension)}
+        except Exception as e:
+            logger.error("添加尺寸失败: %s", e)
+            return False, f"添加尺寸失败: {str(e)}"
+
+    # 系统操作
+    def get_system_info(self) -> tuple[bool, Union[Dict, str]]:
+        try:
+            if not self.system:
+                return False, "未连接到CATIA"
+            info = {
+                "version": self.system.version,
+                "license": self.system.license,
+                "workspace": self.system.workspace
+            }
+            return True, info
+        except Exception as e:
+            logger.error("获取系统信息失败: %s", e)
+            return False, f"获取系统信息失败: {str(e)}"
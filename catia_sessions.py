@@ -0,0 +1,244 @@
+"""用户会话：按JWT身份隔离文档和句柄，并公平调度到共享的CATIA实例
+
+每个会话持有自己的CATIAService（文档表、活动文档、对象句柄和参数缓存），所有会话共享同一个CATIA应用。
+COM执行器和进程池的工作进程按会话分别排队，以加权轮询的方式取任务，
+单个用户的大量并发请求不会让其他用户一直等待。空闲超时的会话会关闭自己的文档并被释放；
+扫描、异步任务和流式响应在运行期间固定（pin）会话，固定的会话不会因空闲被回收。
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TIMEOUT = float(os.getenv('CATIA_SESSION_IDLE_TIMEOUT', '1800'))
+SESSION_REAP_INTERVAL = 60.0
+
+
+def _parse_weights(value: str) -> Dict[str, int]:
+    """解析形如"alice=3,batch=1"的会话权重配置"""
+    weights = {}
+    for item in value.split(','):
+        if '=' in item:
+            identity, weight = item.rsplit('=', 1)
+            weights[identity.strip()] = max(1, int(weight))
+    return weights
+
+
+SESSION_WEIGHTS = _parse_weights(os.getenv('CATIA_SESSION_WEIGHTS', ''))
+
+
+def session_weight(key: Optional[str]) -> int:
+    return SESSION_WEIGHTS.get(key, 1) if key is not None else 1
+
+
+class FairQueue:
+    """按会话分队列的有界队列，接口与queue.Queue的常用部分一致
+
+    取任务时按会话轮询，每个会话每轮最多连续取出weight个任务，总容量对所有会话共享。
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._queues: OrderedDict = OrderedDict()
+        self._size = 0
+        self._credit = 0
+        self._not_empty = threading.Condition()
+
+    def put_nowait(self, item: Any, key: Optional[str] = None):
+        with self._not_empty:
+            if self.maxsize and self._size >= self.maxsize:
+                raise queue.Full
+            self._queues.setdefault(key, deque()).append(item)
+            self._size += 1
+            self._not_empty.notify()
+
+    def _pop(self) -> Any:
+        key, items = next(iter(self._queues.items()))
+        if self._credit <= 0:
+            self._credit = session_weight(key)
+        item = items.popleft()
+        self._size -= 1
+        self._credit -= 1
+        if not items:
+            del self._queues[key]
+            self._credit = 0
+        elif self._credit == 0:
+            self._queues.move_to_end(key)
+        return item
+
+    def get(self) -> Any:
+        with self._not_empty:
+            while not self._size:
+                self._not_empty.wait()
+            return self._pop()
+
+    def get_nowait(self) -> Any:
+        with self._not_empty:
+            if not self._size:
+                raise queue.Empty
+            return self._pop()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def sessions_waiting(self) -> int:
+        return len(self._queues)
+
+
+class FairLock:
+    """按会话加权轮询交接的互斥锁，释放时把锁直接交给轮到的下一个会话的等待者"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._locked = False
+        self._waiting = FairQueue()
+        self._granted: Optional[object] = None
+
+    def acquire(self, blocking: bool = True, key: Optional[str] = None) -> bool:
+        with self._condition:
+            if not self._locked and not self._waiting.qsize():
+                self._locked = True
+                return True
+            if not blocking:
+                return False
+            ticket = object()
+            self._waiting.put_nowait(ticket, key)
+            while self._granted is not ticket:
+                self._condition.wait()
+            self._granted = None
+            return True
+
+    def release(self):
+        with self._condition:
+            if self._waiting.qsize():
+                self._granted = self._waiting.get_nowait()
+                self._condition.notify_all()
+            else:
+                self._locked = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class Session:
+    def __init__(self, identity: str, service: Any):
+        self.identity = identity
+        self.service = service
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.pins = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "identity": self.identity,
+            "weight": session_weight(self.identity),
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "pins": self.pins
+        }
+
+
+class SessionManager:
+    """按JWT身份创建和回收会话；factory根据身份创建会话专属的CATIA服务"""
+
+    def __init__(self, factory: Callable[[str], Any], idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._factory = factory
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def get(self, identity: Any) -> Session:
+        key = str(identity)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                session.last_used = time.monotonic()
+                return session
+        service = self._factory(key)
+        with self._lock:
+            session = self._sessions.setdefault(key, Session(key, service))
+            session.last_used = time.monotonic()
+            self._ensure_reaper()
+        return session
+
+    def pin(self, session: Session):
+        """固定会话：在对应的unpin之前不会因空闲被回收"""
+        with self._lock:
+            session.pins += 1
+            session.last_used = time.monotonic()
+
+    def unpin(self, session: Session):
+        with self._lock:
+            session.pins = max(0, session.pins - 1)
+            session.last_used = time.monotonic()
+
+    @contextmanager
+    def hold(self, session: Session) -> Iterator[Session]:
+        self.pin(session)
+        try:
+            yield session
+        finally:
+            self.unpin(session)
+
+    def held(self, session: Session, rows: Iterable) -> Iterator:
+        """在流式响应逐行生成期间固定会话，生成结束或客户端断开后解除"""
+        with self.hold(session):
+            yield from rows
+
+    def close(self, identity: Any) -> bool:
+        """结束会话并关闭它打开的全部文档"""
+        with self._lock:
+            session = self._sessions.pop(str(identity), None)
+        if session is None:
+            return False
+        self._close_documents(session)
+        return True
+
+    def _close_documents(self, session: Session):
+        try:
+            session.service.close_all_documents()
+        except Exception as e:
+            logger.error("关闭会话%s的文档失败: %s", session.identity, e)
+
+    def reap_idle(self) -> int:
+        deadline = time.monotonic() - self.idle_timeout
+        # 在锁内判断并移除，避免判断之后会话又被使用或固定
+        with self._lock:
+            idle = [key for key, session in self._sessions.items()
+                    if session.last_used < deadline and not session.pins]
+            sessions = [self._sessions.pop(key) for key in idle]
+        for session in sessions:
+            logger.info("会话空闲超时，关闭其文档: %s", session.identity)
+            self._close_documents(session)
+        return len(sessions)
+
+    def _ensure_reaper(self):
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name='catia-session-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(min(SESSION_REAP_INTERVAL, self.idle_timeout))
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error("回收空闲会话失败: %s", e)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [session.to_dict() for session in self._sessions.values()]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,307 @@
+"""文件结构快照缓存：装配结构、参数和质量属性保存在SQLite中，按文件路径、修改时间和大小判断是否有效
+
+BOM、反查（where-used）等工具反复查询未变化文件的结构时直接读SQLite，不再打开CATIA文档。
+缓存未命中或文件已变化时，通过COM执行器打开文件提取一次快照（一次任务内完成遍历、读取参数和质量，
+随后关闭本次打开的文档），在调用线程中写入数据库。后台刷新线程定期比较已缓存文件的修改时间和大小，
+发现变化时重新提取。
+
+数据库使用WAL模式，每个线程一个连接；节点按(文件, 序号)聚簇存储，零件号和名称上有索引用于反查。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import catia_tree
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DB = os.getenv('CATIA_SNAPSHOT_DB', 'catia_snapshots.sqlite3')
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv('CATIA_SNAPSHOT_REFRESH_INTERVAL', '60'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    doc_type TEXT,
+    extracted_at REAL NOT NULL,
+    extract_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    file_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT,
+    part_number TEXT,
+    path TEXT NOT NULL,
+    PRIMARY KEY (file_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nodes_part_number ON nodes (part_number) WHERE part_number IS NOT NULL;
+CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name);
+CREATE TABLE IF NOT EXISTS parameters (
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    type TEXT,
+    PRIMARY KEY (file_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mass (
+    file_id INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    volume REAL,
+    mass REAL,
+    PRIMARY KEY (file_id, body)
+) WITHOUT ROWID;
+"""
+
+_ROOTS = {"Product": "product", "Part": "part", "Drawing": "drawing"}
+
+
+def normalize_path(file_path: str) -> str:
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+def _safe(fn: Callable[[], Any]) -> Any:
+    try:
+        return fn()
+    except Exception:
+        return None
+
+
+def extract(document: Any) -> Dict:
+    """在COM线程中读取文档的结构树、参数和各实体的体积与质量，返回可序列化的快照"""
+    root_type = _ROOTS.get(document.type)
+    root = getattr(document, root_type, None) if root_type else None
+    nodes = []
+    if root is not None:
+        for frame in catia_tree.walk(root, root_type):
+            obj = frame.obj
+            part_number = _safe(lambda: obj.part_number) if frame.type == 'product' else None
+            nodes.append((frame.depth, frame.type, _safe(lambda: obj.name), part_number,
+                          catia_tree.format_path(frame.path)))
+    parameters = []
+    collection = _safe(lambda: root.parameters) if root is not None else None
+    if collection is not None:
+        for i in range(1, collection.count + 1):
+            param = collection.item(i)
+            parameters.append((param.name, json.dumps(param.value, ensure_ascii=False), param.type))
+    mass = []
+    if root_type == 'part':
+        bodies = _safe(lambda: root.bodies)
+        for i in range(1, (bodies.count if bodies is not None else 0) + 1):
+            body = bodies.item(i)
+            mass.append((body.name, _safe(lambda: root.measure.volume(body)),
+                         _safe(lambda: root.analysis.mass(body))))
+    return {"doc_type": document.type, "nodes": nodes, "parameters": parameters, "mass": mass}
+
+
+class SnapshotCache:
+    """extract_file(file_path)返回(success, extract()的结果或错误信息)，通常经由COM执行器在CATIA中执行"""
+
+    def __init__(self, path: str, extract_file: Callable[[str], Tuple[bool, Union[Dict, str]]]):
+        self.path = path
+        self.extract_file = extract_file
+        self._local = threading.local()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _stat(key: str) -> Tuple[int, int]:
+        stat = os.stat(key)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _file_row(self, key: str) -> Optional[sqlite3.Row]:
+        return self._db().execute('SELECT * FROM files WHERE path = ?', (key,)).fetchone()
+
+    def _store(self, key: str, stat: Tuple[int, int], snapshot: Dict, extract_ms: float):
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT id FROM files WHERE path = ?', (key,)).fetchone()
+            if row is not None:
+                file_id = row[0]
+                for table in ('nodes', 'parameters', 'mass'):
+                    db.execute(f'DELETE FROM {table} WHERE file_id = ?', (file_id,))
+                db.execute('UPDATE files SET mtime_ns = ?, size = ?, doc_type = ?, extracted_at = ?, extract_ms = ? '
+                           'WHERE id = ?', (*stat, snapshot["doc_type"], time.time(), extract_ms, file_id))
+            else:
+                file_id = db.execute('INSERT INTO files (path, mtime_ns, size, doc_type, extracted_at, extract_ms) '
+                                     'VALUES (?, ?, ?, ?, ?, ?)',
+                                     (key, *stat, snapshot["doc_type"], time.time(), extract_ms)).lastrowid
+            db.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           ((file_id, seq, *node) for seq, node in enumerate(snapshot["nodes"])))
+            db.executemany('INSERT OR REPLACE INTO parameters VALUES (?, ?, ?, ?)',
+                           ((file_id, *parameter) for parameter in snapshot["parameters"]))
+            db.executemany('INSERT OR REPLACE INTO mass VALUES (?, ?, ?, ?)',
+                           ((file_id, *body) for body in snapshot["mass"]))
+
+    def ensure(self, file_path: str, refresh: bool = False) -> Tuple[bool, Union[Dict, str]]:
+        """返回文件快照的摘要；缓存缺失、文件已变化或refresh为True时从CATIA重新提取"""
+        key = normalize_path(file_path)
+        try:
+            stat = self._stat(key)
+        except OSError:
+            return False, f"文件不存在: {file_path}"
+        row = self._file_row(key)
+        if not refresh and row is not None and (row["mtime_ns"], row["size"]) == stat:
+            self.hits += 1
+            return True, self._summary(row, cached=True)
+        # 同一文件同时只提取一次，等待中的请求在锁释放后直接读到新快照
+        with self._lock(key):
+            row = self._file_row(key)
+            try:
+                stat = self._stat(key)
+            except OSError:
+                return False, f"文件不存在: {file_path}"
+            if not refresh and row is not None and (row["mtime_ns"], row["size"]) == stat:
+                self.hits += 1
+                return True, self._summary(row, cached=True)
+            self.misses += 1
+            start = time.perf_counter()
+            success, snapshot = self.extract_file(key)
+            if not success:
+                return False, snapshot
+            extract_ms = (time.perf_counter() - start) * 1000
+            self._store(key, stat, snapshot, extract_ms)
+            logger.info("已提取文件快照%s: %s个节点，耗时%.1fms", key, len(snapshot["nodes"]), extract_ms)
+            return True, self._summary(self._file_row(key), cached=False)
+
+    def _summary(self, row: sqlite3.Row, cached: bool) -> Dict:
+        db = self._db()
+        counts = {table: db.execute(f'SELECT count(*) FROM {table} WHERE file_id = ?', (row["id"],)).fetchone()[0]
+                  for table in ('nodes', 'parameters', 'mass')}
+        return {"file_path": row["path"], "doc_type": row["doc_type"], "mtime_ns": row["mtime_ns"],
+                "size": row["size"], "extracted_at": row["extracted_at"], "extract_ms": round(row["extract_ms"], 3),
+                "cached": cached, "counts": counts}
+
+    def structure(self, file_path: str, max_depth: Optional[int] = None, types: Optional[Sequence[str]] = None,
+                  offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        query = ('SELECT n.path, n.depth, n.type, n.name, n.part_number FROM nodes n JOIN files f ON f.id = n.file_id '
+                 'WHERE f.path = ?')
+        args: List[Any] = [normalize_path(file_path)]
+        if max_depth is not None:
+            query += ' AND n.depth <= ?'
+            args.append(max_depth)
+        if types:
+            query += f" AND n.type IN ({','.join('?' * len(types))})"
+            args.extend(types)
+        query += ' ORDER BY n.seq LIMIT ? OFFSET ?'
+        args.extend([-1 if limit is None else limit, offset])
+        return [{"path": path, "depth": depth, "type": node_type, "name": name, "part_number": part_number}
+                for path, depth, node_type, name, part_number in self._db().execute(query, args)]
+
+    def parameters(self, file_path: str, prefix: Optional[str] = None) -> List[Dict]:
+        query = ('SELECT p.name, p.value, p.type FROM parameters p JOIN files f ON f.id = p.file_id '
+                 'WHERE f.path = ?')
+        args: List[Any] = [normalize_path(file_path)]
+        if prefix:
+            # 用范围条件代替LIKE，可以利用主键索引
+            query += ' AND p.name >= ? AND p.name < ?'
+            args.extend([prefix, prefix + '\U0010ffff'])
+        return [{"name": name, "value": json.loads(value), "type": param_type}
+                for name, value, param_type in self._db().execute(query + ' ORDER BY p.name', args)]
+
+    def mass(self, file_path: str) -> List[Dict]:
+        rows = self._db().execute('SELECT m.body, m.volume, m.mass FROM mass m JOIN files f ON f.id = m.file_id '
+                                  'WHERE f.path = ? ORDER BY m.body', (normalize_path(file_path),))
+        return [{"body": body, "volume": volume, "mass": mass} for body, volume, mass in rows]
+
+    def where_used(self, part_number: Optional[str] = None, name: Optional[str] = None,
+                   limit: int = 1000) -> List[Dict]:
+        """在已缓存的全部文件中查找引用了指定零件号（或节点名称）的位置"""
+        column, value = ('part_number', part_number) if part_number else ('name', name)
+        rows = self._db().execute(f'SELECT f.path, n.path, n.depth, n.name, n.part_number FROM nodes n '
+                                  f'JOIN files f ON f.id = n.file_id WHERE n.{column} = ? '
+                                  f'ORDER BY f.path, n.seq LIMIT ?', (value, limit))
+        return [{"file_path": file_path, "path": path, "depth": depth, "name": node_name, "part_number": number}
+                for file_path, path, depth, node_name, number in rows]
+
+    def files(self) -> List[Dict]:
+        return [{"file_path": row["path"], "doc_type": row["doc_type"], "mtime_ns": row["mtime_ns"],
+                 "size": row["size"], "extracted_at": row["extracted_at"]}
+                for row in self._db().execute('SELECT * FROM files ORDER BY path')]
+
+    def remove(self, file_path: str) -> bool:
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT id FROM files WHERE path = ?', (normalize_path(file_path),)).fetchone()
+            if row is None:
+                return False
+            for table in ('nodes', 'parameters', 'mass'):
+                db.execute(f'DELETE FROM {table} WHERE file_id = ?', (row[0],))
+            db.execute('DELETE FROM files WHERE id = ?', (row[0],))
+        return True
+
+    def stale_files(self) -> Iterator[str]:
+        """已缓存且磁盘上的修改时间或大小已变化的文件；已删除的文件从缓存中移除"""
+        for row in self._db().execute('SELECT path, mtime_ns, size FROM files').fetchall():
+            try:
+                if self._stat(row[0]) != (row[1], row[2]):
+                    yield row[0]
+            except OSError:
+                logger.info("快照对应的文件已删除: %s", row[0])
+                self.remove(row[0])
+
+    def refresh_stale(self) -> int:
+        if not os.path.exists(self.path):
+            # 还没有缓存任何文件时不创建数据库
+            return 0
+        refreshed = 0
+        for key in self.stale_files():
+            if self._stop.is_set():
+                break
+            success, result = self.ensure(key)
+            if success:
+                refreshed += 1
+            else:
+                logger.warning("刷新文件快照失败%s: %s", key, result)
+        return refreshed
+
+    def start_refresher(self, interval: float = SNAPSHOT_REFRESH_INTERVAL):
+        if self._refresher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh_stale()
+                except Exception as e:
+                    logger.error("快照刷新线程出错: %s", e)
+
+        self._refresher = threading.Thread(target=run, name='catia-snapshot-refresher', daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {"file_count": self._db().execute('SELECT count(*) FROM files').fetchone()[0],
+                "hits": self.hits, "misses": self.misses, "database": os.path.abspath(self.path)}
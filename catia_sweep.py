@@ -0,0 +1,265 @@
+"""参数扫描：在服务端批量运行参数变体并收集测量结果
+
+每个变体通过CATIAService.evaluate_variant在COM线程中一次完成“设置参数→更新零件→测量”，
+结果逐行流式返回（NDJSON或CSV）。每完成一个变体就追加写入检查点文件，
+服务崩溃后使用相同的sweep_id重新提交即可跳过已完成的变体继续运行。
+检查点文件的第一行记录扫描定义的摘要，只有摘要一致的检查点才会被续用。
+"""
+import csv
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SWEEP_DIR = os.getenv('CATIA_SWEEP_DIR', 'sweeps')
+_SWEEP_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+_DONE = object()
+
+
+class SweepConflictError(ValueError):
+    """sweep_id已存在且扫描定义不同，对应HTTP 409"""
+
+
+def _spec_hash(spec: Dict) -> str:
+    return hashlib.sha256(json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Sweep:
+    def __init__(self, sweep_id: str, spec: Dict):
+        self.id = sweep_id
+        self.spec = spec
+        self.spec_hash = _spec_hash(spec)
+        self.parameter_names: List[str] = spec['parameter_names']
+        self.measurements: List[Dict] = spec['measurements']
+        self.checkpoint_path = os.path.join(SWEEP_DIR, f"{sweep_id}.ndjson")
+
+    @classmethod
+    def from_request(cls, data: Dict, measurement_types) -> "Sweep":
+        """根据请求创建扫描任务；只提供sweep_id时从磁盘恢复之前提交的扫描定义，
+        用已有的sweep_id提交不同的扫描定义时抛出SweepConflictError"""
+        sweep_id = data.get('sweep_id') or uuid.uuid4().hex
+        if not _SWEEP_ID_PATTERN.match(sweep_id):
+            raise ValueError("sweep_id只能包含字母、数字、下划线和连字符")
+        spec_path = os.path.join(SWEEP_DIR, f"{sweep_id}.json")
+        existing = None
+        if os.path.exists(spec_path):
+            with open(spec_path, encoding='utf-8') as f:
+                existing = json.load(f)
+            if not data.get('grid') and not data.get('samples'):
+                return cls(sweep_id, existing)
+        spec = cls._build_spec(data, measurement_types)
+        if existing is not None:
+            if _spec_hash(existing) != _spec_hash(spec):
+                raise SweepConflictError("sweep_id已存在且扫描定义不同，请使用新的sweep_id")
+            return cls(sweep_id, existing)
+        os.makedirs(SWEEP_DIR, exist_ok=True)
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(spec, f, ensure_ascii=False)
+        return cls(sweep_id, spec)
+
+    @staticmethod
+    def _build_spec(data: Dict, measurement_types) -> Dict:
+        grid, samples = data.get('grid'), data.get('samples')
+        if bool(grid) == bool(samples):
+            raise ValueError("必须且只能提供grid或samples之一")
+        if grid:
+            if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+                raise ValueError("grid必须是参数名到取值列表的映射")
+            parameter_names = list(grid)
+        else:
+            if not isinstance(samples, list) or not all(isinstance(v, dict) for v in samples):
+                raise ValueError("samples必须是参数字典列表")
+            parameter_names = list(dict.fromkeys(name for sample in samples for name in sample))
+        measurements = []
+        for measurement in data.get('measurements') or []:
+            if measurement.get('type') not in measurement_types:
+                raise ValueError(f"不支持的测量类型: {measurement.get('type')}")
+            target = measurement.get('target')
+            name = measurement.get('name') or (measurement['type'] if target is None
+                                               else f"{measurement['type']}:{target}")
+            measurements.append({"type": measurement['type'], "target": target, "name": name})
+        return {"grid": grid, "samples": samples, "parameter_names": parameter_names,
+                "measurements": measurements, "file_path": data.get('file_path')}
+
+    @property
+    def total(self) -> int:
+        if self.spec['samples']:
+            return len(self.spec['samples'])
+        total = 1
+        for values in self.spec['grid'].values():
+            total *= len(values)
+        return total
+
+    def variants(self) -> Iterator[Dict]:
+        """按需生成参数变体，网格扫描不会一次性展开全部组合"""
+        if self.spec['samples']:
+            return iter(self.spec['samples'])
+        names = self.parameter_names
+        return (dict(zip(names, values)) for values in itertools.product(*(self.spec['grid'][n] for n in names)))
+
+    def _read_checkpoint(self) -> Optional[Dict[int, Dict]]:
+        """读取检查点中已完成的行；文件不存在或摘要与当前扫描定义不一致时返回None"""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        rows = {}
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return None
+            if not isinstance(header, dict) or header.get('spec_hash') != self.spec_hash:
+                return None
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能留下写了一半的最后一行
+                    continue
+                rows[row['index']] = row
+        return rows
+
+    def completed(self) -> Dict[int, Dict]:
+        return self._read_checkpoint() or {}
+
+    def _evaluate(self, service: Any, index: int, variant: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            success, result = service.evaluate_variant(variant, self.measurements)
+        except Exception as e:
+            # 执行器或进程池拒绝、工作进程崩溃等异常只记为该变体失败，扫描继续
+            success, result = False, getattr(e, 'data', {}).get('message') or str(e)
+        row = {"index": index, "status": "success" if success else "error", "parameters": variant,
+               "measurements": result if success else {},
+               "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+        if not success:
+            row["message"] = result
+        return row
+
+    def run(self, services: List[Any]) -> Iterator[Dict]:
+        """运行扫描，先返回检查点中已完成的行，再按完成顺序返回新行"""
+        done = self._read_checkpoint()
+        if done is None:
+            # 新的扫描，或检查点属于其他扫描定义：重新写入检查点，旧的行不再返回
+            os.makedirs(SWEEP_DIR, exist_ok=True)
+            with open(self.checkpoint_path, 'w', encoding='utf-8') as checkpoint:
+                checkpoint.write(json.dumps({"spec_hash": self.spec_hash}) + "\n")
+            done = {}
+        for index in sorted(done):
+            yield done[index]
+        pending = ((i, v) for i, v in enumerate(self.variants()) if i not in done)
+        file_path = self.spec.get('file_path')
+        if file_path:
+            services, message = self._open(services, file_path)
+            if not services:
+                # 文档打不开时每个未完成的变体返回一行错误，不写入检查点，重新提交时会再次运行
+                for index, variant in pending:
+                    yield {"index": index, "status": "error", "parameters": variant, "measurements": {},
+                           "elapsed_ms": 0.0, "message": message}
+                return
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            for row in self._run_pending(services, pending):
+                checkpoint.write(json.dumps(row, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                yield row
+
+    @staticmethod
+    def _open(services: List[Any], file_path: str) -> tuple:
+        """在每个服务中打开扫描文件，返回打开成功的服务和最后一条错误信息"""
+        opened = []
+        message = None
+        for service in services:
+            try:
+                success, result = service.open_document(file_path)
+            except Exception as e:
+                success, result = False, getattr(e, 'data', {}).get('message') or str(e)
+            if success:
+                opened.append(service)
+            else:
+                logger.error("参数扫描打开文档失败: %s", result)
+                message = f"打开文档失败: {result}"
+        return opened, message
+
+    def _run_pending(self, services: List[Any], pending: Iterator) -> Iterator[Dict]:
+        if len(services) == 1:
+            for index, variant in pending:
+                yield self._evaluate(services[0], index, variant)
+            return
+        results: queue.Queue = queue.Queue()
+        pending_lock = threading.Lock()
+        stop = threading.Event()
+
+        def worker(service):
+            try:
+                while not stop.is_set():
+                    with pending_lock:
+                        item = next(pending, None)
+                    if item is None:
+                        break
+                    results.put(self._evaluate(service, *item))
+            except Exception as e:
+                logger.error("参数扫描工作线程失败: %s", e)
+            finally:
+                results.put(_DONE)
+
+        for service in services:
+            threading.Thread(target=worker, args=(service,), name=f"sweep-{self.id}", daemon=True).start()
+        finished = 0
+        try:
+            while finished < len(services):
+                row = results.get()
+                if row is _DONE:
+                    finished += 1
+                    continue
+                yield row
+        finally:
+            # 客户端断开时通知工作线程在当前变体完成后停止
+            stop.set()
+
+
+def ndjson_lines(rows: Iterator[Dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(sweep: Sweep, rows: Iterator[Dict]) -> Iterator[str]:
+    measurement_names = [m['name'] for m in sweep.measurements]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(["index", "status", "elapsed_ms", *sweep.parameter_names, *measurement_names, "message"])
+    yield flush()
+    for row in rows:
+        writer.writerow([row["index"], row["status"], row["elapsed_ms"],
+                         *(row["parameters"].get(name) for name in sweep.parameter_names),
+                         *(row["measurements"].get(name) for name in measurement_names),
+                         row.get("message", "")])
+        yield flush()
+
+
+def sweep_headers(sweep: Sweep) -> Dict[str, str]:
+    return {"X-Sweep-Id": sweep.id, "X-Sweep-Total": str(sweep.total)}
+
+
+def load_sweep(sweep_id: str) -> Optional[Sweep]:
+    spec_path = os.path.join(SWEEP_DIR, f"{sweep_id}.json")
+    if not _SWEEP_ID_PATTERN.match(sweep_id) or not os.path.exists(spec_path):
+        return None
+    with open(spec_path, encoding='utf-8') as f:
+        return Sweep(sweep_id, json.load(f))
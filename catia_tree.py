@@ -0,0 +1,205 @@
+"""零件和装配结构树的惰性遍历
+
+遍历按深度优先顺序由生成器逐个产生节点，只保存从根到当前节点的一条路径（每层一个帧），
+不会在内存中构建整棵树。节点位置用路径表示，如products:3/products:12表示根产品的第3个子产品的第12个子产品，
+游标就是最后访问的节点路径；从游标继续时先沿路径逐层定位（每层一次COM调用），再继续向后遍历，
+因此每一页都可以作为一次独立的COM执行器任务完成，页与页之间不占用COM线程，也不保留任何状态。
+"""
+import base64
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+TREE_PAGE_SIZE = int(os.getenv('CATIA_TREE_PAGE_SIZE', '500'))
+TREE_SCAN_LIMIT = int(os.getenv('CATIA_TREE_SCAN_LIMIT', '5000'))
+
+# 各类节点下要遍历的子集合，以及从该集合取出的子节点类型
+CHILD_COLLECTIONS: Dict[str, Tuple[str, ...]] = {
+    'product': ('products',),
+    'part': ('bodies', 'hybrid_bodies', 'sketches'),
+    'body': ('shapes', 'hybrid_bodies', 'sketches'),
+    'hybrid_body': ('hybrid_bodies', 'hybrid_shapes', 'bodies'),
+    'drawing': ('sheets', 'views'),
+    'sheet': ('views',),
+}
+COLLECTION_TYPES: Dict[str, str] = {
+    'products': 'product',
+    'bodies': 'body',
+    'hybrid_bodies': 'hybrid_body',
+    'sketches': 'sketch',
+    'shapes': 'shape',
+    'hybrid_shapes': 'hybrid_shape',
+    'sheets': 'sheet',
+    'views': 'view',
+}
+NODE_TYPES = ('part', 'drawing', *dict.fromkeys(COLLECTION_TYPES.values()))
+
+Path = Tuple[Tuple[str, int], ...]
+
+
+def format_path(path: Path) -> str:
+    return '/'.join(f"{collection}:{index}" for collection, index in path)
+
+
+def encode_cursor(document_id: str, path: Path) -> str:
+    payload = json.dumps({"document_id": document_id, "path": [list(step) for step in path]},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Path]:
+    """解析游标，返回(文档id, 路径)；格式错误时抛出ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        path = tuple((str(collection), int(index)) for collection, index in payload["path"])
+        return str(payload["document_id"]), path
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("游标格式错误")
+
+
+class _Frame:
+    """遍历路径上的一层：一个节点及其子集合的当前位置"""
+    __slots__ = ('obj', 'type', 'path', 'collections', 'position', 'index', 'items', 'count')
+
+    def __init__(self, obj: Any, node_type: str, path: Path):
+        self.obj = obj
+        self.type = node_type
+        self.path = path
+        self.collections = CHILD_COLLECTIONS.get(node_type, ())
+        self.position = 0
+        self.index = 0
+        self.items = None
+        self.count = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.path)
+
+    def _open(self):
+        # 不同CATIA对象提供的集合不同，没有的集合视为空
+        try:
+            self.items = getattr(self.obj, self.collections[self.position], None)
+            self.count = self.items.count if self.items is not None else 0
+        except Exception:
+            self.items, self.count = None, 0
+
+    def seek(self, collection: str, index: int):
+        """定位到指定集合的第index个子节点，之后next_child从其下一个开始"""
+        if collection not in self.collections:
+            raise ValueError(f"游标已失效：{self.type}下没有{collection}")
+        self.position = self.collections.index(collection)
+        self._open()
+        if not 1 <= index <= self.count:
+            raise ValueError(f"游标已失效：{collection}中没有第{index}项")
+        self.index = index
+
+    def child(self) -> Any:
+        return self.items.item(self.index)
+
+    def next_child(self) -> Optional[Tuple[Any, str, int]]:
+        while self.position < len(self.collections):
+            if self.items is None and self.index == 0:
+                self._open()
+            if self.index < self.count:
+                self.index += 1
+                return self.items.item(self.index), self.collections[self.position], self.index
+            self.position += 1
+            self.index = 0
+            self.items = None
+        return None
+
+
+def _node(frame: _Frame) -> Dict:
+    try:
+        name = frame.obj.name
+    except Exception:
+        name = None
+    return {"path": format_path(frame.path), "depth": frame.depth, "type": frame.type, "name": name}
+
+
+def walk(root: Any, root_type: str, max_depth: Optional[int] = None,
+         after: Optional[Path] = None) -> Iterator[_Frame]:
+    """按深度优先顺序逐个产生节点的帧；after为上次访问的最后一个节点（空路径表示根节点），从它之后继续
+
+    超过max_depth的节点不访问。栈中只有当前路径上的帧，内存占用与树的深度成正比。
+    """
+    stack = [_Frame(root, root_type, ())]
+    if after is None:
+        yield stack[-1]
+    else:
+        for collection, index in after:
+            parent = stack[-1]
+            parent.seek(collection, index)
+            stack.append(_Frame(parent.child(), COLLECTION_TYPES[collection],
+                                parent.path + ((collection, index),)))
+    while stack:
+        frame = stack[-1]
+        if max_depth is not None and frame.depth >= max_depth:
+            stack.pop()
+            continue
+        child = frame.next_child()
+        if child is None:
+            stack.pop()
+            continue
+        obj, collection, index = child
+        child_frame = _Frame(obj, COLLECTION_TYPES[collection], frame.path + ((collection, index),))
+        stack.append(child_frame)
+        yield child_frame
+
+
+def page(root: Any, root_type: str, document_id: str, cursor: Optional[str] = None,
+         limit: int = TREE_PAGE_SIZE, max_depth: Optional[int] = None,
+         types: Optional[Sequence[str]] = None, scan_limit: int = TREE_SCAN_LIMIT) -> Dict:
+    """遍历一页：最多返回limit个符合类型过滤的节点，最多访问scan_limit个节点
+
+    返回的cursor为最后访问的节点（不一定符合过滤条件），为None表示遍历结束
+    """
+    after: Optional[Path] = None
+    if cursor:
+        cursor_document, after = decode_cursor(cursor)
+        if cursor_document != document_id:
+            raise ValueError("游标不属于该文档")
+    wanted = set(types) if types else None
+    nodes: List[Dict] = []
+    visited = 0
+    last: Optional[_Frame] = None
+    walker = walk(root, root_type, max_depth, after)
+    for frame in walker:
+        visited += 1
+        last = frame
+        if wanted is None or frame.type in wanted:
+            node = _node(frame)
+            node["cursor"] = encode_cursor(document_id, frame.path)
+            nodes.append(node)
+        if len(nodes) >= limit or visited >= scan_limit:
+            break
+    else:
+        return {"nodes": nodes, "visited": visited, "cursor": None}
+    walker.close()
+    return {"nodes": nodes, "visited": visited, "cursor": encode_cursor(document_id, last.path)}
+
+
+def stream(fetch_page: Callable[[str], Tuple[bool, Any]], first: Dict,
+           max_nodes: Optional[int] = None) -> Iterator[Dict]:
+    """逐页获取并逐个产生节点，内存中最多只有一页；最后产生一行{"done", "cursor", "count"}
+
+    fetch_page(cursor)返回下一页的(success, result)。达到max_nodes或获取失败时done为false，
+    cursor为最后一个已返回节点之后的位置，可用于继续遍历。
+    """
+    result, count, cursor = first, 0, None
+    while True:
+        for node in result["nodes"]:
+            if max_nodes is not None and count >= max_nodes:
+                yield {"done": False, "cursor": cursor, "count": count}
+                return
+            count += 1
+            cursor = node["cursor"]
+            yield node
+        if result["cursor"] is None:
+            yield {"done": True, "cursor": None, "count": count}
+            return
+        cursor = result["cursor"]
+        success, result = fetch_page(cursor)
+        if not success:
+            yield {"done": False, "cursor": cursor, "count": count, "error": result}
+            return
@@ -51,6 +51,18 @@ class CATIAAssemblyClient:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    def add_components(self, components: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批量添加组件，每项为{"file_path": ..., "transform": 4x4矩阵}，同一文件只加载一次"""
+        try:
+            response = requests.post(
+                f"{self.base_url}/api/catia/assembly/bulk",
+                json={"components": components},
+                headers=self.headers
+            )
+            return response.json()
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
     def create_constraint(self, component1: str, component2: str, 
                          constraint_type: str, reference1: Any, reference2: Any) -> Dict[str, Any]:
         """创建约束"""
@@ -129,6 +141,18 @@ def main():
         print(f"添加第二个组件失败: {result['message']}")
         return
 
+    # 批量添加10个螺栓，沿X轴排列，文件只加载一次
+    result = client.add_components([
+        {
+            "file_path": "C:/temp/bolt.CATPart",
+            "transform": [[1, 0, 0, 20 * i], [0, 1, 0, 50], [0, 0, 1, 0], [0, 0, 0, 1]]
+        }
+        for i in range(10)
+    ])
+    if result["status"] != "success" or result["data"]["failed"]:
+        print(f"批量添加组件失败: {result.get('message') or result['data']['errors']}")
+        return
+
     # 创建约束
     result = client.create_constraint(
         "Part1",
@@ -0,0 +1,472 @@
+"""内存中的CATIA模拟后端
+
+提供与服务所用pycatia接口一致的最小对象模型（文档、参数、几何图形集、实体、测量和分析），
+不依赖Windows和COM，用于在Linux上运行调度器压测和基准测试。
+
+通过环境变量`CATIA_BACKEND=fake`启用，`CATIA_FAKE_LATENCY_MS`为每次模拟COM调用增加固定延迟，
+`CATIA_FAKE_LATENCY_OVERRIDES`按调用类别覆盖延迟（如"open=200,update=50"），
+`CATIA_FAKE_LATENCY_JITTER`为延迟增加±比例的随机抖动。同一进程内也可以用configure_latency()修改。
+`CATIA_FAKE_PRODUCT_TREE`为打开的装配文件生成多层子产品，如"20,3"表示每个产品20个子产品、共3层。
+"""
+import itertools
+import math
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+# _simulate()的调用类别，可在CATIA_FAKE_LATENCY_OVERRIDES中分别设置延迟
+LATENCY_CATEGORIES = ('collection', 'parameter', 'geometry', 'sketch', 'feature', 'measure', 'analysis',
+                      'update', 'product', 'drawing', 'document', 'open', 'save', 'close', 'system')
+
+
+def _parse_overrides(value: str) -> Dict[str, float]:
+    overrides = {}
+    for item in value.split(','):
+        if '=' in item:
+            category, latency = item.split('=', 1)
+            overrides[category.strip()] = float(latency)
+    return overrides
+
+
+LATENCY_MS = float(os.getenv('CATIA_FAKE_LATENCY_MS', '0'))
+LATENCY_OVERRIDES = _parse_overrides(os.getenv('CATIA_FAKE_LATENCY_OVERRIDES', ''))
+LATENCY_JITTER = float(os.getenv('CATIA_FAKE_LATENCY_JITTER', '0'))
+PARAMETER_COUNT = int(os.getenv('CATIA_FAKE_PARAMETERS', '20'))
+PRODUCT_TREE = tuple(int(v) for v in os.getenv('CATIA_FAKE_PRODUCT_TREE', '0,0').split(','))
+
+_document_counter = itertools.count(1)
+_random = random.Random(0)
+
+
+def configure_latency(default_ms: Optional[float] = None, overrides: Optional[Dict[str, float]] = None,
+                      jitter: Optional[float] = None):
+    """修改模拟延迟；未提供的项保持不变"""
+    global LATENCY_MS, LATENCY_OVERRIDES, LATENCY_JITTER
+    if default_ms is not None:
+        LATENCY_MS = float(default_ms)
+    if overrides is not None:
+        unknown = set(overrides) - set(LATENCY_CATEGORIES)
+        if unknown:
+            raise ValueError(f"unknown latency categories: {sorted(unknown)}")
+        LATENCY_OVERRIDES = dict(overrides)
+    if jitter is not None:
+        LATENCY_JITTER = float(jitter)
+
+
+def _simulate(category: str = 'collection'):
+    """模拟一次跨进程COM调用的耗时"""
+    latency = LATENCY_OVERRIDES.get(category, LATENCY_MS)
+    if latency:
+        if LATENCY_JITTER:
+            latency *= 1.0 + _random.uniform(-LATENCY_JITTER, LATENCY_JITTER)
+        time.sleep(max(0.0, latency) / 1000.0)
+
+
+class FakeObject:
+    """几何元素、草图元素、特征等不需要区分行为的对象"""
+
+    def __init__(self, kind: str, name: str, **attributes):
+        self.kind = kind
+        self.name = name
+        self.__dict__.update(attributes)
+
+    def __repr__(self):
+        return f"<Fake{self.kind} {self.name}>"
+
+
+class FakeCollection:
+    """按1开始编号、同时支持按名称索引的集合"""
+
+    def __init__(self):
+        self._items: List[Any] = []
+
+    @property
+    def count(self) -> int:
+        _simulate()
+        return len(self._items)
+
+    def item(self, index):
+        _simulate()
+        if isinstance(index, str):
+            for obj in self._items:
+                if obj.name == index:
+                    return obj
+            raise KeyError(index)
+        return self._items[index - 1]
+
+    def _append(self, obj):
+        self._items.append(obj)
+        return obj
+
+
+class FakeParameter:
+    def __init__(self, name: str, value: Any, type: str):
+        self.name = name
+        self._value = value
+        self.type = type
+
+    @property
+    def value(self) -> Any:
+        _simulate('parameter')
+        return self._value
+
+    @value.setter
+    def value(self, value: Any):
+        _simulate('parameter')
+        self._value = value
+
+
+class FakeParameters(FakeCollection):
+    pass
+
+
+class FakeHybridBody(FakeObject):
+    def __init__(self, name: str):
+        super().__init__("HybridBody", name, elements=[])
+
+    def _add(self, kind: str, **attributes):
+        _simulate('geometry')
+        obj = FakeObject(kind, f"{kind}.{len(self.elements) + 1}", **attributes)
+        self.elements.append(obj)
+        return obj
+
+    def add_point(self, x: float, y: float, z: float):
+        return self._add("Point", coordinates=[x, y, z])
+
+    def add_line(self, start_point, end_point):
+        return self._add("Line", start_point=list(start_point), end_point=list(end_point))
+
+    def add_plane(self, origin, normal):
+        return self._add("Plane", origin=list(origin), normal=list(normal))
+
+    @property
+    def hybrid_shapes(self) -> FakeCollection:
+        shapes = FakeCollection()
+        shapes._items = self.elements
+        return shapes
+
+
+class FakeHybridBodies(FakeCollection):
+    def add(self):
+        _simulate('geometry')
+        return self._append(FakeHybridBody(f"Geometrical Set.{len(self._items) + 1}"))
+
+
+class FakeSketch(FakeObject):
+    def __init__(self, name: str, plane: Any):
+        super().__init__("Sketch", name, plane=plane, elements=[])
+
+    def add_line(self, start_point, end_point):
+        _simulate('sketch')
+        line = FakeObject("Line2D", f"Line.{len(self.elements) + 1}",
+                          start_point=list(start_point), end_point=list(end_point))
+        self.elements.append(line)
+        return line
+
+    def add_circle(self, center, radius):
+        _simulate('sketch')
+        circle = FakeObject("Circle2D", f"Circle.{len(self.elements) + 1}", center=list(center), radius=radius)
+        self.elements.append(circle)
+        return circle
+
+
+class FakeSketches(FakeCollection):
+    def add(self, plane):
+        _simulate('sketch')
+        return self._append(FakeSketch(f"Sketch.{len(self._items) + 1}", plane))
+
+
+def _box_faces(box: List[float]) -> FakeCollection:
+    """包围盒的6个面，面积按包围盒尺寸计算"""
+    faces = FakeCollection()
+    size = [box[axis + 3] - box[axis] for axis in range(3)]
+    for axis in range(3):
+        area = size[(axis + 1) % 3] * size[(axis + 2) % 3]
+        for _ in range(2):
+            faces._append(FakeObject("Face", f"Face.{len(faces._items) + 1}", area=area))
+    return faces
+
+
+class FakeBodies(FakeCollection):
+    def __init__(self):
+        super().__init__()
+        box = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        self._append(FakeObject("Body", "PartBody", volume=0.0, box=box, faces=_box_faces(box)))
+
+    def _add_feature(self, kind: str, sketch: Any, amount: float):
+        _simulate('feature')
+        # 每个特征生成一个新实体，沿x轴依次排列，相邻实体的包围盒部分重叠
+        x = len(self._items) * 6.0
+        box = [x, 0.0, 0.0, x + 8.0, 8.0, abs(float(amount))]
+        volume = abs(float(amount)) * 100.0
+        body = self._append(FakeObject("Body", f"Body.{len(self._items) + 1}", volume=volume, box=box,
+                                       faces=_box_faces(box)))
+        return FakeObject(kind, f"{kind}.{len(self._items) - 1}", sketch=sketch, amount=amount, body=body,
+                          volume=volume, box=box)
+
+    def add_pad(self, sketch, length):
+        return self._add_feature("Pad", sketch, length)
+
+    def add_pocket(self, sketch, length):
+        return self._add_feature("Pocket", sketch, length)
+
+    def add_revolution(self, sketch, angle):
+        return self._add_feature("Revolution", sketch, angle)
+
+
+def _coordinates(value: Any) -> Optional[List[float]]:
+    if isinstance(value, (list, tuple)) and len(value) == 3:
+        return [float(v) for v in value]
+    return getattr(value, 'coordinates', None)
+
+
+class FakeMeasure:
+    def distance(self, point1, point2) -> float:
+        _simulate('measure')
+        p1, p2 = _coordinates(point1), _coordinates(point2)
+        if p1 is None or p2 is None:
+            return 0.0
+        return math.dist(p1, p2)
+
+    def angle(self, line1, line2) -> float:
+        _simulate('measure')
+        return 90.0
+
+    def area(self, face) -> float:
+        _simulate('measure')
+        return float(getattr(face, 'area', 100.0))
+
+    def volume(self, body) -> float:
+        _simulate('measure')
+        return float(getattr(body, 'volume', 0.0))
+
+
+class FakeAnalysis:
+    density = 7.85e-6
+
+    def mass(self, body) -> float:
+        _simulate('analysis')
+        return float(getattr(body, 'volume', 0.0)) * self.density
+
+    def bounding_box(self, body) -> List[float]:
+        _simulate('analysis')
+        return list(getattr(body, 'box', [0.0] * 6))
+
+    def interference(self, body1, body2) -> bool:
+        _simulate('analysis')
+        box1, box2 = getattr(body1, 'box', None), getattr(body2, 'box', None)
+        if box1 is None or box2 is None:
+            return False
+        return all(box1[k] < box2[k + 3] and box2[k] < box1[k + 3] for k in range(3))
+
+
+class FakePart:
+    def __init__(self, parameter_count: int = 0):
+        self.hybrid_bodies = FakeHybridBodies()
+        self.parameters = FakeParameters()
+        self.sketches = FakeSketches()
+        self.bodies = FakeBodies()
+        self.measure = FakeMeasure()
+        self.analysis = FakeAnalysis()
+        self.update_count = 0
+        for i in range(1, parameter_count + 1):
+            self.parameters._append(FakeParameter(f"Length.{i}", float(i), "Length"))
+
+    def update(self):
+        _simulate('update')
+        self.update_count += 1
+
+
+class FakeProduct:
+    def __init__(self, name: str = "Product", tree: tuple = (0, 0), part_number: Optional[str] = None):
+        self.name = name
+        self.part_number = part_number or name.rsplit('.', 1)[0]
+        self.products = FakeCollection()
+        self.constraints: List[FakeObject] = []
+        self.position = [0.0, 0.0, 0.0]
+        self.transform: Optional[tuple] = None
+        # 组件自身坐标系中的包围盒
+        self.box = [0.0, 0.0, 0.0, 10.0, 10.0, 10.0]
+        fanout, depth = tree
+        if depth > 0:
+            for i in range(1, fanout + 1):
+                self.products._append(FakeProduct(f"Component{i}.{depth}", (fanout, depth - 1)))
+
+    def move(self, position):
+        self.position = list(position)
+
+    def place(self, transform):
+        """按CATIA的12元数组（X、Y、Z轴方向和原点）设置位置"""
+        _simulate('product')
+        self.transform = tuple(transform)
+        self.position = list(transform[9:12])
+
+    def placement(self) -> tuple:
+        """当前位置的CATIA 12元数组"""
+        _simulate('product')
+        if self.transform is not None:
+            return self.transform
+        return (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, *map(float, self.position))
+
+    def bounding_box(self) -> List[float]:
+        _simulate('analysis')
+        return list(self.box)
+
+    def _placed_box(self) -> List[float]:
+        placement = self.transform or (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, *self.position)
+        corners = [[self.box[3 * ((k >> axis) & 1) + axis] for axis in range(3)] for k in range(8)]
+        world = [[sum(corner[c] * placement[3 * c + d] for c in range(3)) + placement[9 + d] for d in range(3)]
+                 for corner in corners]
+        return [min(point[d] for point in world) for d in range(3)] + [max(point[d] for point in world)
+                                                                      for d in range(3)]
+
+    def interference(self, component1: "FakeProduct", component2: "FakeProduct") -> bool:
+        """两个组件放置后的包围盒是否相交（模拟精确干涉检查）"""
+        _simulate('analysis')
+        box1, box2 = component1._placed_box(), component2._placed_box()
+        return all(box1[k] < box2[k + 3] and box2[k] < box1[k + 3] for k in range(3))
+
+    def update(self):
+        _simulate('update')
+
+    def add_component(self, file_path: str):
+        # 每次都从磁盘读取文件
+        _simulate('open')
+        _simulate('product')
+        component = FakeProduct(f"{os.path.basename(file_path)}.{len(self.products._items) + 1}",
+                                part_number=os.path.splitext(os.path.basename(file_path))[0])
+        component.file_path = file_path
+        return self.products._append(component)
+
+    def add_instance(self, reference: "FakeProduct"):
+        """添加已加载组件的新实例，与之共享同一个引用，不读取文件"""
+        _simulate('product')
+        component = FakeProduct(f"{os.path.basename(reference.file_path)}.{len(self.products._items) + 1}",
+                                part_number=reference.part_number)
+        component.file_path = reference.file_path
+        component.box = list(reference.box)
+        return self.products._append(component)
+
+    def add_constraint(self, component1, component2, constraint_type, reference1, reference2):
+        _simulate('product')
+        constraint = FakeObject("Constraint", f"Constraint.{len(self.constraints) + 1}",
+                                type=constraint_type, elements=[component1, component2, reference1, reference2])
+        self.constraints.append(constraint)
+        return constraint
+
+
+class FakeView(FakeObject):
+    def add_dimension(self, reference1, reference2):
+        _simulate('drawing')
+        return FakeObject("Dimension", "Dimension", references=[reference1, reference2])
+
+
+class FakeViews(FakeCollection):
+    def add(self, name: str, type: str):
+        _simulate('drawing')
+        return self._append(FakeView("View", name, view_type=type))
+
+
+class FakeDrawing:
+    def __init__(self):
+        self.views = FakeViews()
+
+
+_EXTENSIONS = {".catpart": "Part", ".catproduct": "Product", ".catdrawing": "Drawing"}
+_DEFAULT_NAMES = {"Part": "Part{}.CATPart", "Product": "Product{}.CATProduct", "Drawing": "Drawing{}.CATDrawing"}
+
+
+class FakeDocument:
+    def __init__(self, documents: "FakeDocuments", type: str, name: str, full_name: str = "",
+                 parameter_count: int = 0, product_tree: tuple = (0, 0)):
+        self._documents = documents
+        self.type = type
+        self.name = name
+        self.full_name = full_name or name
+        self.saved_as: Optional[str] = None
+        self.part = FakePart(parameter_count) if type == "Part" else None
+        self.product = FakeProduct(name, product_tree) if type == "Product" else None
+        self.drawing = FakeDrawing() if type == "Drawing" else None
+        self._saved_state = self._content_state()
+
+    def _content_state(self) -> tuple:
+        """用于判断是否有未保存修改的内容摘要：参数值、各集合的元素数和组件位置"""
+        if self.part is not None:
+            return (tuple(parameter._value for parameter in self.part.parameters._items),
+                    len(self.part.bodies._items), len(self.part.hybrid_bodies._items), len(self.part.sketches._items))
+        if self.product is not None:
+            return (tuple((component.name, component.transform, tuple(component.position))
+                          for component in self.product.products._items), len(self.product.constraints))
+        return (len(self.drawing.views._items),)
+
+    @property
+    def saved(self) -> bool:
+        return self._content_state() == self._saved_state
+
+    def save(self):
+        _simulate('save')
+        self._saved_state = self._content_state()
+
+    def save_as(self, file_path: str):
+        _simulate('save')
+        self.saved_as = file_path
+        self._saved_state = self._content_state()
+
+    def close(self):
+        _simulate('close')
+        self._documents._items.remove(self)
+
+
+class FakeDocuments(FakeCollection):
+    def add(self, doc_type: str):
+        _simulate('document')
+        if doc_type not in _DEFAULT_NAMES:
+            raise ValueError(f"unsupported document type: {doc_type}")
+        name = _DEFAULT_NAMES[doc_type].format(next(_document_counter))
+        return self._append(FakeDocument(self, doc_type, name))
+
+    def open(self, file_path: str):
+        _simulate('open')
+        for document in self._items:
+            if document.full_name == file_path:
+                return document
+        extension = os.path.splitext(file_path)[1].lower()
+        doc_type = _EXTENSIONS.get(extension, "Part")
+        document = FakeDocument(self, doc_type, os.path.basename(file_path), file_path,
+                                parameter_count=PARAMETER_COUNT, product_tree=PRODUCT_TREE)
+        return self._append(document)
+
+
+class FakeSystem:
+    @property
+    def version(self) -> str:
+        _simulate('system')
+        return "Fake CATIA V5-6R2024"
+
+    @property
+    def license(self) -> str:
+        _simulate('system')
+        return "FAKE"
+
+    @property
+    def workspace(self) -> str:
+        _simulate('system')
+        return "/tmp/fake-catia"
+
+
+class FakeApplication:
+    def __init__(self):
+        self.documents = FakeDocuments()
+        self.system = FakeSystem()
+
+
+def catia_application() -> FakeApplication:
+    """与pycatia.catia_application()对应，每个进程一个模拟的CATIA会话"""
+    global _application
+    if _application is None:
+        _application = FakeApplication()
+    return _application
+
+
+_application: Optional[FakeApplication] = None